@@ -1,9 +1,13 @@
 import random
 from settings import STATION_ID
 from mechanics import process_arrival, calculate_sunrise_move, check_sanity_status
+from topology import locations_mask
 from scenario_gen import ScenarioBuilder
 from abilities import AbilityEngine  # 確保您已經建立了上一次對話中的 AbilityEngine
 from models import Grave
+from roster import Roster
+from events import EventBus, DEATH
+from game_log import TextRenderer, DEBUG
 
 class GameEngine:
     def __init__(self, logger_callback=None):
@@ -18,16 +22,18 @@ class GameEngine:
         # 初始化劇本與角色
         builder = ScenarioBuilder()
         self.characters, self.scripts = builder.build()
+        self.events = EventBus()
+        self.roster = Roster(self.characters, self.events)
+        self.events.subscribe(DEATH, self._on_death)
+        TextRenderer(self.log).attach(self.events)
         
         # 提取規則設定 (從 ScenarioBuilder 回傳的資料中)
         self.main_rule = self.scripts[0].get('rule_tag', 'default')
         self.sub_rule = self.scripts[1].get('rule_tag', 'default')
         self.foreshadow_data = self.scripts[2]
         
-        # 初始化能力引擎 (讀取 scripts.json 中的 Role_Data)
-        # 注意：這裡假設您的 ScenarioBuilder 會讀取並提供角色資料
-        from settings import SCRIPTS_DB
-        self.ability_engine = AbilityEngine(SCRIPTS_DB.get("Role_Data", {}))
+        # 初始化能力引擎 (讀取 scripts.json 中的 Role_Data，由共用的劇本目錄提供)
+        self.ability_engine = AbilityEngine(builder.catalog.role_data)
         
         self.log(f"📋 劇本構築完成: {self.main_rule} / {self.sub_rule}")
         
@@ -43,10 +49,10 @@ class GameEngine:
         
         self._assign_random_intrigue()
 
-    def log(self, message):
-        """通用日誌輸出"""
-        if message:
-            self.log_func(message)
+    def log(self, message, *args, level=None, category=None):
+        """通用日誌輸出 (相容 game_log.GameLog 的「模板 + 參數」介面，不輸出除錯訊息)"""
+        if message and level != DEBUG:
+            self.log_func(message.format(*args) if args else message)
 
     def _assign_random_intrigue(self):
         """遊戲初始隨機分配一個陰謀"""
@@ -55,8 +61,13 @@ class GameEngine:
             target.intrigue = 1
             self.log(f"👁️ 初始陰謀已潛伏在某處...")
 
+    def _on_death(self, char):
+        """死亡當下立碑"""
+        self.graves.append(Grave(char.name, char.location, self.day))
+        self.log(f"⚰️ {char.name} 的墓碑立於 Loc {char.location}")
+
     def _get_chars_in_loc(self, loc_id):
-        return [c for c in self.characters if c.location == loc_id and not c.is_dead]
+        return self.roster.alive_at(loc_id)
 
     def _apply_event_effect(self, effect_type, loc_id, victim_name=None):
         """執行伏筆效果邏輯"""
@@ -67,12 +78,12 @@ class GameEngine:
             self.log(f"🌀 [效果] Loc {loc_id} 發生災難！")
             for c in chars_in_zone:
                 c.sanity -= dmg
-                check_sanity_status(c, self.log_func)
+                check_sanity_status(c, self.events)
 
         elif effect_type == "massacre":
             self.log(f"🩸 [效果] Loc {loc_id} 發生大屠殺！")
             for c in chars_in_zone:
-                c.is_dead = True
+                self.roster.kill(c)
 
     def _check_foreshadowing_events(self, phase):
         """檢查伏筆事件觸發"""
@@ -87,7 +98,7 @@ class GameEngine:
     def _check_game_over(self):
         """勝敗判定"""
         # 通用死亡判定
-        if sum(1 for c in self.characters if c.is_dead) >= len(self.characters):
+        if len(self.graves) >= len(self.characters):
             self.log("💀 全員死亡。遊戲結束。")
             self.is_game_over = True
             return
@@ -103,7 +114,7 @@ class GameEngine:
         self.log("\n☀️ === 日出階段 ===")
         # 執行角色能力 (日出觸發)
         for c in self.characters:
-            self.ability_engine.run(c, self.characters, 'sunrise', self.log)
+            self.ability_engine.run(c, self.roster, 'sunrise')
 
     def phase_morning(self):
         self.log(f"\n🏃 === 第 {self.day} 天 早上：自動移動 ===")
@@ -116,24 +127,18 @@ class GameEngine:
             # 玩家不自動移動，死者不移動
             if c != self.characters[0] and not c.is_dead:
                 # 傳入路障列表
-                new_loc = calculate_sunrise_move(c.location, self.blocked_locations)
-                process_arrival(c, new_loc, self.log)
+                new_loc = calculate_sunrise_move(c.location, locations_mask(self.blocked_locations))
+                process_arrival(c, new_loc, self.roster)
 
     def phase_dusk(self):
         self.log("\n🌅 === 黃昏階段 ===")
         for c in self.characters:
-            self.ability_engine.run(c, self.characters, 'dusk', self.log)
+            self.ability_engine.run(c, self.roster, 'dusk')
         self._check_foreshadowing_events('dusk')
 
     def phase_night(self):
         self.log("\n🌃 === 夜晚階段 ===")
         for c in self.characters:
-            self.ability_engine.run(c, self.characters, 'night', self.log)
-        
-        # 處理新死者生成墓碑
-        for c in self.characters:
-            if c.is_dead and not any(g.name == c.name for g in self.graves):
-                self.graves.append(Grave(c.name, c.location, self.day))
-                self.log(f"⚰️ {c.name} 的墓碑立於 Loc {c.location}")
-
+            self.ability_engine.run(c, self.roster, 'night')
+        # 墓碑已在死亡當下 (_on_death) 建立
         self._check_game_over()
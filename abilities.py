@@ -1,74 +1,172 @@
 # abilities.py
 import random
+from collections import OrderedDict
+from functools import partial
 from mechanics import check_sanity_status
+from models import SYMBOLS
+from events import KILL, INTRIGUE_GAIN, SANITY_CHANGE, CAUSE_ABILITY, MOVE_ABILITY
+
+PHASES = ('sunrise', 'dusk', 'night')
+COMPILED_CACHE_SIZE = 32  # 最多保留幾份 Role_Data 的編譯結果 (平衡掃描會產生許多覆寫版本)
 
 class AbilityEngine:
-    def __init__(self, role_metadata):
+    # Role_Data 中的名稱 -> 實作方法
+    TARGET_LOGIC = {
+        "random_other_in_loc": "_target_random_other",
+        "all_others_in_loc": "_target_all_others",
+        "vampire_logic": "_target_vampire",
+        "role_location": "_target_role_location",
+    }
+    EFFECTS = {
+        "kill": "_effect_kill",
+        "add_intrigue": "_effect_add_intrigue",
+        "sanity_damage": "_effect_sanity_damage",
+        "teleport": "_effect_teleport",
+    }
+    # 編譯結果與引擎實例無關 (函式呼叫時才傳入 self)，同一份 Role_Data 全行程共用。
+    # 以 id 為鍵的 LRU：項目同時持有 Role_Data 本身，在快取中時 id 不會被重用；超過上限就丟掉最久沒用的
+    _compiled_cache = OrderedDict()
+
+    def __init__(self, role_metadata, rng=random):
         """
         :param role_metadata: 來自 scripts.json 的 Role_Data 區塊
+        :param rng: 引擎自己的 random.Random
+        載入時即把每個身分編譯成 (觸發階段, 目標函式, 效果函式)，未知的名稱直接報錯
         """
         self.metadata = role_metadata
+        self.rng = rng
+        # 以身分 ID 為鍵，熱路徑只做整數查表
+        self.compiled_roles = self._compile_metadata(role_metadata)
+        # 每個階段實際會發動能力的 (actor, 目標函式, 效果函式)，由 compile() 依劇本角色產生
+        self.phase_table = {phase: [] for phase in PHASES}
+
+    @classmethod
+    def _compile_metadata(cls, role_metadata):
+        key = id(role_metadata)
+        cached = cls._compiled_cache.get(key)
+        if cached is not None and cached[0] is role_metadata:
+            cls._compiled_cache.move_to_end(key)
+            return cached[1]
+        compiled = {SYMBOLS.intern(role): cls._compile_role(role, config)
+                    for role, config in role_metadata.items()}
+        cls._compiled_cache[key] = (role_metadata, compiled)
+        if len(cls._compiled_cache) > COMPILED_CACHE_SIZE:
+            cls._compiled_cache.popitem(last=False)
+        return compiled
+
+    @classmethod
+    def _compile_role(cls, role, config):
+        """把單一身分的設定綁定成可直接呼叫的函式 (第一個參數為 AbilityEngine)"""
+        trigger = config.get("trigger")
+        if trigger not in PHASES:
+            raise ValueError(f"身分 {role} 的觸發階段未知: {trigger}")
+        target_logic = config.get("target")
+        if target_logic not in cls.TARGET_LOGIC:
+            raise ValueError(f"身分 {role} 的目標邏輯未知: {target_logic}")
+        effect_type = config.get("effect")
+        if effect_type not in cls.EFFECTS:
+            raise ValueError(f"身分 {role} 的效果未知: {effect_type}")
+
+        get_targets = getattr(cls, cls.TARGET_LOGIC[target_logic])
+        if target_logic == "role_location":
+            get_targets = partial(get_targets, target_role=SYMBOLS.intern(config.get("target_role")))
+        apply_effect = getattr(cls, cls.EFFECTS[effect_type])
+        if effect_type == "sanity_damage":
+            apply_effect = partial(apply_effect, value=config.get("value", 0))
+        return trigger, get_targets, apply_effect
+
+    def compile(self, characters):
+        """劇本建立後呼叫一次：依名冊順序把有能力的角色分配到各階段的清單"""
+        self.phase_table = {phase: [] for phase in PHASES}
+        for c in characters:
+            compiled = self.compiled_roles.get(c.role_id)
+            if compiled:
+                trigger, get_targets, apply_effect = compiled
+                self.phase_table[trigger].append((c, get_targets, apply_effect))
+        return self.phase_table
+
+    def fork(self, characters, rng):
+        """為引擎分身建立能力引擎：共用 Role_Data 與編譯結果，重新綁定亂數與角色"""
+        twin = AbilityEngine(self.metadata, rng)
+        twin.compile(characters)
+        return twin
+
+    # --- 目標選擇邏輯 (透過名冊索引，只看同地點的人) ---
+
+    def _target_random_other(self, actor, roster):
+        others_in_loc = roster.others_at(actor)
+        return [self.rng.choice(others_in_loc)] if others_in_loc else []
+
+    def _target_all_others(self, actor, roster):
+        return roster.others_at(actor)
+
+    def _target_vampire(self, actor, roster):
+        # 只有當現場剛好只有 2 人時觸發 (actor 自己 + 1 人)
+        others_in_loc = roster.others_at(actor)
+        return others_in_loc if len(others_in_loc) == 1 else []
+
+    def _target_role_location(self, actor, roster, target_role=None):
+        # 尋找特定角色的位置
+        target_char = roster.first_with_role(target_role)
+        return [target_char] if target_char else []
 
-    def _get_targets(self, actor, all_chars, target_logic, extra_params):
-        """核心：目標選擇邏輯"""
-        others_in_loc = [c for c in all_chars if c.location == actor.location and c != actor and not c.is_dead]
-        
-        if target_logic == "random_other_in_loc":
-            return [random.choice(others_in_loc)] if others_in_loc else []
-        
-        elif target_logic == "all_others_in_loc":
-            return others_in_loc
-            
-        elif target_logic == "vampire_logic":
-            # 只有當現場剛好只有 2 人時觸發
-            full_loc_list = [c for c in all_chars if c.location == actor.location and not c.is_dead]
-            if len(full_loc_list) == 2:
-                return [c for c in full_loc_list if c != actor]
-            return []
-
-        elif target_logic == "role_location":
-            # 尋找特定角色的位置
-            target_role = extra_params.get("target_role")
-            target_char = next((c for c in all_chars if c.role == target_role and not c.is_dead), None)
-            return [target_char] if target_char else []
-
-        return []
-
-    def _apply_effect(self, actor, target, effect_type, value, log_func):
-        """核心：效果執行邏輯"""
-        if effect_type == "kill":
-            target.is_dead = True
-            log_func(f"   🔪 {actor.name} 殺害了 {target.name}。")
-            
-        elif effect_type == "add_intrigue":
-            if target.intrigue == 0:
-                target.intrigue = 1
-                log_func(f"   😈 {actor.name} 使 {target.name} 陷入陰謀。")
-                
-        elif effect_type == "sanity_damage":
-            target.sanity -= value
-            log_func(f"   🗣️ {actor.name} 的影響使 {target.name} 精神下降。")
-            check_sanity_status(target, log_func)
-            
-        elif effect_type == "teleport":
-            # 這裡的 target 其實是我們想要移動到的目標人物
-            if actor.location != target.location:
-                actor.location = target.location
-                log_func(f"   🏃 {actor.name} 追蹤目標移動到了 Loc {target.location}。")
-
-    def run(self, actor, all_chars, phase, log_func):
+    # --- 效果執行邏輯 ---
+
+    def _effect_kill(self, actor, target, roster):
+        roster.events.emit(KILL, actor, target)
+        roster.kill(target)
+
+    def _effect_add_intrigue(self, actor, target, roster):
+        if target.intrigue == 0:
+            target.intrigue = 1
+            roster.events.emit(INTRIGUE_GAIN, target, actor, CAUSE_ABILITY)
+
+    def _effect_sanity_damage(self, actor, target, roster, value=0):
+        old = target.sanity
+        target.sanity -= value
+        roster.events.emit(SANITY_CHANGE, target, old, target.sanity, actor)
+        check_sanity_status(target, roster.events)
+
+    def _effect_teleport(self, actor, target, roster):
+        # 這裡的 target 其實是我們想要移動到的目標人物
+        if actor.location != target.location:
+            roster.move(actor, target.location, MOVE_ABILITY)
+
+    # --- 執行 ---
+
+    def run_phase(self, phase, roster):
+        """只走訪本階段有能力的角色 (一般人不會出現在清單中)
+        結果以事件 (KILL / SANITY_CHANGE / ...) 經由 roster.events 發出
         """
-        根據角色設定執行能力
+        for actor, get_targets, apply_effect in self.phase_table[phase]:
+            if actor.is_dead:
+                continue
+            for t in get_targets(self, actor, roster):
+                apply_effect(self, actor, t, roster)
+
+    def run_phase_profiled(self, phase, roster, profiler):
+        """run_phase 的計時版本 (由 profiler.Profiler.attach 換上)：記錄每次身分發動與每個效果的耗時"""
+        clock = profiler.clock
+        for actor, get_targets, apply_effect in self.phase_table[phase]:
+            if actor.is_dead:
+                continue
+            start = clock()
+            for t in get_targets(self, actor, roster):
+                effect_start = clock()
+                apply_effect(self, actor, t, roster)
+                profiler.observe_effect(apply_effect, clock() - effect_start)
+            profiler.observe_role(actor.role_id, clock() - start)
+
+    def run(self, actor, roster, phase):
+        """
+        對單一角色執行能力 (相容舊介面；引擎主流程請用 run_phase)
+        :param roster: GameEngine 持有的 Roster (地點/身分索引)
         """
         if actor.is_dead: return
-        
-        config = self.metadata.get(actor.role)
-        if not config or config["trigger"] != phase:
-            return
 
-        # 1. 獲取目標
-        targets = self._get_targets(actor, all_chars, config["target"], config)
-        
-        # 2. 執行效果
-        for t in targets:
-            self._apply_effect(actor, t, config["effect"], config.get("value", 0), log_func)
+        compiled = self.compiled_roles.get(actor.role_id)
+        if not compiled or compiled[0] != phase:
+            return
+        _, get_targets, apply_effect = compiled
+        for t in get_targets(self, actor, roster):
+            apply_effect(self, actor, t, roster)
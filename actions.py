@@ -1,5 +1,5 @@
 # actions.py
-import random
+from events import AP_SPEND, MOVE_PLAYER
 
 class ActionManager:
     def __init__(self, engine):
@@ -8,6 +8,11 @@ class ActionManager:
         """
         self.engine = engine
 
+    def _spend(self, char, action, cost):
+        """扣除 AP 並發出 AP_SPEND 事件"""
+        self.engine.ap -= cost
+        self.engine.events.emit(AP_SPEND, char, action, cost, self.engine.ap)
+
     def can_perform_action(self, char):
         """通用檢查：人物是否存活且還有行動點"""
         if char.is_dead:
@@ -26,24 +31,25 @@ class ActionManager:
         success, msg = self.can_perform_action(char)
         if not success: return False, msg
 
-        # 1. 計算移動成本 (預設 1 AP)
-        cost = 1
+        # 1. 計算移動成本 (依地圖：預設任何地點 1 AP，move_cost=distance 的地圖依最短距離)
+        game_map = self.engine.map
+        if not 0 <= target_loc_id < game_map.size:
+            return False, "❓ 無效的地點。"
+        cost = game_map.move_cost_to(char.location, target_loc_id)
+        if cost is None:
+            return False, f"🚧 無法從 Loc {char.location} 抵達 Loc {target_loc_id}。"
+        if self.engine.ap < cost:
+            return False, f"🚫 AP 不足 (前往 Loc {target_loc_id} 需 {cost} AP)。"
         
-        # [劇本規則] 全域封鎖 (321): 進入隔離區 (Loc 1) 需 2 AP
-        if self.engine.sub_rule == "lockdown" and target_loc_id == 1:
-            cost = 2
+        # [劇本規則] 封鎖、監禁等的成本加成 (rules.py 的 move_cost 掛鉤)
+        for modify in self.engine.rules.move_cost:
+            cost, short_msg = modify(self.engine, char, target_loc_id, cost)
             if self.engine.ap < cost:
-                return False, "🚨 [封鎖] AP 不足 (進入隔離區需 2 AP)。"
+                return False, short_msg
 
-        # [劇本規則] 監禁 (222): 所有移動 AP 消耗加倍
-        if self.engine.sub_rule == "high_cost_move":
-            cost *= 2
-            if self.engine.ap < cost:
-                return False, "⛓️ [監禁] 體力消耗劇增，AP 不足。"
-
-        # 2. 執行移動
-        char.location = target_loc_id
-        self.engine.ap -= cost
+        # 2. 執行移動 (經由名冊，維護地點索引)
+        self.engine.roster.move(char, target_loc_id, MOVE_PLAYER)
+        self._spend(char, "move", cost)
         
         # 3. 觸發抵達邏輯 (從 mechanics 呼叫，但由 controller 統一控管)
         # 這裡我們甚至可以把 mechanics.process_arrival 的輸出捕獲回來
@@ -59,16 +65,16 @@ class ActionManager:
 
         # 1. 計算成本
         cost = 1
-        # [劇本規則] 情報商 (223): 詢問僅需 0 AP (如果還有剩餘 AP)
-        if self.engine.sub_rule == "cheap_ask":
-            cost = 0
+        # [劇本規則] 例如情報商 (223): 詢問僅需 0 AP (rules.py 的 ask_cost 掛鉤)
+        for modify in self.engine.rules.ask_cost:
+            cost = modify(self.engine, char, cost)
 
         # 2. 執行詢問邏輯
-        loc_chars = [c for c in self.engine.characters if c.location == char.location and c != char and not c.is_dead]
+        loc_chars = self.engine.roster.others_at(char)
         
         if loc_chars:
-            target = random.choice(loc_chars)
-            self.engine.ap -= cost
+            target = self.engine.rng.choice(loc_chars)
+            self._spend(char, "ask", cost)
             # 標記目標為已知 (以便 UI 顯示真實身份)
             target.known = True 
             info = f"🕵️ 詢問 {target.name}: [身份:{target.role} | 精神:{target.sanity}]"
@@ -76,6 +82,17 @@ class ActionManager:
         else:
             return False, "❓ 這裡沒有其他活人可以詢問。"
 
+    def rest(self):
+        """
+        放棄剩餘的行動點，讓回合可以結束
+        返回: (bool 成功與否, str 訊息回饋)
+        """
+        if self.engine.is_game_over:
+            return False, "🏁 遊戲已結束。"
+        if self.engine.ap > 0:
+            self._spend(self.engine.characters[0], "rest", self.engine.ap)
+        return True, "💤 放棄剩餘行動點。"
+
     def end_turn(self):
         """
         結束玩家階段，推進遊戲至黃昏與夜晚
@@ -97,7 +114,7 @@ class ActionManager:
         if not self.engine.is_game_over:
             self.engine.phase_sunrise()
             self.engine.phase_morning()
-            self.engine.ap = 5 
+            self.engine.ap = self.engine.daily_ap
             return True, f"☀️ 新的一天開始 (Day {self.engine.day})。"
         
         return True, "🌃 夜晚結束。"
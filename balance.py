@@ -0,0 +1,336 @@
+# balance.py
+"""
+自適應抽樣的平衡掃描：參數格點 × 劇本組合，每一格 (cell) 分批跑遊戲，
+以 Wilson 信賴區間追蹤勝率，區間夠窄、或已明確高於 / 低於目標時就停止該格，
+剩下的運算量集中給仍不確定的格子。
+
+    python balance.py --param max_days=3,4,5 --param daily_ap=4,5 --triples 40
+    python balance.py --param role.煽動者.value=1,2 --target 0.6 --half-width 0.05 --budget 200000
+
+參數：
+- max_days / daily_ap / initial_sanity      引擎的數值 (見 GameEngine 的 tuning)
+- role.<身分>.<欄位>                        覆寫 Role_Data 已有的欄位 (例如 value、target)
+
+第 k 格的第 i 局種子只由 (master_seed, k, i) 決定，結果與批次大小、行程數無關。
+同一格連續檢查多次會讓誤判機率累積，因此預設信心水準取得比一般報告高 (99%)。
+"""
+import argparse
+import copy
+import itertools
+import json
+import math
+import os
+import random
+import statistics
+import time
+from multiprocessing import Pool
+
+from abilities import AbilityEngine
+from catalog import get_catalog, PART_KINDS
+from seeding import derive_seed
+from simulator import POLICIES, play_game, summarize_game
+
+ENGINE_PARAMS = ("max_days", "daily_ap", "initial_sanity")
+
+# 格子狀態
+RUNNING = "running"
+TIGHT = "tight"   # 區間半寬已小於要求
+ABOVE = "above"   # 區間整個高於目標
+BELOW = "below"   # 區間整個低於目標
+BUDGET = "budget" # 預算用完仍未確定
+
+
+def wilson_interval(wins, n, z):
+    """勝率的 Wilson 分數區間 (n 小或勝率接近 0/1 時仍可靠)，返回 (下界, 上界)"""
+    if n == 0:
+        return 0.0, 1.0
+    p = wins / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+
+def z_for(confidence):
+    return statistics.NormalDist().inv_cdf(1 - (1 - confidence) / 2)
+
+
+def fixed_sample_size(half_width, z):
+    """固定樣本數的設計：最壞情況 (勝率 0.5) 下區間半寬達到要求所需的局數"""
+    return math.ceil((z / (2 * half_width)) ** 2)
+
+
+# --- 參數格點 ---
+
+def parse_param(text):
+    """'max_days=3,4,5' -> ('max_days', [3, 4, 5])"""
+    name, _, values = text.partition("=")
+    name = name.strip()
+    if not values:
+        raise argparse.ArgumentTypeError(f"參數格式應為 名稱=值1,值2: {text}")
+    if name not in ENGINE_PARAMS and not (name.startswith("role.") and name.count(".") == 2):
+        raise argparse.ArgumentTypeError(f"未知的參數: {name} (可用 {', '.join(ENGINE_PARAMS)} 或 role.<身分>.<欄位>)")
+    convert = _number if name in ENGINE_PARAMS else _role_value
+    return name, [convert(v.strip()) for v in values.split(",")]
+
+
+def _number(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _role_value(text):
+    """身分欄位可能是數字 (value) 或名稱 (effect / target / trigger)"""
+    try:
+        return _number(text)
+    except ValueError:
+        return text
+
+
+def param_grid(params):
+    """[(名稱, [值...])] -> 所有組合的 dict 清單 (沒有參數時只有一個空組合 = 預設值)"""
+    names = [name for name, _ in params]
+    return [dict(zip(names, values)) for values in itertools.product(*(values for _, values in params))]
+
+
+_TUNINGS = {}  # 參數組合 -> tuning dict (同一組合共用同一個 role_data，能力編譯快取才有效)
+
+
+def make_tuning(setting):
+    key = tuple(sorted(setting.items()))
+    tuning = _TUNINGS.get(key)
+    if tuning is None:
+        tuning = {name: value for name, value in setting.items() if name in ENGINE_PARAMS}
+        role_overrides = [(name.split(".")[1:], value) for name, value in setting.items() if name.startswith("role.")]
+        if role_overrides:
+            role_data = copy.deepcopy(get_catalog().role_data)
+            for (role, field), value in role_overrides:
+                if role not in role_data:
+                    raise ValueError(f"Role_Data 中沒有身分: {role}")
+                if field not in role_data[role]:
+                    raise ValueError(f"身分 {role} 沒有欄位: {field} (可用 {', '.join(role_data[role])})")
+                role_data[role][field] = value
+            tuning["role_data"] = role_data
+        _TUNINGS[key] = tuning
+    return tuning
+
+
+# --- 格子 ---
+
+class Cell:
+    """一組參數 × 一個劇本組合的勝率估計"""
+    def __init__(self, index, setting, triple_ids):
+        self.index = index
+        self.setting = setting
+        self.triple_ids = triple_ids
+        self.games = 0
+        self.wins = 0
+        self.status = RUNNING
+        self.interval = (0.0, 1.0)
+
+    @property
+    def win_rate(self):
+        return self.wins / self.games if self.games else 0.0
+
+    @property
+    def half_width(self):
+        return (self.interval[1] - self.interval[0]) / 2
+
+    def update(self, wins, games, z, target, half_width, min_games):
+        self.games += games
+        self.wins += wins
+        self.interval = wilson_interval(self.wins, self.games, z)
+        if self.games < min_games:
+            return
+        low, high = self.interval
+        if self.half_width <= half_width:
+            self.status = TIGHT
+        elif target is not None and low > target:
+            self.status = ABOVE
+        elif target is not None and high < target:
+            self.status = BELOW
+
+
+def _run_batch(task):
+    """Worker：跑某一格編號 [first, first + n) 的遊戲，返回 (格子編號, 勝場, 局數)"""
+    cell_index, setting, triple_ids, first, n, master_seed, policy_name = task
+    catalog = get_catalog()
+    parts = [catalog.get_part(kind, part_id) for kind, part_id in zip(PART_KINDS, triple_ids)]
+    tuning = make_tuning(setting)
+    policy = POLICIES[policy_name]()
+    wins = 0
+    for game_index in range(first, first + n):
+        engine = play_game(policy, derive_seed(master_seed, cell_index, game_index), parts, tuning=tuning)
+        wins += summarize_game(engine)[1]
+    return cell_index, wins, n
+
+
+class Sweep:
+    """
+    自適應掃描。每一輪：
+    1. 仍在跑的格子依目前的區間半寬排序，最不確定的優先
+    2. 每格分到 batch 局 (預算不夠時只分給排在前面的格子)
+    3. 批次結果回來後更新區間，達到停止條件的格子不再分配
+    """
+    def __init__(self, settings, triples, policy="random", target=None, half_width=0.05, confidence=0.99,
+                 batch=20, min_games=20, budget=None, seed=0):
+        self.cells = [Cell(i, setting, tuple(part['id'] for part in triple))
+                      for i, (setting, triple) in enumerate(itertools.product(settings, triples))]
+        self.policy = policy
+        self.target = target
+        self.half_width = half_width
+        self.z = z_for(confidence)
+        self.batch = batch
+        self.min_games = min_games
+        self.budget = budget
+        self.seed = seed
+        self.total_games = 0
+        self.rounds = 0
+        for setting in settings:
+            # 參數錯誤 (身分 / 欄位不存在、效果或目標不合法) 在開跑前就報錯
+            tuning = make_tuning(setting)
+            if "role_data" in tuning:
+                AbilityEngine(tuning["role_data"])
+
+    def active(self):
+        return [cell for cell in self.cells if cell.status == RUNNING]
+
+    def _plan(self):
+        """本輪要跑的 (格子, 局數)"""
+        cells = sorted(self.active(), key=lambda c: c.half_width, reverse=True)
+        plan = []
+        remaining = None if self.budget is None else self.budget - self.total_games
+        for cell in cells:
+            n = self.batch
+            if remaining is not None:
+                n = min(n, remaining)
+                if n <= 0:
+                    break
+                remaining -= n
+            plan.append((cell, n))
+        return plan
+
+    def run(self, processes=1, progress=None):
+        pool = Pool(processes) if processes > 1 else None
+        try:
+            while True:
+                plan = self._plan()
+                if not plan:
+                    break
+                self.rounds += 1
+                tasks = [(cell.index, cell.setting, cell.triple_ids, cell.games, n, self.seed, self.policy)
+                         for cell, n in plan]
+                results = pool.imap_unordered(_run_batch, tasks) if pool else map(_run_batch, tasks)
+                for cell_index, wins, n in results:
+                    self.cells[cell_index].update(wins, n, self.z, self.target, self.half_width, self.min_games)
+                    self.total_games += n
+                if progress:
+                    progress(self)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        for cell in self.active():
+            cell.status = BUDGET
+        return self
+
+    def fixed_cost(self):
+        """若每格都跑固定局數 (最壞情況也能達到要求的半寬)，總共需要的局數"""
+        return fixed_sample_size(self.half_width, self.z) * len(self.cells)
+
+    def by_setting(self):
+        """把同一組參數的所有格子合併 (各劇本組合等權重)，返回 [(參數, 局數, 平均勝率)]"""
+        groups = {}
+        for cell in self.cells:
+            groups.setdefault(tuple(cell.setting.items()), []).append(cell)
+        return [(dict(key), sum(c.games for c in cells), sum(c.win_rate for c in cells) / len(cells))
+                for key, cells in groups.items()]
+
+
+# --- 報告 ---
+
+def _format_setting(setting):
+    return " ".join(f"{k}={v}" for k, v in setting.items()) or "(預設)"
+
+
+def print_report(sweep, wall_seconds, show_cells=20):
+    statuses = {}
+    for cell in sweep.cells:
+        statuses[cell.status] = statuses.get(cell.status, 0) + 1
+    fixed = sweep.fixed_cost()
+    print(f"\n📊 {len(sweep.cells)} 格，{sweep.rounds} 輪，共 {sweep.total_games} 局 ({wall_seconds:.1f}s)")
+    print(f"   狀態: " + ", ".join(f"{status} {n}" for status, n in sorted(statuses.items())))
+    print(f"   固定樣本數設計需 {fixed} 局 (每格 {fixed // max(len(sweep.cells), 1)} 局)，"
+          f"節省 {fixed / max(sweep.total_games, 1):.1f} 倍")
+
+    print(f"\n{'參數':<40} {'局數':>8} {'平均勝率':>8}")
+    for setting, games, rate in sweep.by_setting():
+        print(f"{_format_setting(setting):<40} {games:>8} {rate:>8.2%}")
+
+    if show_cells:
+        print(f"\n最不確定的 {show_cells} 格：")
+        print(f"{'參數':<30} {'劇本':<12} {'局數':>6} {'勝率':>7} {'區間':>16} 狀態")
+        for cell in sorted(sweep.cells, key=lambda c: c.half_width, reverse=True)[:show_cells]:
+            low, high = cell.interval
+            print(f"{_format_setting(cell.setting):<30} {'/'.join(cell.triple_ids):<12} {cell.games:>6} "
+                  f"{cell.win_rate:>7.2%} [{low:6.2%}, {high:6.2%}] {cell.status}")
+
+
+def write_json(sweep, path):
+    payload = {"target": sweep.target, "half_width": sweep.half_width, "z": sweep.z,
+               "total_games": sweep.total_games, "fixed_cost": sweep.fixed_cost(),
+               "cells": [{"setting": c.setting, "parts": c.triple_ids, "games": c.games, "wins": c.wins,
+                          "interval": c.interval, "status": c.status} for c in sweep.cells]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 已寫入 {path}")
+
+
+def select_triples(count, seed):
+    """全部合法組合，或均勻抽 count 個 (不重複)"""
+    space = get_catalog().triples
+    if not count or count >= len(space):
+        return list(space)
+    return [space[i] for i in sorted(random.Random(seed).sample(range(len(space)), count))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LOOP 自適應平衡掃描")
+    parser.add_argument("--param", type=parse_param, action="append", default=[], metavar="NAME=V1,V2",
+                        help="掃描的參數 (可重複)；例如 max_days=3,4,5 或 role.煽動者.value=1,2")
+    parser.add_argument("--triples", type=int, default=0, help="只抽這麼多個劇本組合 (0 = 全部)")
+    parser.add_argument("-p", "--policy", choices=sorted(POLICIES), default="random", help="玩家策略")
+    parser.add_argument("--target", type=float, help="目標勝率；區間確定高於或低於目標時提早停止")
+    parser.add_argument("--half-width", type=float, default=0.05, help="區間半寬小於此值即停止")
+    parser.add_argument("--confidence", type=float, default=0.99, help="信賴水準")
+    parser.add_argument("--batch", type=int, default=20, help="每格每輪的局數")
+    parser.add_argument("--min-games", type=int, default=20, help="每格至少跑的局數 (之前不判定停止)")
+    parser.add_argument("--budget", type=int, help="總局數上限")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count() or 1, help="行程數")
+    parser.add_argument("--seed", type=int, default=0, help="主亂數種子")
+    parser.add_argument("--show", type=int, default=20, help="報告中列出的格子數")
+    parser.add_argument("--json", metavar="PATH", help="把每格的結果寫入 JSON")
+    args = parser.parse_args(argv)
+
+    triples = select_triples(args.triples, args.seed)
+    try:
+        sweep = Sweep(param_grid(args.param), triples, args.policy, args.target, args.half_width, args.confidence,
+                      args.batch, args.min_games, args.budget, args.seed)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"🎛️ {len(sweep.cells)} 格 ({len(sweep.cells) // len(triples)} 組參數 × {len(triples)} 個劇本組合)")
+
+    def progress(s):
+        print(f"  第 {s.rounds} 輪：累計 {s.total_games} 局，尚未確定 {len(s.active())} 格")
+
+    start = time.perf_counter()
+    sweep.run(args.processes, progress)
+    print_report(sweep, time.perf_counter() - start, args.show)
+    if args.json:
+        write_json(sweep, args.json)
+
+
+if __name__ == "__main__":
+    main()
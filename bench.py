@@ -0,0 +1,357 @@
+# bench.py
+"""
+效能基準測試：劇本建立、引擎初始化、各階段、能力引擎 (不同名冊大小)、整局吞吐量與畫面繪製。
+每個項目重複多輪，記錄「每次操作耗時」的最小值 / 中位數 / 標準差；結果可存成 JSON 基準檔，
+之後以 --compare 比較：最佳一輪 (min) 變慢超過門檻、且差距大於量測本身的波動 (標準差) 時，
+以非 0 狀態結束 (可放進 CI)。計時期間停用 GC (同 timeit)，避免回收剛好落在某一輪。
+
+    python bench.py --save bench_baseline.json
+    python bench.py --compare bench_baseline.json --threshold 0.25
+    python bench.py -k phase            # 只跑名稱含 phase 的項目
+
+繪製相關項目使用離屏顯示 (pygame: SDL_VIDEODRIVER=dummy)；
+沒有 pygame 或沒有 Tk 顯示器時該項目標記為 skipped。
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from main import GameEngine
+from scenario_gen import ScenarioBuilder
+from abilities import AbilityEngine, PHASES
+from catalog import get_catalog
+from models import Character
+from roster import Roster
+from settings import NUM_LOCATIONS
+import simulator
+
+DEFAULT_ROUNDS = 7
+ROSTER_SIZES = (8, 32, 128)
+
+
+class Skip(Exception):
+    """環境不支援此項目 (例如沒有顯示器)"""
+
+
+# --- 計時 ---
+
+class _NoGC:
+    """計時區段內停用 GC，開始前先回收一次 (離開時恢復原本的設定)"""
+    def __enter__(self):
+        self.enabled = gc.isenabled()
+        gc.collect()
+        gc.disable()
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            gc.enable()
+
+
+def measure(setup, op, number, rounds):
+    """
+    每輪先呼叫 setup() 取得狀態，再計時 number 次 op(state)；返回各輪的「每次操作秒數」。
+    setup 的耗時不計入。
+    """
+    samples = []
+    for _ in range(rounds):
+        state = setup()
+        with _NoGC():
+            start = time.perf_counter()
+            for _ in range(number):
+                op(state)
+            samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def measure_reset(make, reset, op, number, rounds):
+    """每次操作前都要重置狀態時使用 (重置不計時)"""
+    samples = []
+    for _ in range(rounds):
+        state = make()
+        total = 0.0
+        with _NoGC():
+            for _ in range(number):
+                reset(state)
+                start = time.perf_counter()
+                op(state)
+                total += time.perf_counter() - start
+        samples.append(total / number)
+    return samples
+
+
+# --- 項目 ---
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+@benchmark("scenario_build")
+def bench_scenario_build(rounds):
+    builder = ScenarioBuilder()
+    rng = random.Random(0)
+    return measure(lambda: None, lambda _: builder.build(rng=rng), 500, rounds)
+
+
+@benchmark("engine_init")
+def bench_engine_init(rounds):
+    seeds = iter(range(10 ** 9))
+    return measure(lambda: None, lambda _: GameEngine(seed=next(seeds), silent=True), 300, rounds)
+
+
+PHASE_SEEDS = 32   # 階段項目使用的劇本數 (單一劇本可能剛好沒有能力發動)
+PHASE_COPIES = 16  # 每個劇本準備的分身數
+
+
+def _phase_bench(phase_name):
+    """
+    階段會改變狀態，而單次呼叫只有幾微秒，逐次計時誤差太大。
+    因此每輪先準備好一批未執行過的分身 (不計時)，再整批計時各呼叫一次。
+    """
+    def run(rounds):
+        engines = [GameEngine(seed=seed, silent=True) for seed in range(PHASE_SEEDS)]
+
+        def setup():
+            return [getattr(e.clone(), phase_name) for e in engines for _ in range(PHASE_COPIES)]
+
+        def op(phases):
+            for phase in phases:
+                phase()
+
+        batch = PHASE_SEEDS * PHASE_COPIES
+        return [t / batch for t in measure(setup, op, 1, rounds)]
+    return run
+
+
+for _phase in ("phase_sunrise", "phase_morning", "phase_dusk", "phase_night"):
+    benchmark(_phase)(_phase_bench(_phase))
+
+
+def _make_roster(size, seed=0):
+    """依 Role_Data 輪流分配身分，人數為 size 的名冊"""
+    rng = random.Random(seed)
+    roles = list(get_catalog().role_data) + ["一般人"]
+    characters = [Character(f"角色{i}", rng.choice("FM"), rng.randrange(NUM_LOCATIONS), roles[i % len(roles)])
+                  for i in range(size)]
+    return characters
+
+
+def _ability_bench(size):
+    def run(rounds):
+        def make():
+            characters = _make_roster(size)
+            engine = AbilityEngine(get_catalog().role_data, random.Random(0))
+            engine.compile(characters)
+            states = [(c.location, c.sanity, c.intrigue) for c in characters]
+            return engine, characters, states
+
+        def reset(state):
+            _, characters, states = state
+            for c, (loc, sanity, intrigue) in zip(characters, states):
+                c.location, c.sanity, c.intrigue, c.is_dead = loc, sanity, intrigue, False
+
+        def op(state):
+            engine, characters, _ = state
+            roster = Roster(characters)
+            for phase in PHASES:
+                for actor in characters:
+                    engine.run(actor, roster, phase)
+
+        return measure_reset(make, reset, op, 200, rounds)
+    return run
+
+
+for _size in ROSTER_SIZES:
+    benchmark(f"ability_run_{_size}")(_ability_bench(_size))
+
+
+@benchmark("full_game_random")
+def bench_full_game(rounds):
+    policy = simulator.RandomPolicy()
+    seeds = iter(range(10 ** 9))
+    return measure(lambda: None, lambda _: simulator.play_game(policy, seed=next(seeds)), 200, rounds)
+
+
+@benchmark("pygame_button_draw")
+def bench_button_draw(rounds):
+    try:
+        import pygame
+        import ui_components
+    except ImportError:
+        raise Skip("沒有安裝 pygame")
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    font = pygame.font.Font(None, 24)
+    buttons = [ui_components.Button(10 + i * 110, 10, 100, 30, f"移動 {i}", lambda: None) for i in range(6)]
+
+    def op(_):
+        for b in buttons:
+            b.draw(screen, font)
+    return measure(lambda: None, op, 500, rounds)
+
+
+@benchmark("pygame_frame")
+def bench_frame(rounds):
+    """一般情況的一幀：滑鼠偶爾換到別的按鈕、每 10 幀一條新日誌"""
+    try:
+        import pygame
+        import ui_components as ui
+    except ImportError:
+        raise Skip("沒有安裝 pygame")
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    font = pygame.font.Font(None, 24)
+
+    def setup():
+        logger = ui.GameLogger(echo=False)
+        buttons = [ui.Button(10 + i * 110, 10, 100, 30, f"移動 {i}", lambda: None) for i in range(6)]
+        layer = ui.RenderLayer(screen, font)
+        layer.add(*buttons, ui.LogPanel(pygame.Rect(10, 60, 780, 400), logger))
+        layer.render()
+        return layer, buttons, logger, iter(range(10 ** 9))
+
+    def op(state):
+        layer, buttons, logger, frames = state
+        frame = next(frames)
+        for b in buttons:
+            b.check_hover((20 + (frame // 30 % 6) * 110, 20))
+        if frame % 10 == 0:
+            logger.log(f"第 {frame} 幀的訊息")
+        layer.render()
+    return measure(setup, op, 600, rounds)
+
+
+@benchmark("tk_draw_map")
+def bench_draw_map(rounds):
+    try:
+        import tkinter as tk
+        import gui_main
+        root = tk.Tk()
+    except Exception as e:  # ImportError / TclError (沒有顯示器)
+        raise Skip(f"無法建立 Tk 視窗: {e}")
+    root.withdraw()
+    # GameGUI.__init__ 會建立整個視窗，這裡只組出 _draw_map 需要的部分
+    gui = gui_main.GameGUI.__new__(gui_main.GameGUI)
+    gui.engine = GameEngine(seed=1, silent=True)
+    gui.current_char = gui.engine.characters[0]
+    gui.location_names = gui._load_location_names()
+    gui.map_canvas = tk.Canvas(root, width=600, height=300)
+    gui.map_view = None
+
+    def setup():
+        # 每輪重建地圖，並把全部地點標記為變動 (最壞情況：等同整張重畫)
+        gui.map_canvas.delete("all")
+        gui.map_view = None
+        gui._draw_map()
+
+    def op(_):
+        gui.map_view.dirty_locs.update(range(gui.engine.map.size))
+        gui._draw_map()
+    try:
+        return measure(setup, op, 200, rounds)
+    finally:
+        root.destroy()
+
+
+# --- 執行與比較 ---
+
+def run_all(names, rounds):
+    results = {}
+    for name in names:
+        try:
+            samples = BENCHMARKS[name](rounds)
+        except Skip as e:
+            results[name] = {"skipped": str(e)}
+            print(f"  {name:<22} skipped ({e})")
+            continue
+        median = statistics.median(samples)
+        results[name] = {"median_us": median * 1e6, "min_us": min(samples) * 1e6,
+                         "stdev_us": statistics.stdev(samples) * 1e6 if len(samples) > 1 else 0.0,
+                         "rounds": len(samples)}
+        print(f"  {name:<22} {median * 1e6:>12.2f} µs  (min {min(samples) * 1e6:.2f})")
+    return results
+
+
+def compare(results, baseline, threshold, noise=3.0):
+    """
+    以最佳一輪 (min_us) 比較，返回變慢超過門檻的項目 [(名稱, 基準, 目前, 比例)]。
+    差距還必須超過 noise 倍的標準差 (基準與目前兩者取大)：每個項目依自己記錄到的波動決定雜訊下限，
+    微秒級、波動大的項目不會因為一次抖動就被判定退步。
+    """
+    regressions = []
+    print(f"\n{'項目':<22} {'基準 µs':>12} {'目前 µs':>12} {'變化':>8} {'雜訊 µs':>10}")
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base or "min_us" not in base or "min_us" not in current:
+            continue
+        floor = noise * max(base.get("stdev_us", 0.0), current.get("stdev_us", 0.0))
+        ratio = current["min_us"] / base["min_us"] - 1
+        slower = ratio > threshold and current["min_us"] - base["min_us"] > floor
+        flag = " ❌" if slower else ""
+        print(f"{name:<22} {base['min_us']:>12.2f} {current['min_us']:>12.2f} {ratio:>+8.1%} {floor:>10.2f}{flag}")
+        if slower:
+            regressions.append((name, base["min_us"], current["min_us"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LOOP 效能基準測試")
+    parser.add_argument("-k", "--filter", default="", help="只跑名稱包含此字串的項目")
+    parser.add_argument("-r", "--rounds", type=int, default=DEFAULT_ROUNDS, help="每個項目的輪數")
+    parser.add_argument("--save", metavar="PATH", help="把結果寫入 JSON 基準檔")
+    parser.add_argument("--compare", metavar="PATH", help="與 JSON 基準檔比較")
+    parser.add_argument("--threshold", type=float, default=0.25, help="最佳一輪變慢超過此比例視為退步")
+    parser.add_argument("--noise", type=float, default=3.0, help="差距還必須超過標準差 (基準與目前取大) 的這麼多倍")
+    parser.add_argument("--list", action="store_true", help="列出所有項目")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    print(f"⏱️ 執行 {len(names)} 個項目，每項 {args.rounds} 輪")
+    results = run_all(names, args.rounds)
+
+    if args.save:
+        payload = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                            "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "rounds": args.rounds},
+                   "results": results}
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 已寫入 {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold, args.noise)
+        if regressions:
+            # 可能只是量測當下機器忙碌：重跑疑似變慢的項目，保留較好的一次，仍變慢才算
+            print(f"\n🔁 重新量測 {len(regressions)} 個疑似變慢的項目")
+            for name, retry in run_all([r[0] for r in regressions], args.rounds).items():
+                if retry.get("min_us", float("inf")) < results[name]["min_us"]:
+                    results[name] = retry
+            regressions = compare({r[0]: results[r[0]] for r in regressions}, baseline, args.threshold, args.noise)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 個項目變慢超過 {args.threshold:.0%}")
+            return 1
+        print(f"\n✅ 沒有項目變慢超過 {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
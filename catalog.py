@@ -0,0 +1,269 @@
+# catalog.py
+"""
+劇本目錄 (ScenarioCatalog)：scripts.json 的唯一載入點。
+- 只解析一次並驗證格式，格式錯誤一律拋出 CatalogError
+- 預先建立查詢表 (依 id、依主題數字、合法劇本組合)
+- 以 pickle 二進位快取 (依檔案 mtime / 大小 / SHA-256) 跳過之後的 JSON 解析
+- 同一行程內的所有引擎共用同一個目錄物件 (get_catalog)
+"""
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import pickle
+import random
+
+from models import SYMBOLS
+from topology import DEFAULT_MAP, MapError, MapTopology
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(BASE_DIR, "scripts.json")
+CACHE_SUFFIX = ".cache"
+CACHE_VERSION = 1
+
+PART_KINDS = ("Main", "Sub", "Foreshadow")
+ROLE_FIELDS = ("trigger", "target", "effect")
+
+
+class CatalogError(ValueError):
+    """scripts.json 不存在、無法解析或格式不符"""
+
+
+def validate(data):
+    """檢查 Main/Sub/Foreshadow/Role_Data/Location_Names/Maps 的結構，錯誤時拋出 CatalogError"""
+    if not isinstance(data, dict):
+        raise CatalogError("劇本檔最外層必須是物件")
+
+    for kind in PART_KINDS:
+        parts = data.get(kind)
+        if not isinstance(parts, list):
+            raise CatalogError(f"缺少 {kind} 清單")
+        seen = set()
+        for i, part in enumerate(parts):
+            where = f"{kind}[{i}]"
+            if not isinstance(part, dict):
+                raise CatalogError(f"{where} 必須是物件")
+            part_id = part.get('id')
+            if not (isinstance(part_id, str) and len(part_id) == 3 and part_id.isdigit()):
+                raise CatalogError(f"{where} 的 id 必須是三位數字字串: {part_id!r}")
+            if part_id in seen:
+                raise CatalogError(f"{kind} 的 id 重複: {part_id}")
+            seen.add(part_id)
+            if not isinstance(part.get('name'), str):
+                raise CatalogError(f"{where} ({part_id}) 缺少 name")
+            roles = part.get('roles', [])
+            if not isinstance(roles, list):
+                raise CatalogError(f"{where} ({part_id}) 的 roles 必須是清單")
+            for j, role_info in enumerate(roles):
+                if not isinstance(role_info, dict):
+                    raise CatalogError(f"{where} ({part_id}) 的 roles[{j}] 必須是物件")
+                if not isinstance(role_info.get('name'), str) or not isinstance(role_info.get('count'), int):
+                    raise CatalogError(f"{where} ({part_id}) 的 roles 需要 name 與整數 count")
+                if role_info.get('gender') not in (None, "F", "M"):
+                    raise CatalogError(f"{where} ({part_id}) 的 gender 只能是 F/M/null")
+
+    role_data = data.get("Role_Data", {})
+    if not isinstance(role_data, dict):
+        raise CatalogError("Role_Data 必須是物件")
+    for role, config in role_data.items():
+        if not isinstance(config, dict):
+            raise CatalogError(f"Role_Data[{role}] 必須是物件")
+        missing = [field for field in ROLE_FIELDS if field not in config]
+        if missing:
+            raise CatalogError(f"Role_Data[{role}] 缺少欄位: {', '.join(missing)}")
+
+    location_names = data.get("Location_Names", {})
+    if not isinstance(location_names, dict):
+        raise CatalogError("Location_Names 必須是物件")
+    for key, names in location_names.items():
+        if not isinstance(names, list) or not all(isinstance(n, str) for n in names):
+            raise CatalogError(f"Location_Names[{key}] 必須是字串清單")
+
+    if not isinstance(data.get("Maps", {}), dict):
+        raise CatalogError("Maps 必須是物件")
+
+
+class TripleSpace:
+    """
+    所有合法的 (Main, Sub, Foreshadow) 組合 (三者主題數字互不相同)。
+    不展開成清單：以「主題數字組合」為區塊記錄起始編號，
+    任一編號可直接換算成組合，因此均勻抽樣與逐一走訪都不受劇本庫大小影響。
+    """
+    def __init__(self, by_theme):
+        self._starts = []
+        self._blocks = []
+        self._block_of = {}  # (主線, 支線, 伏筆主題數字) -> 區塊編號
+        # 各部件在自己主題清單中的位置 (反查編號用)
+        self._positions = {kind: {part['id']: i for parts in themes.values() for i, part in enumerate(parts)}
+                           for kind, themes in by_theme.items()}
+        total = 0
+        for dm, mains in sorted(by_theme["Main"].items()):
+            for ds, subs in sorted(by_theme["Sub"].items()):
+                if ds == dm:
+                    continue
+                for df, foreshadows in sorted(by_theme["Foreshadow"].items()):
+                    if df in (dm, ds):
+                        continue
+                    self._block_of[(dm, ds, df)] = len(self._blocks)
+                    self._starts.append(total)
+                    self._blocks.append((mains, subs, foreshadows))
+                    total += len(mains) * len(subs) * len(foreshadows)
+        self.total = total
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        """第 index 個組合 (0 <= index < total)"""
+        if not 0 <= index < self.total:
+            raise IndexError(index)
+        block = bisect.bisect_right(self._starts, index) - 1
+        mains, subs, foreshadows = self._blocks[block]
+        offset = index - self._starts[block]
+        offset, f = divmod(offset, len(foreshadows))
+        m, s = divmod(offset, len(subs))
+        return mains[m], subs[s], foreshadows[f]
+
+    def index(self, main_id, sub_id, foreshadow_id):
+        """__getitem__ 的反查：由三個部件 id 求組合編號 (不合法的組合拋出 KeyError)"""
+        block = self._block_of[(main_id[0], sub_id[0], foreshadow_id[0])]
+        _, subs, foreshadows = self._blocks[block]
+        m = self._positions["Main"][main_id]
+        s = self._positions["Sub"][sub_id]
+        f = self._positions["Foreshadow"][foreshadow_id]
+        return self._starts[block] + (m * len(subs) + s) * len(foreshadows) + f
+
+    def __iter__(self):
+        """依編號順序走訪全部組合 (用於完整覆蓋測試)"""
+        for mains, subs, foreshadows in self._blocks:
+            yield from itertools.product(mains, subs, foreshadows)
+
+    def sample(self, rng=random):
+        """均勻抽一個組合"""
+        if not self.total:
+            raise CatalogError("沒有任何主題數字互不相同的劇本組合")
+        return self[rng.randrange(self.total)]
+
+
+class ScenarioCatalog:
+    """已驗證、已建索引的劇本資料 (唯讀，供所有引擎共用)"""
+    def __init__(self, data, source=None):
+        validate(data)
+        self.data = data
+        self.source = source
+        self.role_data = data.get("Role_Data", {})
+        self.location_names = data.get("Location_Names", {})
+        self.maps = {}  # 主題鍵 ('1XX') -> MapTopology，查詢表在這裡一次算好
+        for key, config in data.get("Maps", {}).items():
+            try:
+                self.maps[key] = MapTopology.from_config(config)
+            except MapError as e:
+                raise CatalogError(f"Maps[{key}]: {e}")
+
+        # 預先編譯的查詢表
+        self.parts = {kind: data[kind] for kind in PART_KINDS}
+        self.by_id = {(kind, part['id']): part for kind in PART_KINDS for part in data[kind]}
+        self.by_theme = {kind: {} for kind in PART_KINDS}  # kind -> 主題數字 -> [part]
+        for kind in PART_KINDS:
+            for part in data[kind]:
+                self.by_theme[kind].setdefault(part['id'][0], []).append(part)
+        self.triples = TripleSpace(self.by_theme)
+
+        # 預先登錄所有身分名稱，角色只需保存整數 ID
+        for kind in PART_KINDS:
+            for part in data[kind]:
+                for role_info in part.get('roles', []):
+                    SYMBOLS.intern(role_info['name'])
+        for role, config in self.role_data.items():
+            SYMBOLS.intern(role)
+            if config.get("target_role"):
+                SYMBOLS.intern(config["target_role"])
+
+    def get_part(self, kind, part_id):
+        return self.by_id.get((kind, part_id))
+
+    def location_names_for(self, main_id, default=None):
+        """依主劇本 ID 的主題 (例如 '111' -> '1XX') 取得地點名稱"""
+        return self.location_names.get(f"{main_id[0]}XX", default)
+
+    def map_for(self, main_id):
+        """依主劇本 ID 的主題取得地圖；沒有定義時為預設的五個地點"""
+        return self.maps.get(f"{main_id[0]}XX", DEFAULT_MAP)
+
+    # --- 載入 ---
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_PATH, use_cache=True):
+        """載入劇本檔；快取有效時直接讀取二進位快取，不經過 JSON 解析"""
+        return cls(load_data(path, use_cache), source=path)
+
+
+def load_data(path=DEFAULT_PATH, use_cache=True):
+    """讀取劇本檔的原始 dict (不驗證)；快取有效時不經過 JSON 解析。編輯器也經由這裡開檔"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise CatalogError(f"找不到劇本檔案: {path}")
+
+    cache_path = path + CACHE_SUFFIX
+    cached = _read_cache(cache_path) if use_cache else None
+    if cached and cached["mtime_ns"] == stat.st_mtime_ns and cached["size"] == stat.st_size:
+        return cached["data"]
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached and cached["sha256"] == digest:
+        # 內容沒變 (例如只是被 touch 過)，沿用快取並更新 mtime
+        data = cached["data"]
+    else:
+        try:
+            data = json.loads(raw.decode("utf-8-sig"))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise CatalogError(f"JSON 檔案無法解析: {e}")
+
+    if use_cache:
+        _write_cache(cache_path, {"version": CACHE_VERSION, "mtime_ns": stat.st_mtime_ns,
+                                  "size": stat.st_size, "sha256": digest, "data": data})
+    return data
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("version") != CACHE_VERSION:
+        return None
+    return cached
+
+
+def _write_cache(cache_path, payload):
+    """寫入失敗 (例如唯讀檔案系統) 時靜默略過，快取只是加速用"""
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+# --- 行程內共用 ---
+
+_CATALOGS = {}
+
+
+def get_catalog(path=None, refresh=False):
+    """
+    取得共用的劇本目錄。第一次呼叫才會讀檔，之後直接返回記憶體中的物件
+    (不會再碰磁碟)；劇本檔更新後以 refresh=True 重新載入。
+    """
+    path = os.path.abspath(path) if path else DEFAULT_PATH
+    catalog = _CATALOGS.get(path)
+    if catalog is None or refresh:
+        catalog = ScenarioCatalog.from_file(path)
+        _CATALOGS[path] = catalog
+    return catalog
@@ -1,19 +1,183 @@
 ﻿# editor.py
+"""
+劇本編輯器 (開發工具)。劇本庫可能有數千個社群劇本，因此：
+- 資料經由 script_store.ScriptStore：儲存只附加變更日誌，完整檔案在背景壓實並原子替換
+- 左側清單是虛擬清單 (只有看得到的那幾列是 Listbox 項目)，可以搜尋名稱或 id
+- 輸入時先改記憶體中的資料，清單文字與變更紀錄延遲 DEBOUNCE_MS 後才更新
+- 角色配置的列會重複使用，切換劇本時不重建元件
+"""
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import ttk, messagebox
-import json
-import os
 
-FILE_PATH = "scripts.json"
+from script_store import ScriptStore
+
+DEBOUNCE_MS = 250
+GENDER_CHOICES = ["無", "F", "M"]
+
+
+class VirtualList:
+    """
+    只顯示可見範圍的清單：Listbox 的列數等於看得到的列數，捲軸位置由這裡換算。
+    items 為 (key, 文字) 清單；選取以 key 回報。
+    """
+    def __init__(self, parent, on_select):
+        self.on_select = on_select
+        self.frame = tk.Frame(parent)
+        self.listbox = tk.Listbox(self.frame, exportselection=False, activestyle="none")
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self._on_scrollbar)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.line_height = tkfont.Font(font=self.listbox.cget("font")).metrics("linespace") + 1
+        self.rows = 20
+        self.items = []
+        self.positions = {}  # key -> 在 items 中的位置
+        self.top = 0
+        self.shown = []      # Listbox 目前各列的文字
+        self.selected = None
+        self.listbox.bind("<<ListboxSelect>>", self._on_listbox_select)
+        self.listbox.bind("<Configure>", self._on_resize)
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll(-1 if e.delta > 0 else 1))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll(-1))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll(1))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def set_items(self, items):
+        self.items = items
+        self.positions = {key: i for i, (key, _) in enumerate(items)}
+        self.top = max(min(self.top, len(items) - self.rows), 0)
+        self.render()
+
+    def update_text(self, key, text):
+        """單一項目改名：只有在可見範圍內才動到 Listbox"""
+        i = self.positions.get(key)
+        if i is None:
+            return
+        self.items[i] = (key, text)
+        if self.top <= i < self.top + self.rows:
+            self.render()
+
+    def select(self, key):
+        """選取並捲到該項目"""
+        self.selected = key
+        i = self.positions.get(key)
+        if i is not None and not self.top <= i < self.top + self.rows:
+            self.top = max(min(i - self.rows // 2, len(self.items) - self.rows), 0)
+        self.render()
+
+    def scroll(self, delta):
+        top = max(min(self.top + delta, len(self.items) - self.rows), 0)
+        if top != self.top:
+            self.top = top
+            self.render()
+
+    def render(self):
+        """只改有變動的列"""
+        visible = [text for _, text in self.items[self.top:self.top + self.rows]]
+        for r, text in enumerate(visible):
+            if r >= len(self.shown):
+                self.listbox.insert(tk.END, text)
+            elif self.shown[r] != text:
+                self.listbox.delete(r)
+                self.listbox.insert(r, text)
+        if len(self.shown) > len(visible):
+            self.listbox.delete(len(visible), tk.END)
+        self.shown = visible
+
+        self.listbox.selection_clear(0, tk.END)
+        i = self.positions.get(self.selected)
+        if i is not None and self.top <= i < self.top + self.rows:
+            self.listbox.selection_set(i - self.top)
+
+        n = len(self.items)
+        if n > self.rows:
+            self.scrollbar.set(self.top / n, (self.top + self.rows) / n)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll(int(float(amount) * len(self.items)) - self.top)
+        elif action == "scroll":
+            self.scroll(int(amount) * (self.rows if unit == "pages" else 1))
+
+    def _on_resize(self, event):
+        rows = max(event.height // self.line_height, 1)
+        if rows != self.rows:
+            self.rows = rows
+            self.set_items(self.items)
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        i = self.top + selection[0]
+        if i < len(self.items):
+            self.selected = self.items[i][0]
+            self.on_select(self.selected)
+
+
+class RoleRow:
+    """一列角色配置的元件；切換劇本時以 bind() 換掉資料，不重建元件"""
+    def __init__(self, parent, on_change, on_delete):
+        self.role = None
+        self.frame = tk.Frame(parent, pady=2, bd=1, relief=tk.SOLID)
+        tk.Label(self.frame, text="身分:").pack(side=tk.LEFT)
+        self.entry_name = tk.Entry(self.frame, width=10)
+        self.entry_name.pack(side=tk.LEFT, padx=5)
+        tk.Label(self.frame, text="數量:").pack(side=tk.LEFT)
+        self.spin_count = tk.Spinbox(self.frame, from_=1, to=5, width=3)
+        self.spin_count.pack(side=tk.LEFT, padx=5)
+        tk.Label(self.frame, text="性別限:").pack(side=tk.LEFT)
+        self.gender_var = tk.StringVar(value="無")
+        cb_gender = ttk.Combobox(self.frame, textvariable=self.gender_var, values=GENDER_CHOICES, width=3, state="readonly")
+        cb_gender.pack(side=tk.LEFT, padx=5)
+        tk.Button(self.frame, text="X", fg="red", command=lambda: on_delete(self), relief=tk.FLAT).pack(side=tk.RIGHT, padx=5)
+
+        changed = lambda *args: on_change(self)
+        self.entry_name.bind("<KeyRelease>", changed)
+        self.spin_count.bind("<KeyRelease>", changed)
+        self.spin_count.bind("<<Increment>>", changed)
+        self.spin_count.bind("<<Decrement>>", changed)
+        cb_gender.bind("<<ComboboxSelected>>", changed)
+
+    def bind(self, role):
+        self.role = role
+        self.entry_name.delete(0, tk.END)
+        self.entry_name.insert(0, role['name'])
+        self.spin_count.delete(0, tk.END)
+        self.spin_count.insert(0, role['count'])
+        self.gender_var.set(role.get('gender') or "無")
+        self.frame.pack(fill=tk.X, pady=2)
+
+    def hide(self):
+        self.role = None
+        self.frame.pack_forget()
+
+    def read_into_role(self):
+        """把元件的值寫回角色資料"""
+        self.role['name'] = self.entry_name.get()
+        try:
+            self.role['count'] = int(self.spin_count.get())
+        except ValueError:
+            self.role['count'] = 1
+        gender = self.gender_var.get()
+        self.role['gender'] = None if gender == "無" else gender
+
 
 class ScriptEditor:
-    def __init__(self, root):
+    def __init__(self, root, store=None):
         self.root = root
         self.root.title("Loop Game - 劇本編輯器 (Dev Tool)")
         self.root.geometry("800x600")
 
-        self.data = {"Main": [], "Sub": []}
-        self.load_data()
+        self.store = store or ScriptStore()
+        self.current = None       # 目前編輯的 (種類, id)
+        self._after = {}          # debounce 用：名稱 -> after id
+        self._pending = {}        # debounce 用：名稱 -> 到期時要執行的函式
+        self.role_rows = []
 
         self.left_panel = tk.Frame(root, width=250, bg="#ddd")
         self.left_panel.pack(side=tk.LEFT, fill=tk.Y)
@@ -21,9 +185,13 @@ class ScriptEditor:
         tk.Radiobutton(self.left_panel, text="主劇本 (Main)", variable=self.type_var, value="Main", command=self.refresh_list).pack(anchor="w", padx=5, pady=5)
         tk.Radiobutton(self.left_panel, text="支線 (Sub)", variable=self.type_var, value="Sub", command=self.refresh_list).pack(anchor="w", padx=5)
 
-        self.script_listbox = tk.Listbox(self.left_panel)
-        self.script_listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        self.script_listbox.bind("<<ListboxSelect>>", self.on_select_script)
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(self.left_panel, textvariable=self.search_var)
+        search_entry.pack(fill=tk.X, padx=5, pady=(5, 0))
+        self.search_var.trace_add("write", lambda *args: self._debounce("search", self.refresh_list))
+
+        self.script_list = VirtualList(self.left_panel, self.on_select_script)
+        self.script_list.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
         btn_frame = tk.Frame(self.left_panel)
         btn_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -41,7 +209,7 @@ class ScriptEditor:
         tk.Label(self.right_panel, text="包含角色配置:").pack(anchor="w", pady=(20, 0))
         self.roles_frame = tk.Frame(self.right_panel)
         self.roles_frame.pack(fill=tk.BOTH, expand=True)
-        
+
         self.role_canvas = tk.Canvas(self.roles_frame)
         scrollbar = tk.Scrollbar(self.roles_frame, orient="vertical", command=self.role_canvas.yview)
         self.role_inner_frame = tk.Frame(self.role_canvas)
@@ -51,95 +219,141 @@ class ScriptEditor:
         self.role_canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         tk.Button(self.right_panel, text="+ 新增需求角色", command=self.add_role_slot).pack(fill=tk.X, pady=10)
-        self.current_idx = None
+
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.refresh_list()
 
-    def load_data(self):
-        if os.path.exists(FILE_PATH):
-            with open(FILE_PATH, "r", encoding="utf-8") as f:
-                self.data = json.load(f)
-        else: self.data = {"Main": [], "Sub": []}
+    # --- debounce ---
+
+    def _debounce(self, name, func):
+        """DEBOUNCE_MS 內重複觸發只執行最後一次"""
+        if name in self._after:
+            self.root.after_cancel(self._after[name])
+        self._pending[name] = func
+        self._after[name] = self.root.after(DEBOUNCE_MS, lambda: self._run_debounced(name))
+
+    def _run_debounced(self, name):
+        self._after.pop(name, None)
+        func = self._pending.pop(name, None)
+        if func is not None:
+            func()
+
+    def flush_debounced(self):
+        """立即執行所有等待中的更新 (儲存、切換劇本前)"""
+        for name in list(self._after):
+            self.root.after_cancel(self._after[name])
+            self._run_debounced(name)
+
+    # --- 資料 ---
 
     def save_to_file(self):
-        with open(FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=4, ensure_ascii=False)
-        messagebox.showinfo("成功", "已儲存至 scripts.json")
+        self.flush_debounced()
+        count = self.store.save()
+        messagebox.showinfo("成功", f"已儲存 {count} 筆變更")
+
+    def on_close(self):
+        self.flush_debounced()
+        self.store.close()
+        self.root.destroy()
+
+    def get_current_list(self): return self.store.parts(self.type_var.get())
 
-    def get_current_list(self): return self.data[self.type_var.get()]
+    def current_script(self):
+        return self.store.get(*self.current) if self.current else None
+
+    def _touch_current(self):
+        if self.current:
+            self.store.touch(*self.current)
+
+    # --- 清單 ---
 
     def refresh_list(self):
-        self.script_listbox.delete(0, tk.END)
-        for s in self.get_current_list(): self.script_listbox.insert(tk.END, s['name'])
-        self.current_idx = None
-        self.name_entry.delete(0, tk.END)
-        for widget in self.role_inner_frame.winfo_children(): widget.destroy()
+        """依種類與搜尋字串重建清單內容 (只有可見的幾列會進入 Listbox)"""
+        self.flush_debounced()
+        query = self.search_var.get().strip().lower()
+        kind = self.type_var.get()
+        items = [((kind, s['id']), f"{s['id']} {s['name']}") for s in self.get_current_list()
+                 if not query or query in s['name'].lower() or query in s['id']]
+        self.script_list.set_items(items)
+        if self.current and self.current[0] != kind:
+            self._show_script(None)
 
-    def on_select_script(self, event):
-        if not self.script_listbox.curselection(): return
-        idx = self.script_listbox.curselection()[0]
-        self.current_idx = idx
-        script = self.get_current_list()[idx]
+    def on_select_script(self, key):
+        self.flush_debounced()
+        self._show_script(key)
+
+    def _show_script(self, key):
+        self.current = key
+        script = self.current_script()
         self.name_entry.delete(0, tk.END)
-        self.name_entry.insert(0, script['name'])
-        for widget in self.role_inner_frame.winfo_children(): widget.destroy()
-        for role in script['roles']: self.create_role_widget(role)
+        roles = []
+        if script is not None:
+            self.name_entry.insert(0, script['name'])
+            roles = script['roles']
+        # 重複使用已有的列，不夠才新增
+        while len(self.role_rows) < len(roles):
+            self.role_rows.append(RoleRow(self.role_inner_frame, self._on_role_change, self._on_role_delete))
+        for row in self.role_rows:
+            row.hide()
+        for row, role in zip(self.role_rows, roles):
+            row.bind(role)
 
     def on_name_change(self, event):
-        if self.current_idx is None: return
-        new_name = self.name_entry.get()
-        self.get_current_list()[self.current_idx]['name'] = new_name
-        self.script_listbox.delete(self.current_idx)
-        self.script_listbox.insert(self.current_idx, new_name)
-        self.script_listbox.selection_set(self.current_idx)
+        script = self.current_script()
+        if script is None: return
+        script['name'] = self.name_entry.get()
+        key = self.current
+
+        def apply():
+            self.script_list.update_text(key, f"{key[1]} {script['name']}")
+            self.store.touch(*key)
+        self._debounce("name", apply)
 
     def add_script(self):
-        self.get_current_list().append({"name": "新劇本", "roles": []})
+        self.flush_debounced()
+        kind = self.type_var.get()
+        script = self.store.add(kind, {"name": "新劇本", "roles": []})
+        self.search_var.set("")
         self.refresh_list()
-        self.script_listbox.selection_set(len(self.get_current_list())-1)
-        self.on_select_script(None)
+        self.script_list.select((kind, script['id']))
+        self._show_script((kind, script['id']))
 
     def delete_script(self):
-        if self.current_idx is None: return
+        if self.current is None: return
         if messagebox.askyesno("確認", "確定要刪除？"):
-            del self.get_current_list()[self.current_idx]
+            self.flush_debounced()
+            self.store.delete(*self.current)
+            self._show_script(None)
             self.refresh_list()
 
+    # --- 角色 ---
+
     def add_role_slot(self):
-        if self.current_idx is None: return
-        new_role = {"name": "新身分", "count": 1, "gender": None}
-        self.get_current_list()[self.current_idx]['roles'].append(new_role)
-        self.create_role_widget(new_role)
-
-    def create_role_widget(self, role_data):
-        row = tk.Frame(self.role_inner_frame, pady=2, bd=1, relief=tk.SOLID)
-        row.pack(fill=tk.X, pady=2)
-        tk.Label(row, text="身分:").pack(side=tk.LEFT)
-        entry_name = tk.Entry(row, width=10)
-        entry_name.insert(0, role_data['name'])
-        entry_name.pack(side=tk.LEFT, padx=5)
-        tk.Label(row, text="數量:").pack(side=tk.LEFT)
-        spin_count = tk.Spinbox(row, from_=1, to=5, width=3)
-        spin_count.delete(0, tk.END); spin_count.insert(0, role_data['count'])
-        spin_count.pack(side=tk.LEFT, padx=5)
-        tk.Label(row, text="性別限:").pack(side=tk.LEFT)
-        gender_var = tk.StringVar(value=role_data.get('gender') or "無")
-        cb_gender = ttk.Combobox(row, textvariable=gender_var, values=["無", "F", "M"], width=3, state="readonly")
-        cb_gender.pack(side=tk.LEFT, padx=5)
-        def delete_this_role():
-            if role_data in self.get_current_list()[self.current_idx]['roles']:
-                self.get_current_list()[self.current_idx]['roles'].remove(role_data)
-                row.destroy()
-        tk.Button(row, text="X", fg="red", command=delete_this_role, relief=tk.FLAT).pack(side=tk.RIGHT, padx=5)
-        def update_data(*args):
-            role_data['name'] = entry_name.get()
-            try: role_data['count'] = int(spin_count.get())
-            except: role_data['count'] = 1
-            role_data['gender'] = None if gender_var.get() == "無" else gender_var.get()
-        entry_name.bind("<KeyRelease>", update_data)
-        spin_count.bind("<KeyRelease>", update_data); spin_count.bind("<<Increment>>", update_data); spin_count.bind("<<Decrement>>", update_data)
-        cb_gender.bind("<<ComboboxSelected>>", update_data)
+        script = self.current_script()
+        if script is None: return
+        script['roles'].append({"name": "新身分", "count": 1, "gender": None})
+        self._touch_current()
+        self._show_script(self.current)
+
+    def _on_role_change(self, row):
+        if row.role is None: return
+        row.read_into_role()
+        self._debounce("roles", self._touch_current)
+
+    def _on_role_delete(self, row):
+        script = self.current_script()
+        if script is None: return
+        roles = script['roles']
+        # 以物件身分比對 (兩個內容相同的角色列不能互相誤刪)
+        index = next((i for i, role in enumerate(roles) if role is row.role), None)
+        if index is None: return
+        self.flush_debounced()
+        del roles[index]
+        self._touch_current()
+        self._show_script(self.current)
+
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = ScriptEditor(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -0,0 +1,77 @@
+# events.py
+"""遊戲狀態變化的事件匯流排 (同步呼叫，發生當下立即通知)"""
+
+# 事件種類 (handler 的參數；人物一律傳 Character 物件，由訂閱者自行轉成名稱或編號)
+PHASE_START = "phase_start"        # handler(phase, day)
+MOVE = "move"                      # handler(char, old_loc, new_loc, cause)
+SANITY_CHANGE = "sanity_change"    # handler(char, old, new, source)   source: 造成影響的角色或 None
+INTRIGUE_GAIN = "intrigue_gain"    # handler(char, source, cause)
+INTRIGUE_CLEAR = "intrigue_clear"  # handler(char, cause)
+KILL = "kill"                      # handler(actor, target)
+DEATH = "death"                    # handler(char)
+GRAVE = "grave"                    # handler(char, location, day)
+EVENT_TRIGGER = "event_trigger"    # handler(part_id, effect)         伏筆事件
+AP_SPEND = "ap_spend"              # handler(char, action, cost, ap_left)
+GAME_OVER = "game_over"            # handler(result, reason)
+
+KINDS = (PHASE_START, MOVE, SANITY_CHANGE, INTRIGUE_GAIN, INTRIGUE_CLEAR, KILL,
+         DEATH, GRAVE, EVENT_TRIGGER, AP_SPEND, GAME_OVER)
+
+# 各事件參數的欄位名稱 (JSONL 輸出用)
+FIELDS = {
+    PHASE_START: ("phase", "day"),
+    MOVE: ("char", "from", "to", "cause"),
+    SANITY_CHANGE: ("char", "old", "new", "source"),
+    INTRIGUE_GAIN: ("char", "source", "cause"),
+    INTRIGUE_CLEAR: ("char", "cause"),
+    KILL: ("actor", "target"),
+    DEATH: ("char",),
+    GRAVE: ("char", "location", "day"),
+    EVENT_TRIGGER: ("part_id", "effect"),
+    AP_SPEND: ("char", "action", "cost", "ap_left"),
+    GAME_OVER: ("result", "reason"),
+}
+
+# 事件參數中會出現的固定字串 (cause / action / phase / result / reason)
+MOVE_NPC = "npc"          # 早上的自動移動
+MOVE_PLAYER = "player"
+MOVE_ABILITY = "ability"  # 能力造成的移動 (追蹤)
+CAUSE_ABILITY = "ability"
+CAUSE_INSANITY = "insanity"  # 精神崩潰
+CAUSE_INITIAL = "initial"    # 開局隨機分配
+CAUSE_STATION = "station"    # 在車站得到平靜
+
+PHASES = ("sunrise", "morning", "dusk", "night")
+ACTIONS = ("move", "ask", "rest")
+RESULTS = ("win", "lose")
+REASONS = ("survived", "extinction", "sacrifice")
+
+
+class EventBus:
+    def __init__(self):
+        self._handlers = {}
+        self._sinks = []
+
+    def subscribe(self, kind, handler):
+        """註冊事件處理函式"""
+        self._handlers.setdefault(kind, []).append(handler)
+
+    def unsubscribe(self, kind, handler):
+        handlers = self._handlers.get(kind, [])
+        if handler in handlers:
+            handlers.remove(handler)
+
+    def subscribe_all(self, sink):
+        """註冊接收所有事件的 sink：sink(kind, args)"""
+        self._sinks.append(sink)
+
+    def unsubscribe_all(self, sink):
+        if sink in self._sinks:
+            self._sinks.remove(sink)
+
+    def emit(self, kind, *args):
+        """通知所有訂閱者"""
+        for handler in self._handlers.get(kind, ()):
+            handler(*args)
+        for sink in self._sinks:
+            sink(kind, args)
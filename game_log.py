@@ -0,0 +1,158 @@
+# game_log.py
+"""
+延遲格式化的遊戲日誌 (GameLog)。
+- 訊息以「模板 + 參數」傳入 (str.format 語法，例如 "{0.name} 殺害了 {1.name}")
+- 先依等級 / 類別篩選，通過後才格式化並交給輸出函式 (sink)
+- 紀錄以未格式化的形式存在固定長度的環形緩衝區，需要時才轉成文字
+- 靜音模式 (enabled=False) 只剩一次屬性檢查，批次模擬用
+- TextRenderer 把引擎發出的型別化事件 (events.py) 轉成介面文字
+"""
+from collections import deque
+
+import events as ev
+
+# 等級
+DEBUG = 10
+INFO = 20
+WARNING = 30
+
+# 類別
+SYSTEM = "system"    # 引擎啟動、劇本載入
+PHASE = "phase"      # 階段標題
+RULE = "rule"        # 劇本規則 (假面舞會、暴風雨、路障)
+ABILITY = "ability"  # 角色能力
+MOVE = "move"        # 移動與抵達效果
+DEATH = "death"      # 死亡與墓碑
+EVENT = "event"      # 伏筆事件
+RESULT = "result"    # 結局
+
+DEFAULT_CAPACITY = 500
+
+
+class LogRecord:
+    """一筆尚未格式化的紀錄"""
+    __slots__ = ("level", "category", "template", "args")
+
+    def __init__(self, level, category, template, args):
+        self.level = level
+        self.category = category
+        self.template = template
+        self.args = args
+
+    @property
+    def message(self):
+        return self.template.format(*self.args) if self.args else self.template
+
+    def __repr__(self):
+        return f"LogRecord({self.level}, {self.category!r}, {self.message!r})"
+
+
+class GameLog:
+    def __init__(self, sink=print, level=DEBUG, categories=None, capacity=DEFAULT_CAPACITY):
+        """
+        :param sink: 接收格式化後文字的函式 (介面 / print)；None 表示只保留紀錄不輸出
+        :param level: 低於此等級的訊息直接丟棄
+        :param categories: 只保留這些類別 (None 為全部)
+        :param capacity: 環形緩衝區保留的紀錄筆數 (0 表示不保留)
+        """
+        self.enabled = True
+        self.sink = sink
+        self.level = level
+        self.categories = frozenset(categories) if categories is not None else None
+        self.records = deque(maxlen=capacity)
+
+    @classmethod
+    def silent(cls):
+        """完全靜音的日誌 (不篩選、不格式化、不保留)"""
+        log = cls(sink=None, capacity=0)
+        log.enabled = False
+        return log
+
+    def __call__(self, template, *args, level=INFO, category=SYSTEM):
+        """寫入一筆訊息；引擎與各模組的 log_func 都是這個介面"""
+        if not self.enabled:
+            return
+        if level < self.level or (self.categories is not None and category not in self.categories):
+            return
+        self.records.append(LogRecord(level, category, template, args))
+        if self.sink is not None:
+            self.sink(template.format(*args) if args else template)
+
+    def messages(self, level=DEBUG, category=None):
+        """把緩衝區內的紀錄格式化成文字 (舊到新)"""
+        return [r.message for r in self.records
+                if r.level >= level and (category is None or r.category == category)]
+
+    def clear(self):
+        self.records.clear()
+
+
+# --- 事件 -> 介面文字 ---
+
+PHASE_TITLES = {
+    "sunrise": "\n☀️ === 日出階段：角色能力發動 ===",
+    "morning": "\n🏃 === 第 {} 天 早上：NPC 移動 ===",
+    "dusk": "\n🌅 === 黃昏階段：恐慌蔓延 ===",
+    "night": "\n🌃 === 夜晚階段：黑暗行動 ===",
+}
+
+GAME_OVER_TEXTS = {
+    "extinction": "💀 倖存者過少，城市崩毀。遊戲結束。",
+    "sacrifice": "💀 [結局] 獻祭已完成，古神甦醒。",
+    "survived": "\n🎉 [勝利] 你成功存活到了第四天！",
+}
+
+
+class TextRenderer:
+    """訂閱 EventBus，把事件轉成 GameLog 訊息 (只在日誌啟用時掛上，靜音時完全不花成本)"""
+    def __init__(self, log):
+        self.log = log
+
+    def attach(self, bus):
+        bus.subscribe(ev.PHASE_START, self.on_phase_start)
+        bus.subscribe(ev.MOVE, self.on_move)
+        bus.subscribe(ev.SANITY_CHANGE, self.on_sanity_change)
+        bus.subscribe(ev.INTRIGUE_GAIN, self.on_intrigue_gain)
+        bus.subscribe(ev.INTRIGUE_CLEAR, self.on_intrigue_clear)
+        bus.subscribe(ev.KILL, self.on_kill)
+        bus.subscribe(ev.GRAVE, self.on_grave)
+        bus.subscribe(ev.EVENT_TRIGGER, self.on_event_trigger)
+        bus.subscribe(ev.GAME_OVER, self.on_game_over)
+        return self
+
+    def on_phase_start(self, phase, day):
+        self.log(PHASE_TITLES[phase], day, category=PHASE)
+
+    def on_move(self, char, old_loc, new_loc, cause):
+        # 一般移動只記在除錯等級，能力造成的移動才是劇情
+        if cause == ev.MOVE_ABILITY:
+            self.log("   🏃 {0.name} 追蹤目標移動到了 Loc {1}。", char, new_loc, category=ABILITY)
+        else:
+            self.log("   {0.name}: Loc {1} -> {2}", char, old_loc, new_loc, level=DEBUG, category=MOVE)
+
+    def on_sanity_change(self, char, old, new, source):
+        if source is not None:
+            self.log("   🗣️ {0.name} 的影響使 {1.name} 精神下降。", source, char, category=ABILITY)
+
+    def on_intrigue_gain(self, char, source, cause):
+        if cause == ev.CAUSE_INSANITY:
+            self.log("   ⚠️ {0.name} 精神崩潰，獲得陰謀狀態！", char, category=ABILITY)
+        elif cause == ev.CAUSE_INITIAL:
+            self.log("初始陰謀者是 {0.name}", char, level=DEBUG, category=RULE)
+        else:
+            self.log("   😈 {0.name} 使 {1.name} 陷入陰謀。", source, char, category=ABILITY)
+
+    def on_intrigue_clear(self, char, cause):
+        self.log("   ✨ {0.name} 在車站得到平靜，解除陰謀。", char, category=MOVE)
+
+    def on_kill(self, actor, target):
+        self.log("   🔪 {0.name} 殺害了 {1.name}。", actor, target, category=ABILITY)
+
+    def on_grave(self, char, location, day):
+        self.log("⚰️ {0.name} 死亡，墓碑立於 {1}。", char, location, category=DEATH)
+
+    def on_event_trigger(self, part_id, effect):
+        self.log("📢 [事件] 恐慌觸發：{}", effect, category=EVENT)
+
+    def on_game_over(self, result, reason):
+        self.log(GAME_OVER_TEXTS[reason], category=RESULT)
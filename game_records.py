@@ -0,0 +1,209 @@
+# game_records.py
+"""
+固定寬度的二進位對局紀錄 (每局一筆，RECORD_DTYPE.itemsize bytes)。
+- GameRecorder 掛在 GameEngine.events 上，記錄每天結束時的角色狀態、死亡日與結局
+- RecordWriter 以附加模式分批寫入 (檔頭 16 bytes + 連續的紀錄)
+- open_records 以 np.memmap 讀取，直接得到 NumPy 結構陣列 (不複製、不建立 Python 物件)，
+  篩選 (例如 query(...)) 都是陣列掃描
+
+每個角色每天 2 bytes (STATE_DTYPE)：位置 (u1，地圖最多 256 個地點) 與
+旗標 (u1)：精神 (bit 0-2，上限 7) | 陰謀 (bit 3) | 存活 (bit 4)。
+需要 numpy。
+"""
+import os
+import struct
+
+import numpy as np
+
+from events import PHASE_START, DEATH, GAME_OVER
+from settings import MAX_DAYS, TOTAL_CHARS
+
+MAGIC = b"LOOPREC2"  # 1 版的位置只有 3 bits，地點超過 8 個時會蓋到精神值
+HEADER = struct.Struct("<8sHHI")  # magic, 天數上限, 角色上限, 每筆紀錄大小
+
+RESULT_CODES = {None: 0, "win": 1, "lose": 2}
+REASON_CODES = {None: 0, "survived": 1, "extinction": 2, "sacrifice": 3}
+
+MAX_RECORD_LOCATIONS = 256  # 位置以 u1 保存
+
+STATE_DTYPE = np.dtype([("location", "u1"), ("flags", "u1")])
+
+RECORD_DTYPE = np.dtype([
+    ("game", "<u4"),          # 批次中的局號
+    ("seed", "<u8"),
+    ("triple", "<u4"),        # catalog.triples 中的組合編號
+    ("main", "<u2"),          # 三個部件 id (例如 311)，方便直接篩選
+    ("sub", "<u2"),
+    ("foreshadow", "<u2"),
+    ("result", "u1"),         # RESULT_CODES
+    ("reason", "u1"),         # REASON_CODES
+    ("days_played", "u1"),
+    ("n_chars", "u1"),
+    ("death_day", "u1", (TOTAL_CHARS,)),         # 0 = 存活到最後
+    ("days", STATE_DTYPE, (MAX_DAYS, TOTAL_CHARS)),  # 每天結束時的狀態 (未進行的天數全為 0)
+])
+
+
+def pack_state(char):
+    """角色狀態壓成 (位置, 旗標)"""
+    return char.location, min(max(char.sanity, 0), 7) | (char.intrigue > 0) << 3 | (not char.is_dead) << 4
+
+
+# 解開 days 欄位 (可直接對整個陣列運算)
+def location_of(days):
+    return days["location"]
+
+
+def sanity_of(days):
+    return days["flags"] & 7
+
+
+def intrigue_of(days):
+    return (days["flags"] >> 3) & 1
+
+
+def alive_of(days):
+    return (days["flags"] >> 4) & 1
+
+
+class GameRecorder:
+    """
+    記錄一局遊戲：每個日出 (以及結局時) 保存前一天結束的狀態，死亡時記下天數。
+    角色超過 TOTAL_CHARS 時只保存前 TOTAL_CHARS 位。
+    """
+    def __init__(self, engine, game_index=0):
+        if engine.map.size > MAX_RECORD_LOCATIONS:
+            raise ValueError(f"對局紀錄最多支援 {MAX_RECORD_LOCATIONS} 個地點 (本局地圖有 {engine.map.size} 個)")
+        self.engine = engine
+        self.game_index = game_index
+        self.chars = engine.characters[:TOTAL_CHARS]
+        self.death_day = [0] * TOTAL_CHARS
+        self.reason = None
+        self.days = [[(0, 0)] * TOTAL_CHARS for _ in range(MAX_DAYS)]
+        self._slot = {c: i for i, c in enumerate(self.chars)}
+        events = engine.events
+        events.subscribe(PHASE_START, self._on_phase_start)
+        events.subscribe(DEATH, self._on_death)
+        events.subscribe(GAME_OVER, self._on_game_over)
+
+    def _snapshot(self, day):
+        if 1 <= day <= MAX_DAYS:
+            self.days[day - 1][:len(self.chars)] = [pack_state(c) for c in self.chars]
+
+    def _on_phase_start(self, phase, day):
+        if phase == "sunrise":
+            self._snapshot(day - 1)
+
+    def _on_death(self, char):
+        slot = self._slot.get(char)
+        if slot is not None:
+            self.death_day[slot] = self.engine.day
+
+    def _on_game_over(self, result, reason):
+        self.reason = reason
+        self._snapshot(self.engine.day)
+
+    def record(self):
+        """結局後呼叫：返回一筆可放進 RECORD_DTYPE 陣列的 tuple"""
+        engine = self.engine
+        ids = [part['id'] for part in engine.scripts]
+        return (
+            self.game_index, engine.seed or 0, engine.catalog.triples.index(*ids),
+            int(ids[0]), int(ids[1]), int(ids[2]),
+            RESULT_CODES[engine.result], REASON_CODES[self.reason],
+            engine.day, len(self.chars), self.death_day, self.days,
+        )
+
+
+def to_array(rows):
+    """tuple 清單 -> 結構陣列"""
+    return np.array(rows, dtype=RECORD_DTYPE)
+
+
+# --- 檔案 ---
+
+def _header():
+    return HEADER.pack(MAGIC, MAX_DAYS, TOTAL_CHARS, RECORD_DTYPE.itemsize)
+
+
+def _check_header(raw, path):
+    if len(raw) < HEADER.size:
+        raise ValueError(f"{path} 不是對局紀錄檔 (檔頭不完整)")
+    magic, max_days, max_chars, itemsize = HEADER.unpack(raw[:HEADER.size])
+    if magic != MAGIC or (max_days, max_chars, itemsize) != (MAX_DAYS, TOTAL_CHARS, RECORD_DTYPE.itemsize):
+        raise ValueError(f"{path} 的紀錄格式與目前版本不符")
+
+
+class RecordWriter:
+    """附加寫入對局紀錄；檔案不存在時先寫檔頭"""
+    def __init__(self, path, batch_size=4096):
+        self.path = path
+        self.batch_size = batch_size
+        self.rows = []
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, "rb") as f:
+                _check_header(f.read(HEADER.size), path)
+            self.file = open(path, "ab")
+        else:
+            self.file = open(path, "ab")
+            self.file.write(_header())
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def write_array(self, records):
+        """直接寫入整批紀錄：RECORD_DTYPE 陣列，或其 tobytes() (例如 worker 回傳的結果)"""
+        self.flush()
+        if not isinstance(records, bytes):
+            records = np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes()
+        self.file.write(records)
+
+    def flush(self):
+        if self.rows:
+            self.file.write(to_array(self.rows).tobytes())
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_records(path):
+    """以 memmap 開啟紀錄檔，返回唯讀的結構陣列 (不完整的最後一筆會被忽略)"""
+    with open(path, "rb") as f:
+        _check_header(f.read(HEADER.size), path)
+    n = (os.path.getsize(path) - HEADER.size) // RECORD_DTYPE.itemsize
+    if n == 0:
+        return np.zeros(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER.size, shape=(n,))
+
+
+# --- 查詢範例 ---
+
+def main_ids_with_rule(catalog, rule_tag):
+    """使用某個規則標籤的主線 id (int)"""
+    return np.array([int(p['id']) for p in catalog.parts["Main"] if p.get('rule_tag') == rule_tag], dtype="<u2")
+
+
+def query(records, catalog=None, main_rule=None, result=None, player_death_day=None):
+    """
+    返回符合條件的布林遮罩，例如
+        query(recs, catalog, main_rule="human_sacrifice", player_death_day=2)
+    = 主線規則為活人獻祭、且玩家 (第 0 位) 在第 2 天死亡的對局。
+    """
+    mask = np.ones(len(records), dtype=bool)
+    if main_rule is not None:
+        mask &= np.isin(records["main"], main_ids_with_rule(catalog, main_rule))
+    if result is not None:
+        mask &= records["result"] == RESULT_CODES[result]
+    if player_death_day is not None:
+        mask &= records["death_day"][:, 0] == player_death_day
+    return mask
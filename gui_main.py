@@ -1,8 +1,10 @@
 # gui_main.py
 import tkinter as tk
 from main import GameEngine
-from settings import STATION_ID, SCRIPTS_DB # 載入修正後的 settings.py
 from actions import ActionManager
+from events import MOVE, DEATH, SANITY_CHANGE, INTRIGUE_GAIN, INTRIGUE_CLEAR
+
+LINE_HEIGHT = 15  # 同地點角色之間的行距
 
 class GameGUI(tk.Frame):
     def __init__(self, master=None):
@@ -24,13 +26,12 @@ class GameGUI(tk.Frame):
         
     def _load_location_names(self):
         """根據主劇本 ID 載入對應的地點名稱"""
-        main_id = self.engine.scripts[0]['id']
-        key = f"{main_id[0]}XX" # 例如 '111' 變成 '1XX'
-        
-        # 如果 JSON 裡沒有 Location_Names 區塊，提供預設值作為備用
-        default_names = ["Loc 0", "Loc 1", "Loc 2", "Loc 3", "Loc 4"]
+        main_id = self.engine.scripts[0]['id'] # 例如 '111' 對應 '1XX'
         
-        return SCRIPTS_DB.get('Location_Names', {}).get(key, default_names)
+        # 如果 JSON 裡沒有 Location_Names 區塊 (或名稱比地點少)，以 "Loc N" 補上
+        default_names = [f"Loc {i}" for i in range(self.engine.map.size)]
+        names = self.engine.catalog.location_names_for(main_id, default_names)
+        return list(names) + default_names[len(names):]
 
 
     def create_widgets(self):
@@ -53,7 +54,7 @@ class GameGUI(tk.Frame):
         self.current_char = self.engine.characters[0]
         
         self.move_buttons = []
-        for i in range(5):
+        for i in range(self.engine.map.size):
             name = self.location_names[i]
             btn = tk.Button(self.action_frame, text=f"移動到 {name} ({i})", command=lambda loc=i: self.action_move(loc))
             btn.pack(side="left", padx=2)
@@ -65,6 +66,7 @@ class GameGUI(tk.Frame):
         # 繪製地圖/角色區
         self.map_canvas = tk.Canvas(self, width=600, height=300, bg='lightgray')
         self.map_canvas.grid(row=3, column=0, columnspan=2, pady=10)
+        self.map_view = None  # 第一次 update_gui 時建立
 
     def log_message(self, message):
         """將日誌輸出到 Text Widget"""
@@ -118,53 +120,109 @@ class GameGUI(tk.Frame):
         self._draw_map()
 
     def _draw_map(self):
-        """在地圖畫布上繪製地點和人物"""
-        self.map_canvas.delete("all")
-        
-        loc_positions = {
-            0: (50, 100), 1: (150, 200), 2: (250, 100), 3: (350, 200), 4: (500, 150)
-        }
-        
-        # [支線] 濃霧: 如果主劇本是客輪 (4XX) 且抽到濃霧， Loc 0 資訊模糊
-        is_foggy = (self.engine.scripts[0]['id'][0] == '4' and self.engine.sub_rule == "thick_fog")
-        
-        # 繪製地點 (圈圈)
-        for loc_id, (x, y) in loc_positions.items():
-            name = self.location_names[loc_id]
-            color = 'blue' if loc_id == STATION_ID else 'green'
-            self.map_canvas.create_oval(x-20, y-20, x+20, y+20, fill=color, outline='black')
-            self.map_canvas.create_text(x, y+30, text=f"{loc_id}: {name}")
-            
-            # 繪製人物
-            offset_y = -10
-            chars_here = [c for c in self.engine.characters if c.location == loc_id and not c.is_dead]
-            
-            for i, char in enumerate(chars_here):
-                
-                # 判斷是否隱藏信息 (濃霧只隱藏 Loc 0 的信息)
-                hide_info = is_foggy and loc_id == 0 and char != self.current_char
-
-                char_text = char.name
-                
-                # 只有當人物不在濃霧中或人物是玩家自己時，才顯示完整信息
-                if not hide_info or char == self.current_char:
-                    # 顯示精神/陰謀/身份
-                    char_info = f" S{char.sanity} I{char.intrigue} ({char.role})"
-                    if char == self.current_char:
-                        char_color = 'red' # 玩家自己
-                    elif char.intrigue > 0:
-                        char_color = 'purple'
-                    elif char.sanity <= 1:
-                        char_color = 'darkorange'
-                    else:
-                        char_color = 'black'
-                else:
-                    char_info = "(身份不明)"
-                    char_color = 'gray' # 濃霧中的 NPC
-                
-                full_text = f"{char_text}{char_info}"
-                
-                self.map_canvas.create_text(x, y + offset_y + (i * 15), text=full_text, fill=char_color, anchor="center")
+        """地圖只更新有變動的部分 (見 MapView)"""
+        if self.map_view is None:
+            self.map_view = MapView(self.map_canvas, self.engine, self.location_names, self.current_char)
+        self.map_view.refresh()
+
+
+class MapView:
+    """
+    保留模式的地圖：地點與角色的畫布物件只建立一次，以地點 / 角色為鍵保存。
+    之後由引擎事件標記變動的地點 (有人進出或死亡) 與角色 (精神/陰謀改變)，
+    refresh() 只移動或改色這些物件，而且畫面內容沒變時不呼叫畫布。
+    """
+    def __init__(self, canvas, engine, location_names, current_char):
+        self.canvas = canvas
+        self.engine = engine
+        self.current_char = current_char
+        self.positions = engine.map.positions  # 地點 -> 畫布座標 (由地圖決定)
+        # 劇本規則的可見度掛鉤 (例如濃霧：客輪 4XX 的 Loc 0 資訊模糊)
+        self.visibility = engine.rules.visibility
+        self.char_items = {}  # 角色 -> 文字物件 id
+        self.drawn = {}       # 角色 -> 目前畫出的 (x, y, 文字, 顏色)
+        self.dirty_locs = set(range(len(self.positions)))
+        self.dirty_chars = set()
+        self.dead = set()
+        self._draw_locations(location_names)
+
+        events = engine.events
+        events.subscribe(MOVE, self._on_move)
+        events.subscribe(DEATH, self._on_death)
+        for kind in (SANITY_CHANGE, INTRIGUE_GAIN, INTRIGUE_CLEAR):
+            events.subscribe(kind, self._on_char_change)
+
+    def _draw_locations(self, location_names):
+        """地點 (圈圈與名稱) 不會變動，只畫一次"""
+        station = self.engine.map.station_id
+        for loc_id, (x, y) in enumerate(self.positions):
+            color = 'blue' if loc_id == station else 'green'
+            self.canvas.create_oval(x-20, y-20, x+20, y+20, fill=color, outline='black')
+            self.canvas.create_text(x, y+30, text=f"{loc_id}: {location_names[loc_id]}")
+
+    # --- 事件 -> 標記 ---
+
+    def _on_move(self, char, old_loc, new_loc, cause):
+        # 兩個地點的排列順序都會改變
+        self.dirty_locs.add(old_loc)
+        self.dirty_locs.add(new_loc)
+
+    def _on_death(self, char):
+        self.dead.add(char)
+        self.dirty_locs.add(char.location)
+
+    def _on_char_change(self, char, *_):
+        self.dirty_chars.add(char)
+
+    # --- 更新畫布 ---
+
+    def _appearance(self, char, loc_id):
+        """角色的 (文字, 顏色)"""
+        # 判斷是否隱藏信息 (由規則掛鉤決定，例如濃霧)；玩家自己永遠顯示完整信息
+        for visible in self.visibility:
+            if not visible(self.engine, self.current_char, char, loc_id):
+                return f"{char.name}(身份不明)", 'gray'  # 看不清的 NPC
+        if char == self.current_char:
+            color = 'red'  # 玩家自己
+        elif char.intrigue > 0:
+            color = 'purple'
+        elif char.sanity <= 1:
+            color = 'darkorange'
+        else:
+            color = 'black'
+        return f"{char.name} S{char.sanity} I{char.intrigue} ({char.role})", color
+
+    def _place(self, char, x, y):
+        text, color = self._appearance(char, char.location)
+        drawn = self.drawn.get(char)
+        if drawn is None:
+            self.char_items[char] = self.canvas.create_text(x, y, text=text, fill=color, anchor="center")
+        else:
+            if drawn[:2] != (x, y):
+                self.canvas.coords(self.char_items[char], x, y)
+            if drawn[2:] != (text, color):
+                self.canvas.itemconfig(self.char_items[char], text=text, fill=color)
+        self.drawn[char] = (x, y, text, color)
+
+    def refresh(self):
+        for char in self.dead:
+            item = self.char_items.pop(char, None)
+            if item is not None:
+                self.canvas.delete(item)
+                del self.drawn[char]
+        self.dead.clear()
+
+        roster = self.engine.roster
+        for loc_id in self.dirty_locs:
+            x, y = self.positions[loc_id]
+            for i, char in enumerate(roster.alive_at(loc_id)):
+                self._place(char, x, y - 10 + i * LINE_HEIGHT)
+        for char in self.dirty_chars:
+            drawn = self.drawn.get(char)
+            if drawn is not None and not char.is_dead:
+                self._place(char, drawn[0], drawn[1])
+        self.dirty_locs.clear()
+        self.dirty_chars.clear()
 
 # 運行主程式
 if __name__ == "__main__":
@@ -1,117 +1,263 @@
+import copy
 import random
-from settings import STATION_ID, SCRIPTS_DB
+from settings import STATION_ID, MAX_DAYS, DAILY_AP, INITIAL_SANITY
 from mechanics import process_arrival, calculate_sunrise_move, check_sanity_status
 from scenario_gen import ScenarioBuilder
 from abilities import AbilityEngine
-from models import Grave
+from models import Character, Grave, SYMBOLS
+from catalog import get_catalog, PART_KINDS
+from roster import Roster
+from topology import locations_mask, mask_locations
+from rules import compile_rules
+from events import EventBus, DEATH, GRAVE, PHASE_START, INTRIGUE_GAIN, EVENT_TRIGGER, GAME_OVER, CAUSE_INITIAL
+from game_log import GameLog, TextRenderer, INFO, RULE
+
+ANDROID_ROLE_ID = SYMBOLS.intern("仿生人")
 
 class GameEngine:
-    def __init__(self, logger_callback=None):
+    profiler = None  # profiler.Profiler.attach 掛上後才有值
+
+    def __init__(self, logger_callback=None, seed=None, rng=None, parts=None, silent=False, log_level=INFO, log_categories=None,
+                 tuning=None):
+        """
+        :param logger_callback: 接收日誌文字的函式 (預設 print)
+        :param silent: 批次模擬用，完全不產生日誌
+        :param log_level / log_categories: 日誌篩選條件 (見 game_log.GameLog)
+        :param seed: 亂數種子；相同種子 (與相同的玩家操作) 可完整重播一局
+        :param rng: 直接指定 random.Random (優先於 seed)
+        :param parts: 指定劇本組合 (Main, Sub, Foreshadow)，未指定則隨機抽選
+        :param tuning: 平衡調整用的參數覆寫 (見 balance.py)，可含 max_days / daily_ap / initial_sanity / role_data；
+                       role_data 會影響能力編譯快取，同一組設定請重複使用同一個 dict
+        """
+        tuning = tuning or {}
+        # 0. 本局專屬的亂數串流，所有模組都經由它取亂數，不互相干擾
+        self.seed = seed
+        self.rng = rng if rng is not None else random.Random(seed)
+
         # 1. 基礎狀態初始化
         self.day = 1
-        self.max_days = 4
+        self.max_days = tuning.get("max_days", MAX_DAYS)
+        self.daily_ap = tuning.get("daily_ap", DAILY_AP)
         self.is_game_over = False
+        self.result = None  # 結局: 'win' / 'lose'，遊戲未結束時為 None
         self.graves = []
-        self.ap = 5 
-        self.blocked_locations = []  # 存儲目前被放置路障的地點 ID
-        self.log_func = logger_callback if logger_callback else print
+        self.ap = self.daily_ap
+        self.blocked_mask = 0  # 路障的位元遮罩：第 i 位為 1 代表地點 i 有路障
+        if silent:
+            self.log = GameLog.silent()
+        else:
+            self.log = GameLog(logger_callback or print, log_level, log_categories)
 
         # 2. 透過 Builder 初始化劇本與角色
         self.log("⚙️ 正在啟動劇本核心...")
         builder = ScenarioBuilder()
-        self.characters, self.scripts = builder.build()
+        self.characters, self.scripts = builder.build(parts, self.rng, tuning.get("initial_sanity", INITIAL_SANITY))
+        self.catalog = builder.catalog
+        self.map = self.catalog.map_for(self.scripts[0]['id'])  # 本局的地圖 (topology.MapTopology)
+        self._attach_roster()
         
-        # 3. 提取規則標籤 (用於後續勝敗判定)
+        # 3. 提取規則標籤，並一次組出本局生效的規則掛鉤 (rules.py)
         self.main_rule = self.scripts[0].get('rule_tag', 'default')
         self.sub_rule = self.scripts[1].get('rule_tag', 'default')
         self.foreshadow_data = self.scripts[2]
+        self.rules = compile_rules(self)
         
         # 4. 初始化能力引擎
-        role_data = SCRIPTS_DB.get("Role_Data", {})
-        self.ability_engine = AbilityEngine(role_data)
+        self.ability_engine = AbilityEngine(tuning.get("role_data", self.catalog.role_data), self.rng)
+        self.ability_engine.compile(self.characters)  # 編譯各階段的能力發動清單
         
-        self.log(f"📋 劇本加載成功：主線[{self.main_rule}] / 副線[{self.sub_rule}]")
+        self.log("📋 劇本加載成功：主線[{}] / 副線[{}]", self.main_rule, self.sub_rule)
         
         # 5. 劇本特殊規則初始化
         self._apply_initial_rules()
 
+    def _attach_roster(self):
+        """
+        建立地點/身分索引與事件匯流排，所有狀態變化都經由它發出型別化事件 (events.py)。
+        介面文字由 TextRenderer 從事件產生；靜音時不掛上，事件只剩分派成本。
+        """
+        self.events = EventBus()
+        self.roster = Roster(self.characters, self.events)
+        self.alive_count = sum(1 for c in self.characters if not c.is_dead)
+        self.events.subscribe(DEATH, self._on_death)
+        if self.log.enabled:
+            TextRenderer(self.log).attach(self.events)
+
+    # --- 快照與分身 (供前瞻搜尋使用) ---
+
+    @property
+    def blocked_locations(self):
+        """目前有路障的地點 ID (由小到大)"""
+        return mask_locations(self.blocked_mask)
+
+    def snapshot(self, include_rng=False):
+        """
+        只擷取可變狀態：天數、AP、路障、墓碑與每個角色的 位置/精神/陰謀/死亡/已知。
+        墓碑物件建立後不再變動，因此直接共用。
+        include_rng=True 時一併保存亂數狀態 (還原後可重現完全相同的後續)，代價較高。
+        """
+        return (
+            self.day, self.ap, self.is_game_over, self.result, self.alive_count,
+            self.blocked_mask, tuple(self.graves),
+            tuple((c.location, c.sanity, c.intrigue, c.is_dead, c.known) for c in self.characters),
+            self.rng.getstate() if include_rng else None,
+        )
+
+    def restore(self, snap):
+        """把狀態還原成 snapshot() 當時的樣子 (必須是同一個引擎或其分身的快照)"""
+        (self.day, self.ap, self.is_game_over, self.result, self.alive_count,
+         self.blocked_mask, graves, states, rng_state) = snap
+        self.graves = list(graves)
+        for c, state in zip(self.characters, states):
+            c.location, c.sanity, c.intrigue, c.is_dead, c.known = state
+        self.roster.rebuild()
+        if rng_state is not None:
+            self.rng.setstate(rng_state)
+
+    def clone(self, logger_callback=None, rng=None, silent=False):
+        """
+        建立可獨立推進的分身：角色與可變狀態各自一份，
+        劇本、目錄、Role_Data 與日誌函式則與本體共用。
+        :param rng: 分身使用的亂數串流；未指定時複製本體目前的狀態
+        :param silent: 分身不產生日誌 (前瞻搜尋用)
+        """
+        twin = copy.copy(self)
+        if silent:
+            twin.log = GameLog.silent()
+        elif logger_callback is not None:
+            twin.log = GameLog(logger_callback, self.log.level, self.log.categories)
+        if rng is None:
+            rng = random.Random()
+            rng.setstate(self.rng.getstate())
+        twin.rng = rng
+        twin.characters = [copy.copy(c) for c in self.characters]
+        twin.graves = list(self.graves)
+        twin._attach_roster()
+        twin.ability_engine = self.ability_engine.fork(twin.characters, rng)
+        if self.profiler is not None:
+            self.profiler.detach(twin)  # 分身 (前瞻搜尋) 不計入統計
+        return twin
+
+    # --- 序列化 (供 session 休眠到磁碟) ---
+
+    def export_state(self):
+        """只含純資料的完整狀態 (劇本以 id 表示、亂數含完整狀態)；以 GameEngine.from_state 還原"""
+        index = {c: i for i, c in enumerate(self.characters)}
+        return {
+            "seed": self.seed,
+            "parts": [part['id'] for part in self.scripts],
+            "day": self.day, "max_days": self.max_days, "ap": self.ap, "daily_ap": self.daily_ap,
+            "is_game_over": self.is_game_over, "result": self.result,
+            "blocked": self.blocked_mask,
+            "graves": [(g.name, g.location, g.day) for g in self.graves],
+            "chars": [c.__getstate__() for c in self.characters],
+            # 同地點角色的排列順序會影響亂數抽選，需一併保存才能完全重現
+            "locations": {loc: [index[c] for c in chars] for loc, chars in self.roster.by_location.items()},
+            "rng": self.rng.getstate(),
+        }
+
+    @classmethod
+    def from_state(cls, state, logger_callback=None, silent=False, log_level=INFO, log_categories=None):
+        """由 export_state() 的結果重建引擎 (不重新抽劇本、不輸出開局訊息)"""
+        engine = cls.__new__(cls)
+        engine.seed = state["seed"]
+        engine.rng = random.Random()
+        engine.rng.setstate(state["rng"])
+        engine.day, engine.max_days, engine.ap = state["day"], state["max_days"], state["ap"]
+        engine.daily_ap = state.get("daily_ap", DAILY_AP)
+        engine.is_game_over, engine.result = state["is_game_over"], state["result"]
+        blocked = state["blocked"]
+        # 舊版存檔保存的是地點清單
+        engine.blocked_mask = blocked if isinstance(blocked, int) else locations_mask(blocked)
+        engine.graves = [Grave(*g) for g in state["graves"]]
+        if silent:
+            engine.log = GameLog.silent()
+        else:
+            engine.log = GameLog(logger_callback or print, log_level, log_categories)
+
+        engine.catalog = get_catalog()
+        engine.scripts = [engine.catalog.get_part(kind, part_id) for kind, part_id in zip(PART_KINDS, state["parts"])]
+        engine.map = engine.catalog.map_for(engine.scripts[0]['id'])
+        engine.characters = []
+        for char_state in state["chars"]:
+            c = Character.__new__(Character)
+            c.__setstate__(char_state)
+            engine.characters.append(c)
+        engine._attach_roster()
+        engine.roster.by_location = {loc: {engine.characters[i]: None for i in ids}
+                                     for loc, ids in state["locations"].items()}
+
+        engine.main_rule = engine.scripts[0].get('rule_tag', 'default')
+        engine.sub_rule = engine.scripts[1].get('rule_tag', 'default')
+        engine.foreshadow_data = engine.scripts[2]
+        engine.rules = compile_rules(engine)  # 開局規則 (setup) 的結果已在角色狀態中，不重跑
+        engine.ability_engine = AbilityEngine(engine.catalog.role_data, engine.rng)
+        engine.ability_engine.compile(engine.characters)
+        return engine
+
     def _apply_initial_rules(self):
         """根據劇本標籤進行初始調整"""
-        if self.sub_rule == "masquerade":
-            self.log("🎭 [規則] 假面舞會：所有人的性別已被隱藏。")
-            for c in self.characters:
-                c.gender = None 
+        self.rules.run_setup(self)
 
         for c in self.characters:
-            if c.role == "仿生人":
+            if c.role_id == ANDROID_ROLE_ID:
                 c.sanity = 5 
         
         # 隨機分配一個初始陰謀
         if self.characters:
-            target = random.choice(self.characters)
+            target = self.rng.choice(self.characters)
             target.intrigue = 1
-            # self.log(f"DEBUG: 初始陰謀者是 {target.name}")
+            self.events.emit(INTRIGUE_GAIN, target, None, CAUSE_INITIAL)
 
-    def log(self, message):
-        """將訊息輸出至介面"""
-        if message:
-            self.log_func(message)
+    def _on_death(self, char):
+        """死亡當下立即立碑並更新計數 (勝敗判定不再需要掃描名冊)"""
+        self.alive_count -= 1
+        self.graves.append(Grave(char.name, char.location, self.day))
+        self.events.emit(GRAVE, char, char.location, self.day)
 
     def _get_chars_in_loc(self, loc_id):
         """獲取特定地點的活人列表"""
-        return [c for c in self.characters if c.location == loc_id and not c.is_dead]
+        return self.roster.alive_at(loc_id)
 
     # --- 核心階段循環 ---
 
     def phase_sunrise(self):
-        self.log("\n☀️ === 日出階段：角色能力發動 ===")
+        self.events.emit(PHASE_START, 'sunrise', self.day)
         # 每個日出，路障會失效（或者你可以自定義路障持續時間）
-        if self.blocked_locations:
-            self.log(f"🚧 地點 {self.blocked_locations} 的路障已拆除。")
-            self.blocked_locations = []
+        if self.blocked_mask:
+            self.log("🚧 地點 {} 的路障已拆除。", self.blocked_locations, category=RULE)
+            self.blocked_mask = 0
 
-        for c in self.characters:
-            if not c.is_dead:
-                self.ability_engine.run(c, self.characters, 'sunrise', self.log)
+        self.ability_engine.run_phase('sunrise', self.roster)
 
     def phase_morning(self):
-        self.log(f"\n🏃 === 第 {self.day} 天 早上：NPC 移動 ===")
+        self.events.emit(PHASE_START, 'morning', self.day)
         
-        # 副線規則：暴風雨
-        if self.sub_rule == "stormy_seas" and random.random() < 0.5:
-            self.log("🌊 暴風雨來襲，所有人受困原地無法移動！")
-            return
+        # 劇本規則可以讓今天的 NPC 全部不移動 (例如暴風雨)
+        for gate in self.rules.movement_gate:
+            if not gate(self):
+                return
 
+        game_map, blocked, station = self.map, self.blocked_mask, self.map.station_id
         for c in self.characters:
             # 玩家(Index 0)不自動移動，死者不移動
             if c != self.characters[0] and not c.is_dead:
-                # 傳入 blocked_locations，讓移動邏輯避開路障
-                new_loc = calculate_sunrise_move(c.location, self.blocked_locations)
+                # 傳入路障遮罩，讓移動邏輯避開路障
+                new_loc = calculate_sunrise_move(c.location, blocked, self.rng, game_map)
                 if new_loc != c.location:
-                    process_arrival(c, new_loc, self.log)
+                    process_arrival(c, new_loc, self.roster, self.rng, station)
 
     def phase_dusk(self):
-        self.log("\n🌅 === 黃昏階段：恐慌蔓延 ===")
-        for c in self.characters:
-            if not c.is_dead:
-                self.ability_engine.run(c, self.characters, 'dusk', self.log)
+        self.events.emit(PHASE_START, 'dusk', self.day)
+        self.ability_engine.run_phase('dusk', self.roster)
         
         # 檢查黃昏伏筆
         self._check_events('dusk')
 
     def phase_night(self):
-        self.log("\n🌃 === 夜晚階段：黑暗行動 ===")
-        for c in self.characters:
-            if not c.is_dead:
-                self.ability_engine.run(c, self.characters, 'night', self.log)
-        
-        # 處理死亡與墓碑生成
-        for c in self.characters:
-            if c.is_dead and not any(g.name == c.name for g in self.graves):
-                new_grave = Grave(c.name, c.location, self.day)
-                self.graves.append(new_grave)
-                self.log(f"⚰️ {c.name} 死亡，墓碑立於 {c.location}。")
-
+        self.events.emit(PHASE_START, 'night', self.day)
+        self.ability_engine.run_phase('night', self.roster)
+        # 墓碑已在死亡當下 (_on_death) 建立
         self._check_game_over()
 
     # --- 判定系統 ---
@@ -123,27 +269,30 @@ class GameEngine:
             mad_chars = [c for c in self.characters if c.sanity <= 0 and not c.is_dead]
             if mad_chars and 'panic_event' in self.foreshadow_data:
                 event = self.foreshadow_data['panic_event']
-                self.log(f"📢 [事件] 恐慌觸發：{event['effect']}")
+                self.events.emit(EVENT_TRIGGER, self.foreshadow_data['id'], event['effect'])
                 # 執行具體效果邏輯...
 
     def _check_game_over(self):
         """檢查勝敗條件"""
-        # 1. 死亡判定
-        living_count = sum(1 for c in self.characters if not c.is_dead)
-        if living_count <= 1:
-            self.log("💀 倖存者過少，城市崩毀。遊戲結束。")
-            self.is_game_over = True
+        # 1. 死亡判定 (alive_count 由死亡事件即時維護)
+        if self.alive_count <= 1:
+            self._end_game('lose', 'extinction')
             return
 
-        # 2. 劇本特定判定 (範例：古老傳說-獻祭)
-        if self.main_rule == "human_sacrifice" and len(self.graves) >= 6:
-            self.log("💀 [結局] 獻祭已完成，古神甦醒。")
-            self.is_game_over = True
-            return
+        # 2. 劇本特定判定 (例如古老傳說-獻祭)
+        for condition in self.rules.end_condition:
+            outcome = condition(self)
+            if outcome:
+                self._end_game(*outcome)
+                return
 
         # 3. 存活天數判定
         if self.day >= self.max_days:
-            self.log("\n🎉 [勝利] 你成功存活到了第四天！")
-            self.is_game_over = True
+            self._end_game('win', 'survived')
         else:
             self.day += 1
+
+    def _end_game(self, result, reason):
+        self.is_game_over = True
+        self.result = result
+        self.events.emit(GAME_OVER, result, reason)
@@ -1,33 +1,33 @@
 # mechanics.py
 import random
 from settings import STATION_ID
+from topology import DEFAULT_MAP
+from events import SANITY_CHANGE, INTRIGUE_GAIN, INTRIGUE_CLEAR, CAUSE_INSANITY, CAUSE_STATION
 
-def check_sanity_status(char, log_func):
-    """檢查並處理人物精神狀態"""
+def check_sanity_status(char, events):
+    """檢查並處理人物精神狀態
+    :param events: EventBus，發出 SANITY_CHANGE / INTRIGUE_GAIN
+    """
     if char.sanity <= 0 and not char.is_dead:
-        char.sanity = 0
+        if char.sanity < 0:
+            events.emit(SANITY_CHANGE, char, char.sanity, 0, None)
+            char.sanity = 0
         char.intrigue = 1 # 精神崩潰會被黑幕盯上，獲得陰謀狀態
-        log_func(f"   ⚠️ {char.name} 精神崩潰，獲得陰謀狀態！")
+        events.emit(INTRIGUE_GAIN, char, None, CAUSE_INSANITY)
 
-def calculate_sunrise_move(current_loc):
-    """計算日出時的自動移動 (僅限 Loc 0, 1, 2, 3)"""
-    if current_loc == STATION_ID:
-        return current_loc
-    
-    # 50% 機率不動
-    if random.random() < 0.5:
-        return current_loc
-    
-    # 50% 機率移動到相鄰地點 (環形移動)
-    direction = random.choice([-1, 1])
-    new_loc = (current_loc + direction) % 4
-    return new_loc
+def calculate_sunrise_move(current_loc, blocked_mask=0, rng=random, game_map=DEFAULT_MAP):
+    """計算日出時的自動移動 (依地圖的移動分布，車站不動)，目的地有路障則留在原地
+    :param blocked_mask: 路障的位元遮罩 (見 topology.locations_mask)
+    :param rng: 引擎自己的 random.Random (預設為全域 random 模組)
+    :param game_map: topology.MapTopology (預設為環形的五個地點)
+    """
+    return game_map.npc_move(current_loc, blocked_mask, rng)
 
-def process_arrival(char, new_loc, log_func):
-    """處理人物抵達新地點後的邏輯"""
-    char.location = new_loc
+def process_arrival(char, new_loc, roster, rng=random, station_id=STATION_ID):
+    """處理人物抵達新地點後的邏輯 (經由名冊移動，以維護地點索引並發出事件)"""
+    roster.move(char, new_loc)
     
     # 車站邏輯：如果從非車站移動到車站，且精神值高，有機會解除陰謀
-    if new_loc == STATION_ID and char.intrigue > 0 and char.sanity > 2 and random.random() < 0.1:
+    if new_loc == station_id and char.intrigue > 0 and char.sanity > 2 and rng.random() < 0.1:
         char.intrigue = 0
-        log_func(f"   ✨ {char.name} 在車站得到平靜，解除陰謀。")
+        roster.events.emit(INTRIGUE_CLEAR, char, CAUSE_STATION)
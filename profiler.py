@@ -0,0 +1,220 @@
+# profiler.py
+"""
+可選的效能剖析：掛在 GameEngine 上，記錄
+- 每個階段 (日出/早上/黃昏/夜晚) 的耗時
+- 每個身分的能力發動次數與耗時分布
+- 每種效果 (kill / sanity_damage / ...) 與伏筆事件檢查的耗時
+沒有掛上時引擎完全不做任何判斷；掛上後只替換該局的階段方法與 run_phase。
+
+輸出：
+- prometheus()/write_prometheus(path)：Prometheus 文字格式 (histogram)
+- dump_stats(path)：cProfile 相容的統計檔，可用 pstats / snakeviz 開啟
+
+    python profiler.py -n 500 --prom loop.prom --pstats loop.pstats
+"""
+import argparse
+import marshal
+import time
+from bisect import bisect_left
+from functools import partial
+
+from models import SYMBOLS
+
+# histogram 的上界 (秒)，最後另有 +Inf
+BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 1e-2)
+
+PROFILED_PHASES = ("phase_sunrise", "phase_morning", "phase_dusk", "phase_night")
+EVENT_CHECK = "_check_events"
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+    def cumulative(self):
+        """Prometheus 的累積計數 [(上界字串, 次數)]"""
+        rows, running = [], 0
+        for bound, n in zip(BUCKETS + (None,), self.counts):
+            running += n
+            rows.append(("+Inf" if bound is None else repr(bound), running))
+        return rows
+
+
+def _effect_name(apply_effect):
+    """效果函式 (可能是 partial) -> 'kill' 之類的名稱"""
+    func = getattr(apply_effect, "func", apply_effect)
+    return func.__name__.replace("_effect_", "", 1)
+
+
+def _code_of(func):
+    func = getattr(func, "func", func)
+    func = getattr(func, "__func__", func)
+    code = func.__code__
+    return code.co_filename, code.co_firstlineno
+
+
+class Profiler:
+    """可同時掛在多局上 (例如伺服器的所有 session)，統計結果會累加"""
+    clock = staticmethod(time.perf_counter)
+
+    def __init__(self):
+        self.phases = {}   # 階段名稱 -> Histogram
+        self.roles = {}    # 身分 ID -> Histogram
+        self.effects = {}  # 效果名稱 -> Histogram
+        self._effect_names = {}
+        self._sources = {}  # 統計項目 -> (檔名, 行號)，供 dump_stats 使用
+
+    # --- 掛上 / 卸下 ---
+
+    def attach(self, engine):
+        engine.profiler = self
+        for name in PROFILED_PHASES:
+            setattr(engine, name, self._timed(self.phases, name.replace("phase_", ""), getattr(engine, name)))
+        setattr(engine, EVENT_CHECK, self._timed(self.effects, "foreshadow_check", getattr(engine, EVENT_CHECK)))
+        ability_engine = engine.ability_engine
+        ability_engine.run_phase = partial(ability_engine.run_phase_profiled, profiler=self)
+        return engine
+
+    def detach(self, engine):
+        """移除計時包裝 (也用於分身：copy.copy 會連同包裝一起複製)"""
+        for name in PROFILED_PHASES + (EVENT_CHECK,):
+            engine.__dict__.pop(name, None)
+        engine.ability_engine.__dict__.pop("run_phase", None)
+        engine.profiler = None
+
+    def _timed(self, table, key, method):
+        hist = table.setdefault(key, Histogram())
+        self._sources.setdefault((id(table), key), _code_of(method))
+        clock = self.clock
+
+        def timed(*args):
+            start = clock()
+            try:
+                return method(*args)
+            finally:
+                hist.observe(clock() - start)
+        return timed
+
+    # --- 由 AbilityEngine.run_phase_profiled 呼叫 ---
+
+    def observe_role(self, role_id, seconds):
+        hist = self.roles.get(role_id)
+        if hist is None:
+            hist = self.roles[role_id] = Histogram()
+        hist.observe(seconds)
+
+    def observe_effect(self, apply_effect, seconds):
+        name = self._effect_names.get(apply_effect)
+        if name is None:
+            name = self._effect_names[apply_effect] = _effect_name(apply_effect)
+            self._sources.setdefault((id(self.effects), name), _code_of(apply_effect))
+        hist = self.effects.get(name)
+        if hist is None:
+            hist = self.effects[name] = Histogram()
+        hist.observe(seconds)
+
+    # --- 彙總 ---
+
+    def merge(self, other):
+        """合併另一個 Profiler 的結果 (例如多行程各自統計後)"""
+        for mine, theirs in ((self.phases, other.phases), (self.roles, other.roles), (self.effects, other.effects)):
+            for key, hist in theirs.items():
+                mine.setdefault(key, Histogram()).merge(hist)
+
+    def _tables(self):
+        """(指標名稱, 標籤名稱, 說明, {標籤值: Histogram})"""
+        roles = {SYMBOLS.lookup(role_id): hist for role_id, hist in self.roles.items()}
+        return (
+            ("loop_phase_seconds", "phase", "各階段耗時", self.phases),
+            ("loop_ability_seconds", "role", "各身分每次能力發動的耗時", roles),
+            ("loop_effect_seconds", "effect", "各效果與伏筆事件檢查的耗時", self.effects),
+        )
+
+    def prometheus(self):
+        """Prometheus 文字格式 (exposition format 0.0.4)"""
+        lines = []
+        for metric, label, help_text, table in self._tables():
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for key, hist in sorted(table.items()):
+                value = str(key).replace("\\", "\\\\").replace('"', '\\"')
+                for bound, n in hist.cumulative():
+                    lines.append(f'{metric}_bucket{{{label}="{value}",le="{bound}"}} {n}')
+                lines.append(f'{metric}_sum{{{label}="{value}"}} {hist.total!r}')
+                lines.append(f'{metric}_count{{{label}="{value}"}} {hist.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+
+    def stats(self):
+        """
+        cProfile 格式的統計 dict：{(檔名, 行號, 名稱): (原生呼叫數, 呼叫數, 自身時間, 累計時間, {})}。
+        身分沒有對應的函式，檔名記為 "<role>"。
+        """
+        stats = {}
+        for metric, label, _, table in self._tables():
+            for key, hist in table.items():
+                if label == "role":
+                    filename, line = "<role>", 0
+                else:
+                    filename, line = self._sources.get((id(table), key), ("<loop>", 0))
+                stats[(filename, line, f"{label}:{key}")] = (hist.count, hist.count, hist.total, hist.total, {})
+        return stats
+
+    def dump_stats(self, path):
+        """寫成 pstats.Stats(path) 可讀取的檔案"""
+        with open(path, "wb") as f:
+            marshal.dump(self.stats(), f)
+
+    def report(self, limit=10):
+        """依總耗時排序的文字摘要"""
+        lines = []
+        for _, label, help_text, table in self._tables():
+            lines.append(f"📊 {help_text}")
+            for key, hist in sorted(table.items(), key=lambda kv: -kv[1].total)[:limit]:
+                mean = hist.total / hist.count * 1e6 if hist.count else 0.0
+                lines.append(f"  {str(key):<18} {hist.count:>8} 次  {hist.total * 1e3:>9.2f} ms  平均 {mean:.2f} µs")
+        return "\n".join(lines)
+
+
+def main(argv=None):
+    import simulator
+
+    parser = argparse.ArgumentParser(description="以隨機策略跑數局並剖析遊戲迴圈")
+    parser.add_argument("-n", "--games", type=int, default=500, help="局數")
+    parser.add_argument("-p", "--policy", choices=sorted(simulator.POLICIES), default="random", help="玩家策略")
+    parser.add_argument("--prom", metavar="PATH", help="寫出 Prometheus 文字檔")
+    parser.add_argument("--pstats", metavar="PATH", help="寫出 cProfile 相容的統計檔")
+    args = parser.parse_args(argv)
+
+    profiler = Profiler()
+    policy = simulator.POLICIES[args.policy]()
+    for seed in range(args.games):
+        simulator.play_game(policy, seed=seed, profiler=profiler)
+    print(profiler.report())
+    if args.prom:
+        profiler.write_prometheus(args.prom)
+        print(f"💾 已寫入 {args.prom}")
+    if args.pstats:
+        profiler.dump_stats(args.pstats)
+        print(f"💾 已寫入 {args.pstats}")
+
+
+if __name__ == "__main__":
+    main()
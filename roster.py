@@ -0,0 +1,73 @@
+# roster.py
+from events import EventBus, DEATH, MOVE, MOVE_NPC
+from models import SYMBOLS
+
+class Roster:
+    """
+    角色名冊：持有全部角色，並維護「地點 -> 活人」與「身分 -> 活人」兩個索引。
+    所有位置變更與死亡都必須經過 move() / kill()，索引才會保持正確，
+    並透過 EventBus 發出 MOVE / DEATH 事件 (未指定匯流排時自建一個)。
+    """
+    def __init__(self, characters, events=None):
+        self.characters = characters
+        self.events = events if events is not None else EventBus()
+        self.rebuild()
+
+    def rebuild(self):
+        """依角色目前的狀態重建索引 (例如還原快照之後)"""
+        # 以 dict 當作有序集合：保持插入順序，且刪除為 O(1)
+        by_location = {}
+        by_role = {}
+        for c in self.characters:
+            if not c.is_dead:
+                by_location.setdefault(c.location, {})[c] = None
+                by_role.setdefault(c.role_id, {})[c] = None
+        self.by_location = by_location
+        self.by_role = by_role
+
+    # --- 查詢 ---
+
+    def alive_at(self, loc_id):
+        """特定地點的活人列表"""
+        return list(self.by_location.get(loc_id, ()))
+
+    def count_at(self, loc_id):
+        """特定地點的活人數"""
+        return len(self.by_location.get(loc_id, ()))
+
+    def others_at(self, char):
+        """與 char 同地點的其他活人"""
+        return [c for c in self.by_location.get(char.location, ()) if c is not char]
+
+    def first_with_role(self, role_id):
+        """特定身分中 (依名冊順序) 第一個活人，沒有則返回 None
+        :param role_id: 身分 ID (models.SYMBOLS)；傳入字串時自動轉換
+        """
+        if isinstance(role_id, str):
+            role_id = SYMBOLS.intern(role_id)
+        return next(iter(self.by_role.get(role_id, ())), None)
+
+    # --- 狀態變更 ---
+
+    def move(self, char, new_loc, cause=MOVE_NPC):
+        """變更人物位置並同步索引
+        :param cause: 移動原因 (events.MOVE_NPC / MOVE_PLAYER / MOVE_ABILITY)
+        """
+        if char.location == new_loc:
+            return
+        old_loc = char.location
+        if not char.is_dead:
+            del self.by_location[old_loc][char]
+            self.by_location.setdefault(new_loc, {})[char] = None
+        char.location = new_loc
+        self.events.emit(MOVE, char, old_loc, new_loc, cause)
+
+    def kill(self, char):
+        """標記死亡並移出索引；返回是否為新的死亡"""
+        if char.is_dead:
+            return False
+        char.is_dead = True
+        del self.by_location[char.location][char]
+        del self.by_role[char.role_id][char]
+        self.events.emit(DEATH, char)
+        return True
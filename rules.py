@@ -0,0 +1,111 @@
+# rules.py
+"""
+劇本規則 (rule_tag) 的掛鉤登錄表。
+每個規則以 @rule(標籤, 種類) 登錄一個函式；引擎建立時依本局劇本的 rule_tag 一次組出 RuleSet，
+之後各處熱路徑只走訪預先綁好的函式清單，不再比對字串。新增規則只需要在這裡登錄掛鉤。
+
+掛鉤種類與呼叫方式：
+- setup(engine)                              開局時 (抽完角色後) 執行一次
+- move_cost(engine, char, target, cost)      -> (新成本, AP 不足時的訊息)   ActionManager.move
+- ask_cost(engine, char, cost)               -> 新成本                      ActionManager.ask
+- movement_gate(engine)                      -> False 代表本日 NPC 不移動   GameEngine.phase_morning
+- visibility(engine, viewer, char, loc)      -> False 代表 viewer 看不到 char 的資訊 (介面用)
+- end_condition(engine)                      -> (結局, 原因) 或 None        GameEngine._check_game_over
+"""
+from game_log import RULE
+
+HOOK_KINDS = ("setup", "move_cost", "ask_cost", "movement_gate", "visibility", "end_condition")
+
+RULES = {}  # rule_tag -> [(種類, 函式, 啟用條件)]
+
+SACRIFICE_GRAVES = 6  # 主線 human_sacrifice：墓碑達此數量即失敗
+QUARANTINE_LOC = 1    # 支線 lockdown：隔離區
+FOG_LOC = 0           # 支線 thick_fog：濃霧籠罩的地點
+
+
+def rule(tag, kind, when=None):
+    """
+    登錄裝飾器。
+    :param when: 選填的 when(engine) -> bool，建立 RuleSet 時判斷一次 (例如只在特定主題生效)
+    """
+    if kind not in HOOK_KINDS:
+        raise ValueError(f"未知的掛鉤種類: {kind}")
+
+    def register(func):
+        RULES.setdefault(tag, []).append((kind, func, when))
+        return func
+    return register
+
+
+class RuleSet:
+    """本局生效的掛鉤，依種類分成清單 (登錄順序；主線的掛鉤排在支線之前)"""
+    def __init__(self, tags, engine):
+        self.tags = tuple(tags)
+        for kind in HOOK_KINDS:
+            setattr(self, kind, [])
+        for tag in self.tags:
+            for kind, func, when in RULES.get(tag, ()):
+                if when is None or when(engine):
+                    getattr(self, kind).append(func)
+
+    def run_setup(self, engine):
+        for setup in self.setup:
+            setup(engine)
+
+
+def compile_rules(engine):
+    """依引擎的劇本組合 (Main, Sub, Foreshadow 的 rule_tag) 建立 RuleSet"""
+    return RuleSet([part['rule_tag'] for part in engine.scripts if part.get('rule_tag')], engine)
+
+
+# === 主線 ===
+
+@rule("human_sacrifice", "end_condition")
+def _sacrifice_limit(engine):
+    # 古老傳說-獻祭：墓碑太多即失敗
+    if len(engine.graves) >= SACRIFICE_GRAVES:
+        return 'lose', 'sacrifice'
+    return None
+
+
+# === 支線 ===
+
+@rule("masquerade", "setup")
+def _masquerade(engine):
+    engine.log("🎭 [規則] 假面舞會：所有人的性別已被隱藏。", category=RULE)
+    for c in engine.characters:
+        c.gender = None
+
+
+@rule("lockdown", "move_cost")
+def _lockdown(engine, char, target, cost):
+    # 全域封鎖 (321): 進入隔離區需 2 AP
+    if target == QUARANTINE_LOC:
+        return max(cost, 2), "🚨 [封鎖] AP 不足 (進入隔離區需 2 AP)。"
+    return cost, None
+
+
+@rule("high_cost_move", "move_cost")
+def _high_cost_move(engine, char, target, cost):
+    # 監禁 (222): 所有移動 AP 消耗加倍
+    return cost * 2, "⛓️ [監禁] 體力消耗劇增，AP 不足。"
+
+
+@rule("cheap_ask", "ask_cost")
+def _cheap_ask(engine, char, cost):
+    # 情報商 (223): 詢問僅需 0 AP
+    return 0
+
+
+@rule("stormy_seas", "movement_gate")
+def _stormy_seas(engine):
+    if engine.rng.random() < 0.5:
+        engine.log("🌊 暴風雨來襲，所有人受困原地無法移動！", category=RULE)
+        return False
+    return True
+
+
+@rule("thick_fog", "visibility", when=lambda engine: engine.scripts[0]['id'][0] == '4')
+def _thick_fog(engine, viewer, char, loc):
+    # 濃霧只在客輪 (4XX) 生效：看不清 Loc 0 其他人的資訊
+    return loc != FOG_LOC or char is viewer
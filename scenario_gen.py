@@ -1,40 +1,32 @@
 # scenario_gen.py
 import random
-import json
-import os
 from models import Character
-from settings import TOTAL_CHARS, NAMES, STATION_ID
+from settings import TOTAL_CHARS, NAMES, INITIAL_SANITY
+from catalog import get_catalog
+from topology import DEFAULT_MAP
 
 class ScenarioBuilder:
-    def __init__(self, script_file='scripts.json'):
-        # 確保檔案存在，如果不存在則跳過讀取或報錯
-        if not os.path.exists(script_file):
-            raise FileNotFoundError(f"找不到劇本檔案: {script_file}，請確保 scripts.json 存在於同目錄。")
+    def __init__(self, script_file=None, catalog=None):
+        """
+        :param script_file: 劇本檔路徑 (預設為程式目錄下的 scripts.json)
+        :param catalog: 直接指定 ScenarioCatalog；未指定時使用行程內共用的目錄 (不重複讀檔)
+        劇本檔不存在或格式錯誤時拋出 catalog.CatalogError
+        """
+        self.catalog = catalog or get_catalog(script_file)
+        self.scripts = self.catalog.data
             
-        with open(script_file, 'r', encoding='utf-8') as f:
-            self.scripts = json.load(f)
-            
-    def _select_script_parts(self):
-        """從三個部分各隨機選擇一個，確保三個ID開頭來自不同的劇本主題 (1XX, 2XX, 3XX, 4XX)"""
-        
-        # 確保主軸、支線、伏筆來自三個不同的劇本 ID 類別
-        all_ids = list(range(1, 5)) # [1, 2, 3, 4]
-        random.shuffle(all_ids)
-        
-        # 選擇主軸 (Main)
-        main_part = random.choice([s for s in self.scripts['Main'] if s['id'].startswith(str(all_ids[0]))])
-        
-        # 選擇支線 (Sub)，確保 ID 來自不同的類別
-        sub_id_pool = [i for i in all_ids if i != all_ids[0]]
-        sub_part = random.choice([s for s in self.scripts['Sub'] if s['id'].startswith(str(random.choice(sub_id_pool)))])
-        
-        # 選擇伏筆 (Foreshadow)，確保 ID 來自尚未使用的類別
-        foreshadow_id_pool = [i for i in all_ids if i != all_ids[0] and i != int(sub_part['id'][0])]
-        foreshadow_part = random.choice([s for s in self.scripts['Foreshadow'] if s['id'].startswith(str(random.choice(foreshadow_id_pool)))])
-        
-        return [main_part, sub_part, foreshadow_part]
+    def _select_script_parts(self, rng=random):
+        """從所有合法組合中均勻抽一組 (三者 ID 開頭來自不同的劇本主題，組合由目錄預先建好索引)"""
+        return list(self.catalog.triples.sample(rng))
+
+    def iter_triples(self):
+        """逐一走訪所有合法的 (Main, Sub, Foreshadow) 組合，用於完整覆蓋的批次模擬"""
+        return iter(self.catalog.triples)
+
+    def count_triples(self):
+        return len(self.catalog.triples)
 
-    def _generate_characters(self, selected_parts):
+    def _generate_characters(self, selected_parts, rng=random, game_map=DEFAULT_MAP, sanity=INITIAL_SANITY):
         """根據選擇的劇本部分生成人物列表"""
         
         # 1. 收集所有指定角色
@@ -46,7 +38,7 @@ class ScenarioBuilder:
 
         # 2. 隨機選擇剩餘的人名
         available_names = list(NAMES) # 格式: (姓名, 性別)
-        random.shuffle(available_names)
+        rng.shuffle(available_names)
         
         # 3. 確定人物列表
         characters = []
@@ -61,7 +53,6 @@ class ScenarioBuilder:
             if required_gender in ['F', 'M']:
                  # 如果當前名字不匹配，從剩餘名單中找一個匹配的
                 if gender_check != required_gender:
-                    found_index = -1
                     for i, (n, g) in enumerate(available_names):
                         if g == required_gender:
                             # 找到匹配，交換並使用
@@ -70,11 +61,11 @@ class ScenarioBuilder:
                             name, gender_check = name_match, gender_match # 使用匹配的名單
                             break
             
-            # 初始位置隨機分配 (0-4)
-            location = random.randint(0, 4)
+            # 初始位置隨機分配 (地圖上的任一地點)
+            location = rng.randint(0, game_map.size - 1)
             
-            # 創建 Character 物件 (初始 sanity=3, intrigue=0)
-            char = Character(name, gender_check, location, role=role_info['name'])
+            # 創建 Character 物件 (初始精神值由參數決定, intrigue=0)
+            char = Character(name, gender_check, location, role=role_info['name'], sanity=sanity)
             characters.append(char)
 
         # 3b. 填補一般人
@@ -82,15 +73,21 @@ class ScenarioBuilder:
         for _ in range(num_general):
             if available_names:
                 name, gender = available_names.pop(0)
-                location = random.randint(0, 4)
-                char = Character(name, gender, location, role="一般人")
+                location = rng.randint(0, game_map.size - 1)
+                char = Character(name, gender, location, role="一般人", sanity=sanity)
                 characters.append(char)
         
-        random.shuffle(characters)
+        rng.shuffle(characters)
         return characters
 
-    def build(self):
-        """創建遊戲情境，返回人物列表和劇本列表"""
-        selected_parts = self._select_script_parts()
-        characters = self._generate_characters(selected_parts)
+    def build(self, parts=None, rng=random, sanity=INITIAL_SANITY):
+        """
+        創建遊戲情境，返回人物列表和劇本列表
+        :param parts: 指定的 (Main, Sub, Foreshadow)；未指定時隨機抽選
+        :param rng: 呼叫端 (引擎) 的 random.Random，預設為全域 random 模組
+        :param sanity: 角色開局的精神值
+        """
+        selected_parts = list(parts) if parts else self._select_script_parts(rng)
+        game_map = self.catalog.map_for(selected_parts[0]['id'])
+        characters = self._generate_characters(selected_parts, rng, game_map, sanity)
         return characters, selected_parts
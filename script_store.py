@@ -0,0 +1,221 @@
+# script_store.py
+"""
+劇本編輯器的資料層：scripts.json + 只會附加的變更日誌 (scripts.json.journal)。
+- 每次儲存只把這次的變更附加到日誌 (一行一個 JSON)，成本與劇本庫大小無關
+- 日誌累積到一定數量時，由背景執行緒壓實 (compact)：讀回 scripts.json、重播日誌、
+  寫到暫存檔後以 os.replace 原子替換，再從日誌移除已併入的部分
+- 變更都是「整個部件覆寫 / 依 id 刪除」，重播兩次結果相同；
+  因此壓實途中當機 (新檔已寫入但日誌尚未截斷) 也不會讓資料出錯
+遊戲本身只讀 scripts.json，尚未壓實的變更在壓實後才會生效 (編輯器關閉時一定會壓實)。
+"""
+import copy
+import json
+import os
+import threading
+
+from catalog import DEFAULT_PATH, PART_KINDS, CatalogError, load_data
+
+JOURNAL_SUFFIX = ".journal"
+COMPACT_THRESHOLD = 200  # 日誌超過這麼多筆時在背景壓實
+
+
+def atomic_write_json(path, data):
+    """寫到同目錄的暫存檔並 fsync，再原子替換 (讀者不會看到寫到一半的檔案)"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def apply_op(data, op):
+    """把一筆變更套用到劇本資料 (冪等)"""
+    parts = data.setdefault(op["kind"], [])
+    for i, part in enumerate(parts):
+        if part.get("id") == op["id"]:
+            if op["op"] == "delete":
+                del parts[i]
+            else:
+                parts[i] = op["part"]
+            return
+    if op["op"] == "set":
+        parts.append(op["part"])
+
+
+def read_journal(path):
+    """讀取日誌中完整的每一行 (最後一行寫到一半時忽略)，返回 (變更清單, 已讀取的 bytes 數)"""
+    ops, consumed = [], 0
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except FileNotFoundError:
+        return ops, 0
+    for line in raw.splitlines(keepends=True):
+        if not line.endswith(b"\n"):
+            break
+        try:
+            ops.append(json.loads(line))
+        except json.JSONDecodeError:
+            break
+        consumed += len(line)
+    return ops, consumed
+
+
+class ScriptStore:
+    """
+    編輯器用的劇本庫。記憶體中保存完整資料與 (種類, id) -> 位置 的索引，
+    修改只記錄變更，save() 時附加到日誌。
+    """
+    def __init__(self, path=DEFAULT_PATH, compact_threshold=COMPACT_THRESHOLD):
+        self.path = path
+        self.journal_path = path + JOURNAL_SUFFIX
+        self.compact_threshold = compact_threshold
+        self.pending = []         # 尚未寫入日誌的變更
+        self.journal_count = 0    # 日誌中尚未壓實的筆數
+        self._lock = threading.Lock()  # 保護日誌檔 (附加與截斷不能同時進行)
+        self._compact_lock = threading.Lock()  # 同時只有一個壓實
+        self._compactor = None
+        self.load()
+
+    # --- 讀取 ---
+
+    def load(self):
+        try:
+            self.data = load_data(self.path)
+        except CatalogError:
+            if os.path.exists(self.path):
+                raise
+            self.data = {}
+        for kind in PART_KINDS:
+            self.data.setdefault(kind, [])
+        ops, consumed = read_journal(self.journal_path)
+        if os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > consumed:
+            # 最後一筆寫到一半 (當機)：截掉，否則之後附加的變更會接在殘缺的行後面
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(consumed)
+        for op in ops:
+            apply_op(self.data, op)
+        self.journal_count = len(ops)
+        self._reindex()
+        if ops:
+            self.compact_async()  # 上次沒有壓實完 (例如當機)，開檔後在背景補做
+
+    def _reindex(self):
+        self.index = {(kind, part.get("id")): i for kind in PART_KINDS for i, part in enumerate(self.data[kind])}
+
+    def parts(self, kind):
+        return self.data[kind]
+
+    def get(self, kind, part_id):
+        i = self.index.get((kind, part_id))
+        return None if i is None else self.data[kind][i]
+
+    # --- 修改 (只記錄變更，save 時才寫檔) ---
+
+    def new_id(self, kind):
+        """下一個可用的三位數 id"""
+        used = {part.get("id") for part in self.data[kind]}
+        start = max((int(i) for i in used if i and i.isdigit()), default=100) + 1
+        for n in list(range(start, 1000)) + list(range(100, start)):
+            if str(n) not in used:
+                return str(n)
+        raise CatalogError(f"{kind} 的 id 已用完")
+
+    def add(self, kind, part):
+        part.setdefault("id", self.new_id(kind))
+        self.index[(kind, part["id"])] = len(self.data[kind])
+        self.data[kind].append(part)
+        self.touch(kind, part["id"])
+        return part
+
+    def touch(self, kind, part_id):
+        """部件內容被修改過：記錄一筆覆寫 (同一部件連續修改只保留最後一筆)"""
+        if self.pending and self.pending[-1]["op"] == "set" and \
+                (self.pending[-1]["kind"], self.pending[-1]["id"]) == (kind, part_id):
+            self.pending.pop()
+        # 記錄的是當下內容的複本，之後在記憶體中繼續修改不影響已記錄的變更
+        self.pending.append({"op": "set", "kind": kind, "id": part_id,
+                             "part": copy.deepcopy(self.get(kind, part_id))})
+
+    def delete(self, kind, part_id):
+        i = self.index.pop((kind, part_id), None)
+        if i is None:
+            return
+        del self.data[kind][i]
+        for j, part in enumerate(self.data[kind][i:], i):
+            self.index[(kind, part.get("id"))] = j
+        self.pending.append({"op": "delete", "kind": kind, "id": part_id})
+
+    # --- 寫入 ---
+
+    def save(self):
+        """把尚未寫入的變更附加到日誌並 fsync；日誌太長時在背景壓實。返回寫入的筆數"""
+        if not self.pending:
+            return 0
+        lines = "".join(json.dumps(op, ensure_ascii=False) + "\n" for op in self.pending)
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_count += len(self.pending)
+        count = len(self.pending)
+        self.pending = []
+        if self.journal_count >= self.compact_threshold:
+            self.compact_async()
+        return count
+
+    def compact(self):
+        """
+        把日誌併入 scripts.json。只讀寫磁碟上的檔案、不碰記憶體中的資料，因此可在背景執行；
+        壓實期間新附加的變更會保留在日誌中。
+        """
+        with self._compact_lock:
+            return self._compact()
+
+    def _compact(self):
+        with self._lock:
+            ops, consumed = read_journal(self.journal_path)
+        if not ops:
+            return 0
+        try:
+            data = load_data(self.path, use_cache=False)
+        except CatalogError:
+            if os.path.exists(self.path):
+                raise
+            data = {}
+        for op in ops:
+            apply_op(data, op)
+        atomic_write_json(self.path, data)
+
+        with self._lock:
+            with open(self.journal_path, "rb") as f:
+                f.seek(consumed)
+                rest = f.read()
+            if rest:
+                tmp_path = self.journal_path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(rest)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.journal_path)
+            else:
+                os.remove(self.journal_path)
+            self.journal_count = max(self.journal_count - len(ops), 0)
+        return len(ops)
+
+    def compact_async(self):
+        """在背景執行緒壓實 (已經在壓實時不重複啟動)"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return self._compactor
+        self._compactor = threading.Thread(target=self.compact, name="script-compactor", daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def close(self):
+        """寫入剩下的變更並同步壓實 (關閉編輯器時呼叫)"""
+        self.save()
+        if self._compactor is not None:
+            self._compactor.join()
+        self.compact()
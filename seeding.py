@@ -0,0 +1,19 @@
+# seeding.py
+"""
+亂數串流工具：每個引擎持有自己的 random.Random，
+批次模擬時由主種子依「遊戲編號」推導子種子，
+因此不論工作如何切分到各 worker，同一個編號的遊戲永遠得到同一個串流。
+"""
+import hashlib
+import random
+
+
+def derive_seed(master_seed, *path):
+    """由主種子與路徑 (例如 遊戲編號、或 (格子, 編號)) 推導 64-bit 子種子"""
+    key = repr((master_seed,) + path).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def spawn_rng(master_seed, *path):
+    """建立子串流"""
+    return random.Random(derive_seed(master_seed, *path))
@@ -0,0 +1,483 @@
+# server.py
+"""
+多人連線遊戲伺服器 (asyncio)：同一個行程同時保存大量對局 (session)，
+每個 session 各自持有 GameEngine 與 ActionManager，彼此的狀態與亂數互不影響。
+
+通訊協定：每則訊息是一個 JSON 物件
+- TCP：一行一則 (JSON lines)
+- WebSocket：一個 text frame 一則 (內建最小實作，不需要額外套件)
+
+指令 (可附帶 "id"，回覆時原樣帶回)：
+    {"cmd": "new", "seed": 1}           建立新局並綁定到這條連線
+    {"cmd": "join", "session": "..."}   綁定到已存在的局 (多個連線可觀看同一局)
+    {"cmd": "move", "loc": 2} / {"cmd": "ask"} / {"cmd": "rest"} / {"cmd": "end_turn"}
+    {"cmd": "state"}                    取得完整狀態
+    {"cmd": "close"}                    結束並移除這一局
+    {"cmd": "stats"}                    伺服器統計 (session 數、指令延遲 p50/p99)
+    {"cmd": "metrics"}                  剖析結果 (Prometheus 文字格式，需以 --profile 啟動)
+回覆：{"id", "ok", "message", "log": [新的日誌], "delta": {變動的狀態}}；
+同一局的其他連線會收到 {"push": session_id, "log", "delta"}。
+
+執行：python server.py --port 8765 --ws-port 8766 [--store sessions.db --max-resident 5000] [--profile loop.prom]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import secrets
+import struct
+import time
+import traceback
+from collections import deque
+
+from main import GameEngine
+from actions import ActionManager
+
+MAX_LINE = 64 * 1024
+LATENCY_WINDOW = 10000  # 統計延遲時保留的最近指令數
+WS_INVALID_DATA, WS_TOO_BIG = 1007, 1009  # WebSocket 關閉代碼
+
+
+class BadMessage(ValueError):
+    """
+    收到無法解讀的訊息 (超過 MAX_LINE、不是 UTF-8)。
+    fatal 時回報後關閉連線；close_code 是 WebSocket 關閉時使用的代碼。
+    """
+    def __init__(self, message, fatal=False, close_code=None):
+        super().__init__(message)
+        self.fatal = fatal or close_code is not None
+        self.close_code = close_code
+
+
+class Session:
+    """一局遊戲：引擎、控制器、尚未送出的日誌與上次送出的狀態 (用來計算差異)"""
+    profiler = None  # 指定 profiler.Profiler 時，所有 session (含休眠後重建的) 都會掛上
+
+    def __init__(self, session_id, seed=None, parts=None, engine_state=None):
+        """
+        :param engine_state: GameEngine.export_state() 的結果；指定時還原該局而不是開新局
+        """
+        self.id = session_id
+        self.pending_log = []
+        if engine_state is None:
+            self.engine = GameEngine(logger_callback=self.pending_log.append, seed=seed, parts=parts)
+        else:
+            self.engine = GameEngine.from_state(engine_state, logger_callback=self.pending_log.append)
+        if self.profiler is not None:
+            self.profiler.attach(self.engine)
+        self.actions = ActionManager(self.engine)
+        self.player = self.engine.characters[0]
+        self.last_state = {}
+        self.last_active = time.monotonic()
+
+    # 休眠用：只保存引擎狀態與差異計算的基準
+    def __getstate__(self):
+        return {"id": self.id, "engine": self.engine.export_state(),
+                "pending_log": self.pending_log, "last_state": self.last_state}
+
+    def __setstate__(self, state):
+        self.__init__(state["id"], engine_state=state["engine"])
+        self.pending_log.extend(state["pending_log"])
+        self.last_state = state["last_state"]
+
+    def state(self):
+        """目前的完整狀態 (與 gui_main 顯示的資訊相同)"""
+        engine = self.engine
+        return {
+            "day": engine.day, "ap": engine.ap, "graves": len(engine.graves),
+            "over": engine.is_game_over, "result": engine.result,
+            "chars": [[c.name, c.role, c.location, c.sanity, c.intrigue, c.is_dead, c.known]
+                      for c in engine.characters],
+        }
+
+    def delta(self):
+        """與上次送出相比有變動的欄位 (角色以索引表示)"""
+        state = self.state()
+        last = self.last_state
+        changed = {key: value for key, value in state.items() if key != "chars" and last.get(key) != value}
+        old_chars = last.get("chars", ())
+        chars = {i: row for i, row in enumerate(state["chars"])
+                 if i >= len(old_chars) or old_chars[i] != row}
+        if chars:
+            changed["chars"] = chars
+        self.last_state = state
+        return changed
+
+    def take_log(self):
+        lines = self.pending_log[:]
+        self.pending_log.clear()
+        return lines
+
+    def execute(self, cmd, msg):
+        """把指令對應到 ActionManager；返回 (成功與否, 訊息)"""
+        self.last_active = time.monotonic()
+        if cmd == "move":
+            loc = msg.get("loc")
+            # JSON 的 true/false 在 Python 中是 int 的子類別，要排除
+            if type(loc) is not int or not 0 <= loc < self.engine.map.size:
+                return False, "❓ 無效的地點。"
+            return self.actions.move(self.player, loc)
+        if cmd == "ask":
+            return self.actions.ask(self.player)
+        if cmd == "rest":
+            return self.actions.rest()
+        if cmd == "end_turn":
+            return self.actions.end_turn()
+        return False, f"❓ 未知的指令: {cmd}"
+
+
+class SessionRegistry:
+    """所有進行中的對局"""
+    def __init__(self, max_sessions=100000):
+        self.max_sessions = max_sessions
+        self.sessions = {}
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create(self, seed=None, parts=None):
+        if len(self.sessions) >= self.max_sessions:
+            raise RuntimeError("伺服器已達對局上限")
+        session_id = secrets.token_hex(8)
+        session = Session(session_id, seed, parts)
+        self.sessions[session_id] = session
+        return session
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    def remove(self, session_id):
+        return self.sessions.pop(session_id, None)
+
+
+class LatencyStats:
+    """最近 N 個指令的處理時間"""
+    def __init__(self, window=LATENCY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, p):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    def summary(self):
+        return {"commands": self.count,
+                "p50_ms": round(self.percentile(0.50) * 1000, 3),
+                "p99_ms": round(self.percentile(0.99) * 1000, 3)}
+
+
+class GameServer:
+    def __init__(self, registry=None):
+        """
+        :param registry: 保存 session 的物件 (SessionRegistry 或 session_store.SessionStore)
+        """
+        self.registry = registry if registry is not None else SessionRegistry()
+        self.latency = LatencyStats()
+        self.watchers = {}  # session id -> 綁定這一局的連線 (session 物件可能被休眠後重建，所以另外保存)
+
+    # --- 指令處理 (同步，不含 I/O；每個指令只動到自己的 session) ---
+
+    def handle(self, conn, msg):
+        """處理一則訊息，返回要回給發送者的 dict (推播給其他觀看者的訊息另外送出)"""
+        start = time.perf_counter()
+        try:
+            reply = self._dispatch(conn, msg)
+        except Exception as e:
+            # 單一指令出錯只回報錯誤，不中斷連線 (也不影響其他對局)
+            traceback.print_exc()
+            reply = {"ok": False, "message": f"⚠️ 伺服器處理指令時發生錯誤: {type(e).__name__}"}
+        if "id" in msg:
+            reply["id"] = msg["id"]
+        self.latency.add(time.perf_counter() - start)
+        return reply
+
+    def _dispatch(self, conn, msg):
+        cmd = msg.get("cmd")
+        if cmd == "stats":
+            stats = {"ok": True, "sessions": len(self.registry), **self.latency.summary()}
+            if hasattr(self.registry, "metrics"):
+                stats["store"] = self.registry.metrics()
+            return stats
+        if cmd == "metrics":
+            if Session.profiler is None:
+                return {"ok": False, "message": "伺服器未啟用剖析 (--profile)。"}
+            return {"ok": True, "metrics": Session.profiler.prometheus()}
+
+        if cmd == "new":
+            seed = msg.get("seed")
+            if seed is not None and type(seed) not in (int, str):
+                return {"ok": False, "message": "❓ seed 必須是整數或字串。"}
+            try:
+                session = self.registry.create(seed)
+            except RuntimeError as e:
+                return {"ok": False, "message": str(e)}
+            self._bind(conn, session.id)
+            return {"ok": True, "session": session.id, "log": session.take_log(), "state": session.delta()}
+
+        if cmd == "join":
+            session = self.registry.get(msg.get("session"))
+            if session is None:
+                return {"ok": False, "message": "找不到這一局。"}
+            self._bind(conn, session.id)
+            return {"ok": True, "session": session.id, "state": session.state()}
+
+        session = self.registry.get(conn.session_id) if conn.session_id else None
+        if session is None:
+            return {"ok": False, "message": "尚未建立或加入對局。"}
+        if cmd == "state":
+            return {"ok": True, "state": session.state()}
+        if cmd == "close":
+            self.registry.remove(session.id)
+            for other in self.watchers.pop(session.id, ()):
+                other.session_id = None
+            return {"ok": True}
+
+        success, message = session.execute(cmd, msg)
+        log, delta = session.take_log(), session.delta()
+        if log or delta:
+            push = {"push": session.id, "log": log, "delta": delta}
+            for other in self.watchers.get(session.id, ()):
+                if other is not conn:
+                    other.send(push)
+        return {"ok": success, "message": message, "log": log, "delta": delta}
+
+    # --- 連線 ---
+
+    def _bind(self, conn, session_id):
+        self._unbind(conn)
+        conn.session_id = session_id
+        self.watchers.setdefault(session_id, set()).add(conn)
+
+    def _unbind(self, conn):
+        watchers = self.watchers.get(conn.session_id)
+        if watchers is not None:
+            watchers.discard(conn)
+            if not watchers:
+                del self.watchers[conn.session_id]
+        conn.session_id = None
+
+    async def serve_tcp(self, reader, writer):
+        await self._serve(TcpConnection(reader, writer))
+
+    async def serve_ws(self, reader, writer):
+        conn = await WebSocketConnection.accept(reader, writer)
+        if conn is not None:
+            await self._serve(conn)
+
+    async def _serve(self, conn):
+        try:
+            while True:
+                try:
+                    text = await conn.recv()
+                except BadMessage as e:
+                    conn.reject(e)
+                    if e.fatal:
+                        break
+                    continue
+                if text is None:
+                    break
+                try:
+                    msg = json.loads(text)
+                    if not isinstance(msg, dict):
+                        raise ValueError("訊息必須是 JSON 物件")
+                except ValueError as e:
+                    conn.send({"ok": False, "message": f"格式錯誤: {e}"})
+                    continue
+                conn.send(self.handle(conn, msg))
+                await conn.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._unbind(conn)
+            conn.close()
+
+
+class Connection:
+    """連線的共用部分：綁定的 session id 與送出 JSON"""
+    def __init__(self, writer):
+        self.writer = writer
+        self.session_id = None
+
+    def send(self, obj):
+        self._write(json.dumps(obj, ensure_ascii=False))
+
+    def reject(self, error):
+        """回報無法解讀的訊息 (BadMessage)"""
+        self.send({"ok": False, "message": f"格式錯誤: {error}"})
+
+    async def drain(self):
+        await self.writer.drain()
+
+    def close(self):
+        self.writer.close()
+
+
+class TcpConnection(Connection):
+    def __init__(self, reader, writer):
+        super().__init__(writer)
+        self.reader = reader
+
+    async def recv(self):
+        try:
+            line = await self.reader.readline()
+        except ValueError:
+            # 超過 MAX_LINE (asyncio 把 LimitOverrunError 包成 ValueError)；剩下的部分無法再對齊行界，只能斷線
+            raise BadMessage(f"訊息超過 {MAX_LINE} bytes", fatal=True) from None
+        if not line:
+            return None
+        try:
+            return line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise BadMessage("訊息不是合法的 UTF-8") from None
+
+    def _write(self, text):
+        self.writer.write(text.encode("utf-8") + b"\n")
+
+
+# --- WebSocket (RFC 6455 的最小實作：text frame、分段、ping/pong、close) ---
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONT, OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x8, 0x9, 0xA
+
+
+class WebSocketConnection(Connection):
+    def __init__(self, reader, writer):
+        super().__init__(writer)
+        self.reader = reader
+
+    @classmethod
+    async def accept(cls, reader, writer):
+        """完成 HTTP Upgrade 握手；不是 WebSocket 請求時回 400 並返回 None"""
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return None
+        headers = {}
+        for line in request.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key or headers.get("upgrade", "").lower() != "websocket":
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            writer.close()
+            return None
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        return cls(reader, writer)
+
+    async def recv(self):
+        fragments = []
+        size = 0
+        while True:
+            head = await self.reader.readexactly(2)
+            fin, opcode = head[0] & 0x80, head[0] & 0x0F
+            masked, length = head[1] & 0x80, head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await self.reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await self.reader.readexactly(8))[0]
+            if opcode < OP_CLOSE:  # 控制訊框 (close/ping/pong) 不算進訊息大小
+                size += length
+            if size > MAX_LINE or length > MAX_LINE:
+                raise BadMessage(f"訊息超過 {MAX_LINE} bytes", close_code=WS_TOO_BIG)
+            mask = await self.reader.readexactly(4) if masked else None
+            payload = await self.reader.readexactly(length)
+            if mask:
+                payload = bytes(b ^ m for b, m in zip(payload, itertools.cycle(mask)))
+
+            if opcode == OP_CLOSE:
+                self._frame(OP_CLOSE, payload[:2])
+                return None
+            if opcode == OP_PING:
+                self._frame(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            fragments.append(payload)
+            if fin:
+                try:
+                    return b"".join(fragments).decode("utf-8")
+                except UnicodeDecodeError:
+                    raise BadMessage("訊息不是合法的 UTF-8", close_code=WS_INVALID_DATA) from None
+
+    def reject(self, error):
+        if error.close_code is None:
+            super().reject(error)
+        else:
+            self._frame(OP_CLOSE, struct.pack("!H", error.close_code) + str(error).encode("utf-8"))
+
+    def _frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            head = struct.pack("!BB", 0x80 | opcode, length)
+        elif length < 1 << 16:
+            head = struct.pack("!BBH", 0x80 | opcode, 126, length)
+        else:
+            head = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+        self.writer.write(head + payload)
+
+    def _write(self, text):
+        self._frame(OP_TEXT, text.encode("utf-8"))
+
+
+async def _hibernate_idle(store, idle_seconds):
+    """定期把閒置的 session 休眠到磁碟"""
+    while True:
+        await asyncio.sleep(idle_seconds / 2)
+        store.hibernate_idle(idle_seconds)
+
+
+async def run_server(host="127.0.0.1", port=8765, ws_port=None, server=None, idle_seconds=None):
+    """
+    :param idle_seconds: registry 為 SessionStore 時，閒置超過此秒數的 session 會被休眠
+    """
+    server = server or GameServer()
+    servers = [await asyncio.start_server(server.serve_tcp, host, port, limit=MAX_LINE)]
+    print(f"🚉 TCP 伺服器啟動於 {host}:{port}")
+    if ws_port is not None:
+        servers.append(await asyncio.start_server(server.serve_ws, host, ws_port, limit=MAX_LINE))
+        print(f"🌐 WebSocket 伺服器啟動於 ws://{host}:{ws_port}")
+    tasks = [s.serve_forever() for s in servers]
+    if idle_seconds and hasattr(server.registry, "hibernate_idle"):
+        tasks.append(_hibernate_idle(server.registry, idle_seconds))
+    await asyncio.gather(*tasks)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LOOP 多人連線遊戲伺服器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="TCP (JSON lines) 連接埠")
+    parser.add_argument("--ws-port", type=int, default=None, help="WebSocket 連接埠 (未指定則不啟動)")
+    parser.add_argument("--store", metavar="PATH", help="閒置 session 休眠到此 SQLite 檔 (未指定則全部留在記憶體)")
+    parser.add_argument("--max-resident", type=int, default=10000, help="記憶體中最多保留的 session 數")
+    parser.add_argument("--idle", type=float, default=None, help="閒置超過幾秒就休眠")
+    parser.add_argument("--profile", metavar="PATH", help="啟用剖析，結束時把 Prometheus 文字寫入此檔")
+    args = parser.parse_args()
+
+    if args.profile:
+        from profiler import Profiler
+        Session.profiler = Profiler()
+
+    store = None
+    if args.store:
+        from session_store import SessionStore
+        store = SessionStore(args.store, args.max_resident)
+    try:
+        asyncio.run(run_server(args.host, args.port, args.ws_port, GameServer(store), args.idle))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+        if Session.profiler is not None:
+            Session.profiler.write_prometheus(args.profile)
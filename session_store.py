@@ -0,0 +1,137 @@
+# session_store.py
+"""
+會休眠的 session 倉庫 (取代 server.SessionRegistry)：
+- 記憶體中最多保留 max_resident 個 session，以 LRU 順序管理
+- 超出時把最久沒用的 session 序列化 (pickle + zlib) 寫入 SQLite，並從記憶體移除
+- 下一個指令到達時 get() 會從 SQLite 讀回並重建 (呼叫端感覺不到差異)
+- metrics() 回報命中 / 未命中 / 休眠次數與重建延遲
+
+執行：python server.py --store sessions.db --max-resident 5000
+"""
+import pickle
+import secrets
+import sqlite3
+import time
+import zlib
+from array import array
+from collections import OrderedDict
+
+from server import Session, LatencyStats
+
+
+def _pack_rng(state):
+    """random.getstate() 的 625 個整數改存成 array bytes (約為 pickle 整數 tuple 的一半)"""
+    version, internal, gauss = state
+    return version, array("I", internal).tobytes(), gauss
+
+
+def _unpack_rng(packed):
+    version, raw, gauss = packed
+    return version, tuple(array("I", raw)), gauss
+
+
+def dumps_session(session):
+    state = session.__getstate__()
+    state["engine"]["rng"] = _pack_rng(state["engine"]["rng"])
+    return zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def loads_session(blob):
+    state = pickle.loads(zlib.decompress(blob))
+    state["engine"]["rng"] = _unpack_rng(state["engine"]["rng"])
+    session = Session.__new__(Session)
+    session.__setstate__(state)
+    return session
+
+
+class SessionStore:
+    def __init__(self, path=":memory:", max_resident=10000):
+        """
+        :param path: SQLite 檔案路徑 (":memory:" 只用於測試)
+        :param max_resident: 記憶體中最多保留的 session 數 (記憶體預算)
+        """
+        self.max_resident = max_resident
+        self.resident = OrderedDict()  # session id -> Session，最近使用的在最後
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, saved REAL)")
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.rehydrate = LatencyStats()
+
+    def __len__(self):
+        """全部 session 數 (記憶體中 + 休眠中)"""
+        return len(self.resident) + self.hibernated_count()
+
+    def hibernated_count(self):
+        return self.db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    # --- 與 SessionRegistry 相同的介面 ---
+
+    def create(self, seed=None, parts=None):
+        session = Session(secrets.token_hex(8), seed, parts)
+        self._admit(session)
+        return session
+
+    def get(self, session_id):
+        session = self.resident.get(session_id)
+        if session is not None:
+            self.hits += 1
+            self.resident.move_to_end(session_id)
+            return session
+
+        start = time.perf_counter()
+        row = self.db.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None:
+            return None
+        self.misses += 1
+        session = loads_session(row[0])
+        self.db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self.rehydrate.add(time.perf_counter() - start)
+        self._admit(session)  # 可能連帶讓別的 session 休眠，不計入重建延遲
+        return session
+
+    def remove(self, session_id):
+        session = self.resident.pop(session_id, None)
+        self.db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        return session
+
+    # --- 休眠 ---
+
+    def _admit(self, session):
+        self.resident[session.id] = session
+        while len(self.resident) > self.max_resident:
+            self.hibernate(next(iter(self.resident)))
+
+    def hibernate(self, session_id):
+        """把 session 寫入磁碟並移出記憶體"""
+        session = self.resident.pop(session_id)
+        self.db.execute("INSERT OR REPLACE INTO sessions (id, data, saved) VALUES (?, ?, ?)",
+                        (session_id, dumps_session(session), time.time()))
+        self.evictions += 1
+
+    def hibernate_idle(self, idle_seconds):
+        """把超過 idle_seconds 沒有動作的 session 全部休眠 (可由伺服器定期呼叫)"""
+        now = time.monotonic()
+        idle = [sid for sid, s in self.resident.items() if now - s.last_active > idle_seconds]
+        for session_id in idle:
+            self.hibernate(session_id)
+        return len(idle)
+
+    def metrics(self):
+        lookups = self.hits + self.misses
+        summary = self.rehydrate.summary()
+        return {
+            "resident": len(self.resident), "hibernated": self.hibernated_count(),
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "rehydrate_p50_ms": summary["p50_ms"], "rehydrate_p99_ms": summary["p99_ms"],
+        }
+
+    def close(self):
+        """關閉前把記憶體中的 session 全部寫入磁碟 (下次啟動可繼續)"""
+        for session_id in list(self.resident):
+            self.hibernate(session_id)
+        self.db.close()
@@ -1,14 +1,17 @@
 # settings.py
-import json
-import os
+from catalog import get_catalog, CatalogError
+from topology import DEFAULT_MAP
 
 # === 地點與全域設定 ===
-STATION_ID = 4  # 特殊地點 ID (車站、駕駛台、中央控制室等)
-NUM_LOCATIONS = 5  # 地點總數 (0, 1, 2, 3, 4)
+# 預設地圖的值；劇本可在 scripts.json 的 Maps 定義自己的地圖，引擎內一律使用 engine.map
+STATION_ID = DEFAULT_MAP.station_id  # 特殊地點 ID (車站、駕駛台、中央控制室等)
+NUM_LOCATIONS = DEFAULT_MAP.size  # 地點總數 (0, 1, 2, 3, 4)
 
 # === 遊戲通用常數 ===
 TOTAL_CHARS = 8
 MAX_DAYS = 4
+DAILY_AP = 5  # 玩家每天的行動點
+INITIAL_SANITY = 3  # 角色開局的精神值 (仿生人另外設為 5)
 
 # === 角色資料庫 (用於隨機分配名字和職業背景) ===
 # 格式: (姓名, 性別)
@@ -26,22 +29,15 @@ DEFAULT_SCRIPTS_DB = {
 }
 
 def load_scripts():
-    """從 JSON 檔案讀取劇本，並提供更健壯的錯誤處理"""
-    file_path = os.path.join(os.getcwd(), "scripts.json")  # 確保路徑讀取正確
+    """
+    經由共用的劇本目錄 (catalog.get_catalog) 取得劇本資料。
+    載入失敗時只提示並返回空結構，讓工具類程式仍可匯入本模組；
+    真正建立遊戲時 ScenarioBuilder 會以同樣的 CatalogError 失敗。
+    """
     try:
-        if not os.path.exists(file_path):
-            print(f"⚠️ 注意：找不到 {file_path}，已使用默認空結構。")
-            return DEFAULT_SCRIPTS_DB
-
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)  # 讀取 JSON
-
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON 檔案無法解析: {e}")
-        return DEFAULT_SCRIPTS_DB
-
-    except Exception as e:
-        print(f"❌ 錯誤發生，無法讀取 {file_path}: {e}")
+        return get_catalog().data
+    except CatalogError as e:
+        print(f"❌ {e}，已使用默認空結構。")
         return DEFAULT_SCRIPTS_DB
 
 # 初始化全域變數
@@ -0,0 +1,225 @@
+# simulator.py
+import argparse
+import os
+import time
+from collections import Counter
+from multiprocessing import Pool
+
+from main import GameEngine
+from actions import ActionManager
+from catalog import get_catalog, PART_KINDS
+from seeding import derive_seed
+from planner import PlannerPolicy
+
+MAX_ACTIONS_PER_TURN = 10  # 防止 0 AP 的動作 (如情報商) 造成無限循環
+
+
+# --- 玩家策略 ---
+
+class IdlePolicy:
+    """什麼都不做，每天直接放棄行動點"""
+    def choose(self, engine, player):
+        return None
+
+
+class RandomPolicy:
+    """在移動與詢問之間隨機選擇 (使用引擎的亂數串流，整局可由種子重播)"""
+    def __init__(self, ask_rate=0.3):
+        self.ask_rate = ask_rate
+
+    def choose(self, engine, player):
+        if engine.rng.random() < self.ask_rate:
+            return ("ask",)
+        target = engine.rng.randrange(engine.map.size)
+        if target == player.location:
+            return None
+        return ("move", target)
+
+
+POLICIES = {
+    "idle": IdlePolicy,
+    "random": RandomPolicy,
+    "planner": PlannerPolicy,
+}
+
+
+# --- 單局模擬 ---
+
+def play_turn(engine, actions, player, policy):
+    """讓策略花掉當天的行動點；策略放棄或動作失敗時結束回合"""
+    for _ in range(MAX_ACTIONS_PER_TURN):
+        if engine.ap <= 0 or engine.is_game_over:
+            break
+        choice = policy.choose(engine, player)
+        if choice is None:
+            break
+        if choice[0] == "move":
+            success, _ = actions.move(player, choice[1])
+        else:
+            success, _ = actions.ask(player)
+        if not success:
+            break
+    actions.rest()
+
+
+def play_game(policy, seed=None, parts=None, recorder_cls=None, game_index=0, profiler=None, tuning=None):
+    """跑完一整局，返回結束時的 GameEngine
+    :param recorder_cls: 指定時 (例如 game_records.GameRecorder) 掛上紀錄器，存為 engine.recorder
+    :param profiler: 指定時 (profiler.Profiler) 累加本局的剖析結果
+    :param tuning: 參數覆寫 (見 GameEngine / balance.py)
+    """
+    engine = GameEngine(seed=seed, parts=parts, silent=True, tuning=tuning)
+    if profiler is not None:
+        profiler.attach(engine)
+    if recorder_cls is not None:
+        engine.recorder = recorder_cls(engine, game_index)
+    actions = ActionManager(engine)
+    player = engine.characters[0]
+    while not engine.is_game_over:
+        play_turn(engine, actions, player, policy)
+        actions.end_turn()
+    return engine
+
+
+def summarize_game(engine):
+    """把一局的結果壓成統計用的 tuple (勝利 = 撐到期限且玩家本人存活)"""
+    ids = tuple(part['id'] for part in engine.scripts)
+    alive = not engine.characters[0].is_dead
+    return ids, engine.result == 'win' and alive, alive, engine.day
+
+
+# --- 多行程批次 ---
+
+def _run_chunk(task):
+    """
+    Worker：跑編號 [first, first + n_games) 的遊戲並回傳彙總後的計數
+    (只回傳計數，避免大量物件跨行程傳輸；要求紀錄時另外回傳打包好的二進位紀錄)。
+    第 i 局的種子只由 (master_seed, i) 決定，與切分方式和行程數無關。
+    """
+    policy_name, first, n_games, master_seed, record = task
+    policy = POLICIES[policy_name]()
+    recorder_cls = rows = None
+    if record:
+        # 需要 numpy，只在要求紀錄時載入
+        from game_records import GameRecorder
+        recorder_cls, rows = GameRecorder, []
+
+    games = Counter()
+    wins = Counter()
+    player_alive = 0
+    start = time.perf_counter()
+    for game_index in range(first, first + n_games):
+        engine = play_game(policy, derive_seed(master_seed, game_index), None, recorder_cls, game_index)
+        if rows is not None:
+            rows.append(engine.recorder.record())
+        ids, won, alive, _day = summarize_game(engine)
+        for kind, part_id in zip(PART_KINDS, ids):
+            games[(kind, part_id)] += 1
+            if won:
+                wins[(kind, part_id)] += 1
+        player_alive += alive
+    elapsed = time.perf_counter() - start
+    if rows is not None:
+        from game_records import to_array
+        rows = to_array(rows).tobytes()
+    return games, wins, player_alive, elapsed, rows
+
+
+class SimulationResult:
+    """彙總多個 worker 的結果"""
+    def __init__(self):
+        self.total_games = 0
+        self.total_wins = 0
+        self.player_alive = 0
+        self.games = Counter()
+        self.wins = Counter()
+        self.cpu_seconds = 0.0  # 各 worker 實際跑遊戲的時間總和
+        self.wall_seconds = 0.0
+
+    def add_chunk(self, chunk):
+        games, wins, player_alive, elapsed, _records = chunk
+        self.games.update(games)
+        self.wins.update(wins)
+        self.player_alive += player_alive
+        self.cpu_seconds += elapsed
+        # 每局恰好有一個 Main，用它來計算總局數
+        self.total_games += sum(n for (kind, _), n in games.items() if kind == "Main")
+        self.total_wins += sum(n for (kind, _), n in wins.items() if kind == "Main")
+
+    def win_rate(self, kind=None, part_id=None):
+        if kind is None:
+            return self.total_wins / self.total_games if self.total_games else 0.0
+        n = self.games[(kind, part_id)]
+        return self.wins[(kind, part_id)] / n if n else 0.0
+
+    def games_per_core_second(self):
+        return self.total_games / self.cpu_seconds if self.cpu_seconds else 0.0
+
+
+def run_simulation(n_games, policy_name="random", processes=None, seed=0, chunk_size=500, record_path=None):
+    """把 n_games 局切成多個 chunk 分派到行程池
+    :param record_path: 指定時把每局的二進位紀錄附加到此檔 (見 game_records.py；順序依 chunk 完成先後)
+    """
+    processes = processes or os.cpu_count() or 1
+    record = record_path is not None
+    tasks = [(policy_name, first, min(chunk_size, n_games - first), seed, record)
+             for first in range(0, n_games, chunk_size)]
+
+    writer = None
+    if record:
+        from game_records import RecordWriter
+        writer = RecordWriter(record_path)
+
+    result = SimulationResult()
+    start = time.perf_counter()
+    try:
+        if processes == 1:
+            for task in tasks:
+                _collect(result, writer, _run_chunk(task))
+        else:
+            with Pool(processes) as pool:
+                for chunk in pool.imap_unordered(_run_chunk, tasks):
+                    _collect(result, writer, chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    result.wall_seconds = time.perf_counter() - start
+    return result
+
+
+def _collect(result, writer, chunk):
+    result.add_chunk(chunk)
+    if writer is not None:
+        writer.write_array(chunk[-1])
+
+
+def _part_names():
+    return {key: part.get('name', '') for key, part in get_catalog().by_id.items()}
+
+
+def print_report(result, processes):
+    names = _part_names()
+    print(f"\n📊 共 {result.total_games} 局 | 總勝率 {result.win_rate():.2%} | "
+          f"玩家存活率 {result.player_alive / max(result.total_games, 1):.2%}")
+    for kind in PART_KINDS:
+        print(f"\n[{kind}]")
+        for (k, part_id) in sorted(key for key in result.games if key[0] == kind):
+            n = result.games[(k, part_id)]
+            print(f"  {part_id} {names.get((k, part_id), ''):<10} 局數 {n:>8}  勝率 {result.win_rate(k, part_id):.2%}")
+    wall_rate = result.total_games / result.wall_seconds if result.wall_seconds else 0.0
+    print(f"\n⏱️ 耗時 {result.wall_seconds:.2f}s | {wall_rate:.0f} 局/秒 ({processes} 行程) | "
+          f"{result.games_per_core_second():.0f} 局/秒/核心")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LOOP 無介面批次模擬器")
+    parser.add_argument("-n", "--games", type=int, default=10000, help="模擬局數")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count() or 1, help="行程數")
+    parser.add_argument("-p", "--policy", choices=sorted(POLICIES), default="random", help="玩家策略")
+    parser.add_argument("--seed", type=int, default=0, help="主亂數種子 (各局的子種子由它推導)")
+    parser.add_argument("--chunk", type=int, default=500, help="每個工作單位的局數")
+    parser.add_argument("--record", metavar="PATH", help="把每局的二進位紀錄附加到此檔 (需要 numpy)")
+    args = parser.parse_args()
+
+    sim = run_simulation(args.games, args.policy, args.processes, args.seed, args.chunk, args.record)
+    print_report(sim, args.processes)
@@ -0,0 +1,147 @@
+# telemetry.py
+"""
+遊戲事件的儲存 sink：掛在 GameEngine.events 上，收集型別化事件並分批寫入檔案。
+- JsonlSink：每個事件一行 JSON，方便用 pandas / jq 查詢
+- BinarySink：固定 10 bytes 的紀錄 (種類, 天數, 4 個 int16 欄位)，體積小、可直接 struct 解析
+事件發生時只把參數轉成整數/字串放進緩衝區，序列化與寫檔在 flush 時一次完成。
+
+用法：
+    engine = GameEngine(seed=1, silent=True)
+    with JsonlSink("events.jsonl").attach(engine):
+        ... 進行遊戲 ...
+"""
+import json
+import struct
+from abc import ABC, abstractmethod
+
+import events as ev
+from models import Character
+
+DEFAULT_BATCH = 4096
+
+GAME_START = "game_start"  # 掛上 sink 時寫入的第一筆紀錄：(主線, 支線, 伏筆 id, 角色數, 角色名稱, 種子)
+
+
+class EventSink(ABC):
+    """sink 的共用部分：角色轉成名冊編號、批次緩衝、掛上/卸下匯流排、檔案開關"""
+    MODE = "ab"
+
+    def __init__(self, path_or_file, batch_size=DEFAULT_BATCH):
+        """
+        :param path_or_file: 檔案路徑 (以二進位附加模式開啟，close 時關閉) 或已開啟的二進位檔案物件
+        :param batch_size: 緩衝區累積多少筆事件後寫入一次
+        """
+        self._owns_file = isinstance(path_or_file, str)
+        self.file = open(path_or_file, self.MODE) if self._owns_file else path_or_file
+        self.batch_size = batch_size
+        self.buffer = []
+        self.engine = None
+        self._index = {}
+
+    def attach(self, engine):
+        self.engine = engine
+        self._index = {c: i for i, c in enumerate(engine.characters)}
+        scripts = engine.scripts
+        names = tuple(c.name for c in engine.characters)
+        self._record(GAME_START, (scripts[0]['id'], scripts[1]['id'], scripts[2]['id'],
+                                  len(names), names, engine.seed))
+        engine.events.subscribe_all(self)
+        return self
+
+    def detach(self):
+        if self.engine is not None:
+            self.engine.events.unsubscribe_all(self)
+            self.engine = None
+
+    def __call__(self, kind, args):
+        index = self._index
+        self._record(kind, tuple(index[a] if a.__class__ is Character else a for a in args))
+
+    def _record(self, kind, values):
+        self.buffer.append((kind, self.engine.day, values))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self._write(self.buffer)
+            self.buffer = []
+
+    def close(self):
+        self.detach()
+        self.flush()
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @abstractmethod
+    def _write(self, records):
+        """子類別實作：把一批 (種類, 天數, 參數) 序列化並寫入 self.file"""
+
+
+class JsonlSink(EventSink):
+    """每個事件一行：{"type": ..., "day": ..., <欄位>: ...}；角色以名冊編號表示"""
+
+    def _write(self, records):
+        dumps = json.dumps
+        lines = []
+        for kind, day, values in records:
+            if kind == GAME_START:
+                row = {"type": kind, "day": day, "parts": values[:3], "names": values[4], "seed": values[5]}
+            else:
+                row = {"type": kind, "day": day}
+                row.update(zip(ev.FIELDS[kind], values))
+            lines.append(dumps(row, ensure_ascii=False))
+        self.file.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+
+# --- 二進位格式 ---
+
+RECORD = struct.Struct("<BBhhhh")  # 種類, 天數, 4 個欄位 (不足補 -1)
+BINARY_KINDS = (GAME_START,) + ev.KINDS
+KIND_CODES = {kind: i for i, kind in enumerate(BINARY_KINDS)}
+# 事件參數中的固定字串 -> 小整數
+VALUE_CODES = {value: i for table in (ev.PHASES, ev.ACTIONS, ev.RESULTS, ev.REASONS) for i, value in enumerate(table)}
+VALUE_CODES.update({ev.MOVE_NPC: 0, ev.MOVE_PLAYER: 1, ev.MOVE_ABILITY: 2,
+                    ev.CAUSE_INSANITY: 3, ev.CAUSE_INITIAL: 4, ev.CAUSE_STATION: 5})
+
+
+def _encode_value(value):
+    if value is None:
+        return -1
+    if isinstance(value, int):
+        return value
+    if value.isdigit():  # 劇本 id ('311')
+        return int(value)
+    return VALUE_CODES.get(value, -1)  # 其他字串 (例如伏筆效果名稱) 不保存
+
+
+class BinarySink(EventSink):
+    """
+    固定寬度的二進位事件紀錄。字串參數依 VALUE_CODES 轉成小整數，
+    伏筆事件只保存劇本 id (效果名稱可由劇本查回)。
+    """
+
+    def _write(self, records):
+        pack = RECORD.pack
+        chunks = []
+        for kind, day, values in records:
+            fields = [_encode_value(v) for v in values[:4]]
+            fields += [-1] * (4 - len(fields))
+            chunks.append(pack(KIND_CODES[kind], day, *fields))
+        self.file.write(b"".join(chunks))
+
+
+def read_binary(path):
+    """讀回 BinarySink 的檔案：逐筆產生 (種類, 天數, (欄位...))"""
+    with open(path, "rb") as f:
+        data = f.read()
+    for code, day, *fields in RECORD.iter_unpack(data):
+        yield BINARY_KINDS[code], day, tuple(fields)
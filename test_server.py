@@ -0,0 +1,104 @@
+# test_server.py
+"""server.py 收到無法解讀的訊息時：回覆錯誤或以正確的代碼關閉，不讓連線工作丟出例外"""
+import asyncio
+import base64
+import json
+import os
+import struct
+import unittest
+
+from server import GameServer, MAX_LINE, OP_CLOSE, OP_TEXT, WS_INVALID_DATA, WS_TOO_BIG
+
+
+class ServerProtocolTest(unittest.TestCase):
+    def run_client(self, serve, client):
+        """在本機任意埠啟動 serve，執行 client(reader, writer)；返回 client 的結果與事件迴圈收到的例外"""
+        errors = []
+
+        async def main():
+            asyncio.get_running_loop().set_exception_handler(lambda loop, context: errors.append(context))
+            server = await asyncio.start_server(serve, "127.0.0.1", 0, limit=MAX_LINE)
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                return await asyncio.wait_for(client(reader, writer), 5)
+            finally:
+                writer.close()
+                server.close()
+                await server.wait_closed()
+
+        result = asyncio.run(main())
+        self.assertEqual(errors, [])
+        return result
+
+    # --- TCP ---
+
+    def test_tcp_line_too_long_replies_and_closes(self):
+        async def client(reader, writer):
+            writer.write(b'{"cmd": "stats", "pad": "' + b"x" * (MAX_LINE + 10) + b'"}\n')
+            await writer.drain()
+            reply = json.loads(await reader.readline())
+            return reply, await reader.read()
+
+        reply, rest = self.run_client(GameServer().serve_tcp, client)
+        self.assertFalse(reply["ok"])
+        self.assertIn(str(MAX_LINE), reply["message"])
+        self.assertEqual(rest, b"")  # 伺服器已關閉連線
+
+    def test_tcp_invalid_utf8_replies_and_keeps_connection(self):
+        async def client(reader, writer):
+            writer.write(b'{"cmd": "\xff\xfe"}\n{"cmd": "stats"}\n')
+            await writer.drain()
+            replies = json.loads(await reader.readline()), json.loads(await reader.readline())
+            writer.write_eof()  # 讓伺服器那端正常結束，再收尾
+            await reader.read()
+            return replies
+
+        bad, stats = self.run_client(GameServer().serve_tcp, client)
+        self.assertFalse(bad["ok"])
+        self.assertIn("UTF-8", bad["message"])
+        self.assertTrue(stats["ok"])
+
+    # --- WebSocket ---
+
+    @staticmethod
+    async def ws_handshake(reader, writer):
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write(("GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        await reader.readuntil(b"\r\n\r\n")
+
+    @staticmethod
+    def ws_frame(opcode, payload):
+        """client -> server 的訊框必須加遮罩 (這裡用全 0 的遮罩，內容不變)"""
+        length = len(payload)
+        if length < 126:
+            head = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+        elif length < 1 << 16:
+            head = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+        else:
+            head = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+        return head + b"\0\0\0\0" + payload
+
+    def ws_close_code(self, payload):
+        async def client(reader, writer):
+            await self.ws_handshake(reader, writer)
+            writer.write(self.ws_frame(OP_TEXT, payload))
+            await writer.drain()
+            head = await reader.readexactly(2)
+            body = await reader.readexactly(head[1] & 0x7F)
+            return head[0] & 0x0F, struct.unpack("!H", body[:2])[0]
+
+        opcode, code = self.run_client(GameServer().serve_ws, client)
+        self.assertEqual(opcode, OP_CLOSE)
+        return code
+
+    def test_ws_invalid_utf8_closes_with_1007(self):
+        self.assertEqual(self.ws_close_code(b'{"cmd": "\xff\xfe"}'), WS_INVALID_DATA)
+
+    def test_ws_frame_too_big_closes_with_1009(self):
+        self.assertEqual(self.ws_close_code(b"x" * (MAX_LINE + 1)), WS_TOO_BIG)
+
+
+if __name__ == "__main__":
+    unittest.main()
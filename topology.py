@@ -0,0 +1,162 @@
+# topology.py
+"""
+地圖拓撲 (MapTopology)：每個劇本主題可在 scripts.json 的 Maps 區段定義自己的地圖，
+載入時一次算好所有查詢表，遊戲中只做 O(1) 的查表：
+- adjacency：每個地點的相鄰地點 (有序，NPC 移動依此順序抽選)
+- 全點對最短距離 (BFS，無法抵達為 UNREACHABLE)
+- 每個地點的 NPC 移動分布：相鄰地點依權重展開成 tuple，rng.choice 一次抽完
+- 路障以位元遮罩 (int) 表示：第 i 位為 1 代表地點 i 有路障
+
+scripts.json 範例 (鍵與 Location_Names 相同，依主劇本的主題數字)：
+    "Maps": {
+        "6XX": {
+            "adjacency": [[1, 2], [0, 2], [0, 1, 3], [2]],
+            "weights": [[1, 1], [1, 1], [2, 1, 1], [1]],   (選填，預設全為 1)
+            "station": 3,
+            "stay": 0.5,                                    (選填，NPC 留在原地的機率)
+            "move_cost": "distance",                        (選填，flat = 任何地點 1 AP)
+            "positions": [[50, 100], [150, 200], ...]       (選填，GUI 座標)
+        }
+    }
+沒有定義的主題使用 DEFAULT_MAP：地點 0-3 構成環、4 是不與環相連的車站。
+"""
+import math
+from collections import deque
+
+UNREACHABLE = -1
+MOVE_COSTS = ("flat", "distance")
+CANVAS_SIZE = (600, 300)  # GUI 地圖畫布大小 (自動排列座標用)
+
+
+class MapError(ValueError):
+    """Maps 區段格式不符 (catalog 會轉成 CatalogError)"""
+
+
+def locations_mask(locations):
+    """地點 ID 清單 -> 位元遮罩"""
+    mask = 0
+    for loc in locations:
+        mask |= 1 << loc
+    return mask
+
+
+def mask_locations(mask):
+    """位元遮罩 -> 由小到大的地點 ID 清單 (日誌與存檔用)"""
+    locations = []
+    while mask:
+        low = mask & -mask
+        locations.append(low.bit_length() - 1)
+        mask ^= low
+    return locations
+
+
+class MapTopology:
+    """唯讀的地圖資料 (同一主題的所有引擎共用)"""
+    def __init__(self, adjacency, station_id, weights=None, stay=0.5, move_cost="flat", positions=None):
+        self.size = len(adjacency)
+        self.station_id = station_id
+        self.stay = stay
+        self.move_cost = move_cost
+        self.adjacency = tuple(tuple(neighbours) for neighbours in adjacency)
+        self.all_mask = (1 << self.size) - 1
+        self._validate(weights, positions)
+
+        # NPC 移動分布：權重展開成重複項目；車站的人不會自己離開
+        weights = weights or [[1] * len(neighbours) for neighbours in self.adjacency]
+        self.moves = tuple(
+            () if loc == station_id else
+            tuple(dest for dest, w in zip(neighbours, weights[loc]) for _ in range(w))
+            for loc, neighbours in enumerate(self.adjacency)
+        )
+        # 全點對距離，攤平成一維 (distance(a, b) = _dist[a * size + b])
+        self._dist = tuple(d for source in range(self.size) for d in self._bfs(source))
+        self.positions = tuple(tuple(p) for p in positions) if positions else self._circle_layout()
+
+    def _validate(self, weights, positions):
+        n = self.size
+        if n == 0:
+            raise MapError("地圖至少需要一個地點")
+        if not (isinstance(self.station_id, int) and 0 <= self.station_id < n):
+            raise MapError(f"station 必須是 0-{n - 1} 的地點 ID: {self.station_id!r}")
+        for loc, neighbours in enumerate(self.adjacency):
+            for dest in neighbours:
+                if not (isinstance(dest, int) and 0 <= dest < n) or dest == loc:
+                    raise MapError(f"地點 {loc} 的相鄰地點不合法: {dest!r}")
+        if weights is not None:
+            if len(weights) != n or any(len(w) != len(a) for w, a in zip(weights, self.adjacency)):
+                raise MapError("weights 的形狀必須與 adjacency 相同")
+            if any(not isinstance(x, int) or x < 1 for w in weights for x in w):
+                raise MapError("weights 必須是正整數")
+        if not 0 <= self.stay <= 1:
+            raise MapError(f"stay 必須介於 0 與 1: {self.stay!r}")
+        if self.move_cost not in MOVE_COSTS:
+            raise MapError(f"move_cost 只能是 {'/'.join(MOVE_COSTS)}: {self.move_cost!r}")
+        if positions is not None and len(positions) != n:
+            raise MapError("positions 的數量必須等於地點數")
+
+    def _bfs(self, source):
+        dist = [UNREACHABLE] * self.size
+        dist[source] = 0
+        queue = deque([source])
+        while queue:
+            loc = queue.popleft()
+            for dest in self.adjacency[loc]:
+                if dist[dest] == UNREACHABLE:
+                    dist[dest] = dist[loc] + 1
+                    queue.append(dest)
+        return dist
+
+    def _circle_layout(self):
+        """沒有指定座標時：車站放右側，其餘地點平均排在圓上"""
+        width, height = CANVAS_SIZE
+        others = [loc for loc in range(self.size) if loc != self.station_id]
+        cx, cy, r = width * 0.4, height / 2, min(width * 0.35, height / 2) - 30
+        positions = [None] * self.size
+        positions[self.station_id] = (width - 100, height / 2)
+        for i, loc in enumerate(others):
+            angle = 2 * math.pi * i / len(others)
+            positions[loc] = (round(cx + r * math.cos(angle)), round(cy + r * math.sin(angle)))
+        return tuple(positions)
+
+    def distance(self, a, b):
+        return self._dist[a * self.size + b]
+
+    def move_cost_to(self, a, b):
+        """玩家從 a 移動到 b 的基本 AP (無法抵達時為 None)；劇本規則的加成由 actions 處理"""
+        if self.move_cost == "flat":
+            return 1
+        d = self._dist[a * self.size + b]
+        return None if d == UNREACHABLE else d
+
+    def npc_move(self, loc, blocked_mask, rng):
+        """日出時 NPC 的自動移動：stay 機率不動，否則依分布抽相鄰地點；目的地有路障則不動"""
+        moves = self.moves[loc]
+        if not moves:
+            return loc
+        if rng.random() < self.stay:
+            return loc
+        dest = rng.choice(moves)
+        if blocked_mask >> dest & 1:
+            return loc
+        return dest
+
+    @classmethod
+    def from_config(cls, config):
+        if not isinstance(config, dict) or not isinstance(config.get("adjacency"), list):
+            raise MapError("地圖需要 adjacency 清單")
+        adjacency = config["adjacency"]
+        if not all(isinstance(a, list) for a in adjacency):
+            raise MapError("adjacency 的每一項都必須是清單")
+        return cls(adjacency, config.get("station"), weights=config.get("weights"),
+                   stay=config.get("stay", 0.5), move_cost=config.get("move_cost", "flat"),
+                   positions=config.get("positions"))
+
+    @classmethod
+    def ring(cls, ring_size, **kwargs):
+        """0..ring_size-1 構成環，車站 (ring_size) 不與環相連。相鄰順序 (左, 右) 與舊版 rng.choice([-1, 1]) 相同"""
+        adjacency = [[(loc - 1) % ring_size, (loc + 1) % ring_size] for loc in range(ring_size)] + [[]]
+        return cls(adjacency, ring_size, **kwargs)
+
+
+# 舊版的五個地點 (GUI 座標沿用原本的排列)
+DEFAULT_MAP = MapTopology.ring(4, positions=[(50, 100), (150, 200), (250, 100), (350, 200), (500, 150)])
@@ -1,28 +1,98 @@
 ﻿# ui_components.py
+"""
+pygame 介面元件。畫面採「只重畫變動部分」：
+- TextCache：文字 surface 以 (文字, 字型, 顏色) 為鍵快取 (LRU)，不變的文字不再 font.render
+- 元件 (Button / LogPanel) 有 dirty 旗標，RenderLayer.render() 只重畫 dirty 的元件，
+  並以 pygame.display.update(rects) 只更新這些區域 (取代整個畫面的 flip)
+
+主迴圈範例：
+    layer = RenderLayer(screen, font, background=BG_COLOR)
+    layer.add(*buttons, LogPanel(pygame.Rect(...), logger))
+    while running:
+        ... 處理事件 (check_hover 只在狀態改變時標記 dirty) ...
+        layer.render()
+        clock.tick(60)
+"""
+from collections import OrderedDict, deque
+
 import pygame
 
 # 顏色定義
+BG_COLOR = (30, 30, 40)
 BTN_COLOR = (50, 50, 70)
 BTN_HOVER_COLOR = (70, 70, 90)
+BTN_BORDER_COLOR = (100, 100, 100)
+TEXT_COLOR = (255, 255, 255)
 LOG_BG_COLOR = (20, 20, 20)
+LOG_TEXT_COLOR = (200, 200, 200)
+
+TEXT_CACHE_SIZE = 512
+
+
+class TextCache:
+    """文字 surface 的 LRU 快取"""
+    def __init__(self, max_entries=TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        key = (text, font, color, antialias)
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+# 沒有指定快取的元件共用這一份
+default_cache = TextCache()
+
 
 class Button:
-    def __init__(self, x, y, w, h, text, callback):
+    def __init__(self, x, y, w, h, text, callback, cache=None):
         self.rect = pygame.Rect(x, y, w, h)
-        self.text = text
+        self._text = text
         self.callback = callback
         self.hovered = False
+        self.cache = cache or default_cache
+        self.dirty = True
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        if value != self._text:
+            self._text = value
+            self.dirty = True
 
     def draw(self, screen, font):
         color = BTN_HOVER_COLOR if self.hovered else BTN_COLOR
         pygame.draw.rect(screen, color, self.rect, border_radius=5)
-        pygame.draw.rect(screen, (100,100,100), self.rect, 2, border_radius=5)
-        text_surf = font.render(self.text, True, (255, 255, 255))
+        pygame.draw.rect(screen, BTN_BORDER_COLOR, self.rect, 2, border_radius=5)
+        text_surf = self.cache.render(font, self._text, TEXT_COLOR)
         text_rect = text_surf.get_rect(center=self.rect.center)
         screen.blit(text_surf, text_rect)
+        self.dirty = False
+        return self.rect
 
     def check_hover(self, mouse_pos):
-        self.hovered = self.rect.collidepoint(mouse_pos)
+        hovered = self.rect.collidepoint(mouse_pos)
+        if hovered != self.hovered:
+            self.hovered = hovered
+            self.dirty = True
 
     def check_click(self, mouse_pos):
         if self.rect.collidepoint(mouse_pos):
@@ -31,27 +101,110 @@ class Button:
         return False
 
 class GameLogger:
-    """處理遊戲訊息的儲存與提取"""
-    def __init__(self, max_display_lines=18):
-        self.messages = []       # 暫存顯示用的訊息 (最近的)
-        self.full_history = []   # 完整的歷史紀錄
+    """處理遊戲訊息的儲存與提取 (可直接當作 GameEngine 的 logger_callback)"""
+    def __init__(self, max_display_lines=18, history_limit=None, echo=True):
+        """
+        :param history_limit: 完整歷史最多保留的筆數 (環形緩衝，舊的自動丟棄)；預設 None = 全部保留
+        :param echo: 是否同步 print 到終端機 (預設保留，方便除錯)
+        """
+        self.messages = deque(maxlen=max_display_lines)   # 暫存顯示用的訊息 (最新的在前)
+        self.full_history = deque(maxlen=history_limit)   # 歷史紀錄
         self.max_display = max_display_lines
+        self.echo = echo
+        self.total = 0  # 累計收到的訊息數 (LogPanel 用來判斷有幾條新訊息)
 
     def log(self, text):
         """接收新訊息"""
-        # 為了除錯方便，我們依然保留 print 到終端機的功能
-        print(text) 
-        
-        self.messages.insert(0, text)
-        if len(self.messages) > self.max_display:
-            self.messages.pop()
-        
+        if self.echo:
+            print(text)
+        self.messages.appendleft(text)
         self.full_history.append(text)
+        self.total += 1
 
     def get_recent(self):
-        """取得最近的 N 條訊息"""
-        return self.messages
+        """取得最近的 N 條訊息 (最新的在前)"""
+        return list(self.messages)
 
     def get_full_history(self):
         """取得完整歷史"""
-        return self.full_history
\ No newline at end of file
+        return list(self.full_history)
+
+
+class LogPanel:
+    """
+    顯示 GameLogger 最近訊息的面板 (最新的在最上面)。
+    內容保存在自己的 surface 上：有新訊息時把舊內容往下捲，只 render 新的幾行。
+    """
+    opaque = True  # 整個區域都會被蓋掉，RenderLayer 不必先填背景
+
+    def __init__(self, rect, logger, line_height=20, padding=5, cache=None):
+        self.rect = pygame.Rect(rect)
+        self.logger = logger
+        self.line_height = line_height
+        self.padding = padding
+        self.cache = cache or default_cache
+        self.surface = pygame.Surface(self.rect.size)
+        self.surface.fill(LOG_BG_COLOR)
+        self.shown = 0  # 已畫出的訊息數 (對應 logger.total)
+        # 面板放得下的行數 (不超過 logger 保留的顯示訊息數)
+        self.max_lines = max(min((self.rect.height - padding) // line_height, logger.max_display), 1)
+
+    @property
+    def dirty(self):
+        return self.logger.total != self.shown
+
+    def draw(self, screen, font):
+        new = min(self.logger.total - self.shown, self.max_lines)
+        if new:
+            recent = self.logger.get_recent()[:new]
+            offset = new * self.line_height
+            # 舊內容整塊往下移，空出最上面的新行
+            self.surface.scroll(0, offset)
+            self.surface.fill(LOG_BG_COLOR, (0, 0, self.rect.width, offset + self.padding))
+            bottom = self.padding + self.max_lines * self.line_height  # 被擠出面板的舊行
+            self.surface.fill(LOG_BG_COLOR, (0, bottom, self.rect.width, self.rect.height - bottom))
+            for i, text in enumerate(recent):
+                surf = self.cache.render(font, text, LOG_TEXT_COLOR)
+                self.surface.blit(surf, (self.padding, self.padding + i * self.line_height))
+            self.shown = self.logger.total
+        screen.blit(self.surface, self.rect)
+        return self.rect
+
+
+class RenderLayer:
+    """管理元件的重畫：只畫 dirty 的元件並只更新它們的區域"""
+    def __init__(self, screen, font, background=BG_COLOR):
+        self.screen = screen
+        self.font = font
+        self.background = background
+        self.widgets = []
+        self._full = True  # 第一次 (或 invalidate 後) 整個畫面重畫
+
+    def add(self, *widgets):
+        self.widgets.extend(widgets)
+        self._full = True
+
+    def invalidate(self):
+        """視窗被遮蓋/縮放後呼叫：下次 render 整個重畫"""
+        self._full = True
+
+    def render(self):
+        """返回本次更新的區域 (沒有變動時為空，不呼叫 display.update)"""
+        screen, font = self.screen, self.font
+        if self._full:
+            screen.fill(self.background)
+            for w in self.widgets:
+                w.draw(screen, font)
+            self._full = False
+            pygame.display.flip()
+            return [screen.get_rect()]
+
+        rects = []
+        for w in self.widgets:
+            if w.dirty:
+                if not getattr(w, "opaque", False):
+                    screen.fill(self.background, w.rect)
+                rects.append(w.draw(screen, font))
+        if rects:
+            pygame.display.update(rects)
+        return rects
\ No newline at end of file
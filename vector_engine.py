@@ -0,0 +1,348 @@
+# vector_engine.py
+"""
+NumPy 版本的遊戲引擎：以「結構陣列」(struct-of-arrays) 保存 N 局遊戲的狀態，
+每個階段對整批遊戲做陣列運算，用於大規模平衡模擬。
+
+規則與 main.GameEngine 一致 (玩家不行動，等同 simulator 的 idle 策略)：
+日出能力 -> NPC 移動 -> (玩家回合) -> 黃昏能力 -> 夜晚能力 -> 勝敗判定。
+需要 numpy。
+"""
+import numpy as np
+
+from settings import MAX_DAYS
+from scenario_gen import ScenarioBuilder
+from catalog import get_catalog
+from models import RosterArrays
+from seeding import derive_seed, spawn_rng
+from rules import SACRIFICE_GRAVES
+from topology import DEFAULT_MAP
+GENERAL_ROLE = "一般人"
+
+PHASES = {"sunrise": 1, "dusk": 2, "night": 3}
+TARGETS = {"random_other_in_loc": 1, "all_others_in_loc": 2, "vampire_logic": 3, "role_location": 4}
+EFFECTS = {"kill": 1, "add_intrigue": 2, "sanity_damage": 3, "teleport": 4}
+
+# 結局代碼
+RUNNING, WIN, LOSE = 0, 1, 2
+
+
+class RoleTable:
+    """角色名稱 <-> 整數 ID，並把 Role_Data 編成以 ID 為索引的陣列"""
+    def __init__(self, scripts_db):
+        role_data = scripts_db.get("Role_Data", {})
+        names = [GENERAL_ROLE]
+        for kind in ("Main", "Sub", "Foreshadow"):
+            for part in scripts_db.get(kind, []):
+                for role_info in part.get('roles', []):
+                    if role_info['name'] not in names:
+                        names.append(role_info['name'])
+        for name in role_data:
+            if name not in names:
+                names.append(name)
+            target_role = role_data[name].get("target_role")
+            if target_role and target_role not in names:
+                names.append(target_role)
+
+        self.names = names
+        self.ids = {name: i for i, name in enumerate(names)}
+
+        n = len(names)
+        self.trigger = np.zeros(n, dtype=np.int8)
+        self.target = np.zeros(n, dtype=np.int8)
+        self.effect = np.zeros(n, dtype=np.int8)
+        self.value = np.zeros(n, dtype=np.int8)
+        self.target_role = np.full(n, -1, dtype=np.int16)
+        for name, config in role_data.items():
+            rid = self.ids[name]
+            self.trigger[rid] = PHASES.get(config["trigger"], 0)
+            self.target[rid] = TARGETS.get(config["target"], 0)
+            self.effect[rid] = EFFECTS.get(config["effect"], 0)
+            self.value[rid] = config.get("value", 0)
+            if config.get("target_role"):
+                self.target_role[rid] = self.ids[config["target_role"]]
+
+    def roles_for_phase(self, phase):
+        """該階段有能力的角色 ID"""
+        return [int(rid) for rid in np.flatnonzero(self.trigger == PHASES[phase])]
+
+
+class VectorGameState:
+    """N 局遊戲 x C 名角色的狀態陣列 (第 0 欄為玩家)"""
+    def __init__(self, n_games, n_chars, role_table, seed=None):
+        self.n_games = n_games
+        self.n_chars = n_chars
+        self.roles = role_table
+        self.rng = np.random.default_rng(seed)
+
+        shape = (n_games, n_chars)
+        self.location = np.zeros(shape, dtype=np.int16)
+        self.sanity = np.full(shape, 3, dtype=np.int8)
+        self.intrigue = np.zeros(shape, dtype=np.int8)
+        self.is_dead = np.zeros(shape, dtype=bool)
+        self.is_real = np.ones(shape, dtype=bool)   # False = 角色不足的局用來補位的欄位
+        self.role_id = np.zeros(shape, dtype=np.int16)
+
+        # 每局的劇本資訊
+        self.set_maps([DEFAULT_MAP] * n_games)
+        self.stormy = np.zeros(n_games, dtype=bool)            # 副線: stormy_seas
+        self.human_sacrifice = np.zeros(n_games, dtype=bool)   # 主線: human_sacrifice
+        self.part_ids = [None] * n_games                       # (Main, Sub, Foreshadow) id
+
+        self.day = 1
+        self.max_days = MAX_DAYS
+        self.result = np.full(n_games, RUNNING, dtype=np.int8)
+
+    @classmethod
+    def from_builder(cls, n_games, seed=None, catalog=None):
+        """
+        以 ScenarioBuilder 產生 N 局的初始劇本，再套用初始規則。
+        第 g 局的劇本使用與 simulator 相同的子種子，因此兩個引擎模擬的是同一批劇本。
+        """
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        catalog = catalog or get_catalog()
+        roles = RoleTable(catalog.data)
+        builder = ScenarioBuilder(catalog=catalog)
+        scenarios = [builder.build(rng=spawn_rng(seed, g)) for g in range(n_games)]
+        n_chars = max(len(chars) for chars, _ in scenarios)
+
+        state = cls(n_games, n_chars, roles, derive_seed(seed, "vector"))
+        state.set_maps([catalog.map_for(parts[0]['id']) for _, parts in scenarios])
+        for g, (chars, parts) in enumerate(scenarios):
+            columns = RosterArrays(chars)
+            state.location[g, :len(chars)] = columns.location
+            state.sanity[g, :len(chars)] = columns.sanity
+            for j, c in enumerate(chars):
+                state.role_id[g, j] = roles.ids.get(c.role, 0)
+            # 角色不足的局以死人補位，不參與任何判定 (也不算墓碑)
+            state.is_dead[g, len(chars):] = True
+            state.is_real[g, len(chars):] = False
+            state.stormy[g] = parts[1].get('rule_tag') == "stormy_seas"
+            state.human_sacrifice[g] = parts[0].get('rule_tag') == "human_sacrifice"
+            state.part_ids[g] = tuple(part['id'] for part in parts)
+
+        state._apply_initial_rules()
+        return state
+
+    def set_maps(self, maps):
+        """
+        依每局的地圖 (topology.MapTopology) 建立移動查詢表：同一張地圖只存一份，
+        moves[m, 地點, k] 為第 m 張地圖該地點的第 k 個移動目的地 (補齊到最多的目的地數)。
+        """
+        unique = list({id(m): m for m in maps}.values())
+        index = {id(m): i for i, m in enumerate(unique)}
+        n_locs = max(m.size for m in unique)
+        width = max(1, max(len(moves) for m in unique for moves in m.moves))
+        self.map_index = np.array([index[id(m)] for m in maps], dtype=np.intp)
+        self.move_count = np.zeros((len(unique), n_locs), dtype=np.intp)
+        self.moves = np.zeros((len(unique), n_locs, width), dtype=np.int16)
+        for i, m in enumerate(unique):
+            for loc, moves in enumerate(m.moves):
+                self.move_count[i, loc] = len(moves)
+                self.moves[i, loc, :len(moves)] = moves
+        self.stay = np.array([m.stay for m in unique])[self.map_index]
+        self.station = np.array([m.station_id for m in unique])[self.map_index]
+        self.blocked = np.zeros((len(maps), n_locs), dtype=bool)
+
+    def _apply_initial_rules(self):
+        """對應 GameEngine._apply_initial_rules：仿生人精神 5，隨機一人獲得陰謀"""
+        android = self.roles.ids.get("仿生人")
+        if android is not None:
+            self.sanity[self.role_id == android] = 5
+        # 從活著的欄位中 (= 該局實際角色) 均勻抽一人
+        keys = self.rng.random(self.location.shape)
+        keys[self.is_dead] = -1.0
+        pick = keys.argmax(axis=1)
+        self.intrigue[np.arange(self.n_games), pick] = 1
+
+    # --- 向量化機制 (對應 mechanics.py) ---
+
+    def _live(self):
+        """仍在進行中的局裡的活人"""
+        return ~self.is_dead & (self.result == RUNNING)[:, None]
+
+    def check_sanity_status(self, mask):
+        """精神值 <= 0 的活人：精神歸 0 並獲得陰謀"""
+        broke = mask & (self.sanity <= 0) & ~self.is_dead
+        self.sanity[broke] = 0
+        self.intrigue[broke] = 1
+        return broke
+
+    def apply_sanity_damage(self, mask, value):
+        """對 mask 內的活人造成精神傷害 (value 可為純量或與 mask 同形的陣列)"""
+        mask = mask & ~self.is_dead
+        self.sanity -= np.where(mask, value, 0).astype(np.int8)
+        return self.check_sanity_status(mask)
+
+    def kill(self, mask):
+        """殺死 mask 內的活人，返回這次新死亡的人"""
+        newly_dead = mask & ~self.is_dead
+        self.is_dead |= newly_dead
+        return newly_dead
+
+    def process_arrival(self, arrived):
+        """車站平靜：抵達車站、有陰謀且精神 > 2 的人有 10% 機率解除陰謀"""
+        calm = (arrived & (self.location == self.station[:, None]) & (self.intrigue > 0) & (self.sanity > 2)
+                & (self.rng.random(arrived.shape) < 0.1))
+        self.intrigue[calm] = 0
+        return calm
+
+    def sunrise_move(self):
+        """
+        NPC 移動 (對應 MapTopology.npc_move)：沒有移動目的地的地點 (車站) 不動、stay 機率原地，
+        否則依地圖的移動分布抽一個目的地，目的地有路障則不動
+        """
+        maps = self.map_index[:, None]
+        count = self.move_count[maps, self.location]
+        movable = self._live() & (count > 0)
+        movable[:, 0] = False  # 玩家不自動移動
+        if self.stormy.any():
+            frozen = self.stormy & (self.rng.random(self.n_games) < 0.5)
+            movable &= ~frozen[:, None]
+
+        shape = self.location.shape
+        go = movable & (self.rng.random(shape) >= self.stay[:, None])
+        k = np.minimum((self.rng.random(shape) * count).astype(np.intp), np.maximum(count - 1, 0))
+        new_loc = self.moves[maps, self.location, k]
+        go &= ~np.take_along_axis(self.blocked, new_loc.astype(np.intp), axis=1)
+
+        self.location = np.where(go, new_loc, self.location)
+        self.process_arrival(go)
+        return go
+
+    # --- 向量化能力 (對應 abilities.AbilityEngine) ---
+
+    def _pick_one(self, candidates):
+        """每列從 candidates 中均勻抽一個，返回 one-hot 遮罩"""
+        keys = self.rng.random(candidates.shape)
+        keys[~candidates] = -1.0
+        pick = np.zeros_like(candidates)
+        rows = np.flatnonzero(candidates.any(axis=1))
+        pick[rows, keys[rows].argmax(axis=1)] = True
+        return pick
+
+    def _targets(self, j, acting, rid):
+        alive = ~self.is_dead
+        same_loc = alive & (self.location == self.location[:, j:j + 1])
+        others = same_loc.copy()
+        others[:, j] = False
+
+        logic = self.roles.target[rid]
+        if logic == TARGETS["random_other_in_loc"]:
+            targets = self._pick_one(others & acting[:, None])
+        elif logic == TARGETS["all_others_in_loc"]:
+            targets = others
+        elif logic == TARGETS["vampire_logic"]:
+            targets = others & (same_loc.sum(axis=1) == 2)[:, None]
+        elif logic == TARGETS["role_location"]:
+            holders = alive & (self.role_id == self.roles.target_role[rid])
+            first = np.zeros_like(holders)
+            rows = np.flatnonzero(holders.any(axis=1))
+            first[rows, holders[rows].argmax(axis=1)] = True
+            targets = first
+        else:
+            return np.zeros_like(others)
+        return targets & acting[:, None]
+
+    def _apply_effect(self, j, targets, rid):
+        effect = self.roles.effect[rid]
+        if effect == EFFECTS["kill"]:
+            self.kill(targets)
+        elif effect == EFFECTS["add_intrigue"]:
+            self.intrigue[targets & (self.intrigue == 0)] = 1
+        elif effect == EFFECTS["sanity_damage"]:
+            self.apply_sanity_damage(targets, self.roles.value[rid])
+        elif effect == EFFECTS["teleport"]:
+            rows = np.flatnonzero(targets.any(axis=1))
+            self.location[rows, j] = self.location[rows, targets[rows].argmax(axis=1)]
+
+    def run_abilities(self, phase):
+        """依角色順序 (與純量引擎相同) 發動能力；每一步都對整批遊戲向量化"""
+        phase_roles = self.roles.roles_for_phase(phase)
+        if not phase_roles:
+            return
+        for j in range(self.n_chars):
+            live_j = self._live()[:, j]
+            for rid in phase_roles:
+                acting = live_j & (self.role_id[:, j] == rid)
+                if acting.any():
+                    self._apply_effect(j, self._targets(j, acting, rid), rid)
+
+    # --- 階段 (對應 GameEngine.phase_*) ---
+
+    def phase_sunrise(self):
+        self.blocked[:] = False
+        self.run_abilities('sunrise')
+
+    def phase_morning(self):
+        self.sunrise_move()
+
+    def phase_dusk(self):
+        self.run_abilities('dusk')
+
+    def phase_night(self):
+        self.run_abilities('night')
+        self._check_game_over()
+
+    def _check_game_over(self):
+        running = self.result == RUNNING
+        living = (~self.is_dead).sum(axis=1)
+        graves = (self.is_dead & self.is_real).sum(axis=1)
+        lose = running & ((living <= 1) | (self.human_sacrifice & (graves >= SACRIFICE_GRAVES)))
+        self.result[lose] = LOSE
+        if self.day >= self.max_days:
+            self.result[self.result == RUNNING] = WIN
+        else:
+            self.day += 1
+
+    def run(self):
+        """一路跑到所有局結束 (流程同 ActionManager.end_turn)"""
+        while (self.result == RUNNING).any():
+            self.phase_dusk()
+            self.phase_night()
+            if (self.result == RUNNING).any():
+                self.phase_sunrise()
+                self.phase_morning()
+        return self.result
+
+    def wins(self):
+        """勝利 = 撐到期限且玩家本人存活 (與 simulator.summarize_game 一致)"""
+        return (self.result == WIN) & ~self.is_dead[:, 0]
+
+
+def compare_with_scalar(n_games, seed=0):
+    """同樣的種子下比較向量引擎與純量引擎 (idle 策略) 的勝率與存活率"""
+    from simulator import run_simulation
+
+    state = VectorGameState.from_builder(n_games, seed)
+    state.run()
+    vec_win = float(state.wins().mean())
+    vec_alive = float((~state.is_dead[:, 0]).mean())
+
+    scalar = run_simulation(n_games, "idle", processes=1, seed=seed)
+    sc_win = scalar.win_rate()
+    sc_alive = scalar.player_alive / scalar.total_games
+
+    # 兩比例 z 檢定
+    pooled = (vec_win + sc_win) / 2
+    se = np.sqrt(max(pooled * (1 - pooled), 1e-12) * 2 / n_games)
+    z = float((vec_win - sc_win) / se)
+    return {"vector_win": vec_win, "scalar_win": sc_win,
+            "vector_alive": vec_alive, "scalar_alive": sc_alive, "z": z}
+
+
+if __name__ == "__main__":
+    import time
+
+    n = 20000
+    start = time.perf_counter()
+    state = VectorGameState.from_builder(n, seed=1)
+    built = time.perf_counter()
+    state.run()
+    done = time.perf_counter()
+    print(f"🧮 {n} 局：建構 {built - start:.2f}s，模擬 {done - built:.3f}s "
+          f"({n / (done - built):.0f} 局/秒)，勝率 {state.wins().mean():.2%}")
+
+    stats = compare_with_scalar(5000, seed=1)
+    print(f"📐 向量 vs 純量：勝率 {stats['vector_win']:.2%} / {stats['scalar_win']:.2%}，"
+          f"存活率 {stats['vector_alive']:.2%} / {stats['scalar_alive']:.2%}，z = {stats['z']:.2f}")
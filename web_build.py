@@ -0,0 +1,347 @@
+# web_build.py
+"""
+PyScript 網頁版的建置與量測。
+
+建置 (python web_build.py build [--out web_dist])：
+- 從 ENTRY_MODULES 找出實際會 import 到的模組，去掉 docstring / 註解後打包成單一的 loop_bundle.py。
+  bundle 在 sys.meta_path 註冊匯入器，模組第一次被 import 時才編譯執行 (用不到的不花時間)
+- scripts.json 輸出為去掉空白的精簡版
+- index.html 原樣複製 (頁面會先嘗試 import loop_bundle)，pyscript.json 只列出這兩個檔案
+bytecode (.pyc) 與 Pyodide 的 Python 版本綁定，因此 bundle 保存的是精簡後的原始碼。
+
+量測 (python web_build.py measure)：在無瀏覽器的環境比較開發版 (pyscript.json 的檔案) 與建置版
+- 下載量：原始 / gzip 後的總大小
+- 啟動時間：全新的 Python 行程 (不使用 .pyc 快取) 載入介面層、以及建立第一局引擎所需的時間
+- DOM 寫入與強制重排次數：以假 DOM 跑完一局，比較「每則日誌一個節點並捲到底」與 WebUI 批次寫入
+"""
+import argparse
+import ast
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ENTRY_MODULES = ("main", "actions", "web_ui")
+BUNDLE_NAME = "loop_bundle"
+CATALOG_FILE = "scripts.json"
+DEFAULT_OUT = os.path.join(BASE_DIR, "web_dist")
+
+BUNDLE_TEMPLATE = '''# {name}.py (由 web_build.py 產生，請勿手動修改)
+import os as _os
+import sys as _sys
+from importlib.machinery import ModuleSpec as _ModuleSpec
+
+_DIR = _os.path.dirname(_os.path.abspath(__file__))
+_SOURCES = {sources}
+
+
+class _BundleImporter:
+    # 同時是 meta path finder 與 loader (不繼承 importlib.abc，少載入一批模組)
+    def find_spec(self, name, path=None, target=None):
+        if name in _SOURCES:
+            return _ModuleSpec(name, self, origin=_os.path.join(_DIR, name + ".py"))
+        return None
+
+    def create_module(self, spec):
+        return None
+
+    def exec_module(self, module):
+        module.__file__ = module.__spec__.origin
+        exec(compile(_SOURCES[module.__name__], module.__file__, "exec"), module.__dict__)
+
+
+_sys.meta_path.insert(0, _BundleImporter())
+'''
+
+
+# --- 打包 ---
+
+def _local_imports(tree):
+    """原始碼中 import 到的本專案模組 (包含函式內的延遲 import)"""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            names.add(node.module.split(".")[0])
+    return {name for name in names if os.path.exists(os.path.join(BASE_DIR, name + ".py"))}
+
+
+def _read(name):
+    with open(os.path.join(BASE_DIR, name + ".py"), encoding="utf-8-sig") as f:
+        return f.read()
+
+
+def module_closure(entries=ENTRY_MODULES):
+    """從入口模組出發、實際會用到的本專案模組 (依名稱排序)"""
+    found, todo = set(), list(entries)
+    while todo:
+        name = todo.pop()
+        if name in found:
+            continue
+        found.add(name)
+        todo.extend(_local_imports(ast.parse(_read(name))) - found)
+    return sorted(found)
+
+
+def _strip_docstrings(tree):
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                body.pop(0)
+                if not body:
+                    body.append(ast.Pass())
+    return tree
+
+
+def minify(source):
+    """去掉 docstring 與註解 (ast.unparse 本身不保留註解)"""
+    return ast.unparse(_strip_docstrings(ast.parse(source)))
+
+
+def bundle_source(modules):
+    sources = {name: minify(_read(name)) for name in modules}
+    return BUNDLE_TEMPLATE.format(name=BUNDLE_NAME, sources=repr(sources))
+
+
+def minified_catalog():
+    with open(os.path.join(BASE_DIR, CATALOG_FILE), encoding="utf-8-sig") as f:
+        data = json.load(f)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def check_dev_files(modules):
+    """開發版 (pyscript.json) 必須列出所有會用到的模組，否則網頁上 import 會失敗"""
+    listed = {os.path.splitext(path)[0] for path in dev_files()}
+    missing = sorted(set(modules) - listed)
+    if missing:
+        raise SystemExit(f"❌ pyscript.json 缺少模組: {', '.join(name + '.py' for name in missing)}")
+
+
+def build(out_dir=DEFAULT_OUT):
+    """輸出建置版到 out_dir，返回輸出的檔案清單"""
+    modules = module_closure()
+    check_dev_files(modules)
+    os.makedirs(out_dir, exist_ok=True)
+    files = {
+        BUNDLE_NAME + ".py": bundle_source(modules),
+        CATALOG_FILE: minified_catalog(),
+        "pyscript.json": json.dumps({"name": "Underground Train Web", "description": "A multi-scenario strategy game.",
+                                     "files": [f"./{BUNDLE_NAME}.py", f"./{CATALOG_FILE}"]},
+                                    ensure_ascii=False, indent=4),
+    }
+    for filename, text in files.items():
+        with open(os.path.join(out_dir, filename), "w", encoding="utf-8", newline="\n") as f:
+            f.write(text)
+    shutil.copyfile(os.path.join(BASE_DIR, "index.html"), os.path.join(out_dir, "index.html"))
+    print(f"📦 已打包 {len(modules)} 個模組到 {out_dir}: {', '.join(modules)}")
+    return sorted(files) + ["index.html"]
+
+
+# --- 量測 ---
+
+def dev_files():
+    """開發版會下載的檔案 (pyscript.json 中的清單)"""
+    with open(os.path.join(BASE_DIR, "pyscript.json"), encoding="utf-8") as f:
+        return [os.path.normpath(path) for path in json.load(f)["files"]]
+
+
+def _sizes(directory, files):
+    raw = gz = 0
+    for name in files:
+        with open(os.path.join(directory, name), "rb") as f:
+            data = f.read()
+        raw += len(data)
+        gz += len(gzip.compress(data, 9))
+    return raw, gz
+
+
+STARTUP_SNIPPET = '''
+import sys, time, json
+sys.path.insert(0, {directory!r})
+start = time.perf_counter()
+if {bundled!r}:
+    import {bundle}
+import web_ui
+ui_ready = time.perf_counter()
+from main import GameEngine
+from actions import ActionManager
+engine = GameEngine(seed=1, silent=True)
+ActionManager(engine)
+done = time.perf_counter()
+print(json.dumps([ui_ready - start, done - start]))
+'''
+
+
+def _startup(directory, bundled, repeat):
+    """全新行程、不讀寫 .pyc：返回 (介面層就緒, 引擎就緒) 的中位數秒數"""
+    code = STARTUP_SNIPPET.format(directory=directory, bundled=bundled, bundle=BUNDLE_NAME)
+    samples = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-I", "-B", "-c", code], cwd=directory,
+                             capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out))
+    samples.sort(key=lambda s: s[1])
+    return samples[len(samples) // 2]
+
+
+class FakeElement:
+    """
+    只記錄次數的假 DOM 節點：寫入屬性算一次寫入；
+    寫入之後讀取 layout 屬性 (scrollTop / clientHeight / scrollHeight) 算一次強制重排。
+    """
+    def __init__(self, document):
+        self.document = document
+        self.style = FakeStyle(document)
+        self.children = []
+        self._scroll_top = 0
+
+    def __setattr__(self, name, value):
+        if name in ("textContent", "innerHTML", "className"):
+            self.document.write()
+        object.__setattr__(self, name, value)
+
+    @property
+    def clientHeight(self):
+        self.document.read_layout()
+        return 200
+
+    @property
+    def scrollHeight(self):
+        self.document.read_layout()
+        return len(self.children) * 18
+
+    @property
+    def scrollTop(self):
+        self.document.read_layout()
+        return self._scroll_top
+
+    @scrollTop.setter
+    def scrollTop(self, value):
+        self.document.write()
+        self._scroll_top = value
+
+    def appendChild(self, child):
+        self.document.write()
+        self.children.append(child)
+
+
+class FakeStyle:
+    def __init__(self, document):
+        object.__setattr__(self, "document", document)
+
+    def __setattr__(self, name, value):
+        self.document.write()
+        object.__setattr__(self, name, value)
+
+
+class FakeDocument:
+    def __init__(self):
+        self.writes = 0
+        self.reflows = 0
+        self.elements = {}
+        self._stale = False
+
+    def write(self):
+        self.writes += 1
+        self._stale = True
+
+    def read_layout(self):
+        if self._stale:
+            self.reflows += 1
+            self._stale = False
+
+    def createElement(self, tag):
+        return FakeElement(self)
+
+    def getElementById(self, element_id):
+        return self.elements.setdefault(element_id, FakeElement(self))
+
+
+def dom_writes(seed=1):
+    """以假 DOM 跑完一局，返回 (日誌則數, 舊寫法的假 DOM, WebUI 的假 DOM, WebUI 幀數)"""
+    from main import GameEngine
+    from actions import ActionManager
+    from web_ui import WebUI
+
+    # 舊寫法：每則訊息建立一個節點並捲到底 (createElement + innerHTML + appendChild + scrollTop)
+    naive = FakeDocument()
+    log_div = naive.getElementById("log")
+
+    def naive_log(msg):
+        node = naive.createElement("div")
+        node.innerHTML = str(msg)
+        log_div.appendChild(node)
+        log_div.scrollTop = log_div.scrollHeight
+
+    doc = FakeDocument()
+    ui = WebUI(doc)
+    doc.writes = doc.reflows = 0  # 不計入一次性的節點建立
+    messages = []
+
+    def both(msg):
+        messages.append(msg)
+        naive_log(msg)
+        ui.log(msg)
+
+    engine = GameEngine(logger_callback=both, seed=seed)
+    # 舊寫法的地點格寫死在 HTML 中，建立地點格的寫入不計入
+    writes = doc.writes
+    ui.build_map(engine)
+    doc.writes = writes
+    actions = ActionManager(engine)
+    player = engine.characters[0]
+    # 每個按鈕事件處理完後瀏覽器才會畫下一幀，因此每個動作之後 flush 一次
+    while not engine.is_game_over:
+        for msg in (actions.rest()[1], actions.end_turn()[1]):
+            both(msg)
+            ui.show_state(engine, player)
+            ui.flush()
+    return len(messages), naive, doc, ui.frames
+
+
+def measure(repeat=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        dev_dir = os.path.join(tmp, "dev")
+        dist_dir = os.path.join(tmp, "dist")
+        os.makedirs(dev_dir)
+        files = dev_files()
+        for name in files:
+            shutil.copyfile(os.path.join(BASE_DIR, name), os.path.join(dev_dir, name))
+        dist_files = [f for f in build(dist_dir) if f not in ("index.html", "pyscript.json")]
+
+        dev_size, dist_size = _sizes(dev_dir, files), _sizes(dist_dir, dist_files)
+        dev_time, dist_time = _startup(dev_dir, False, repeat), _startup(dist_dir, True, repeat)
+
+    print(f"\n{'':<10} {'檔案數':>6} {'大小':>10} {'gzip':>10} {'介面就緒':>10} {'引擎就緒':>10}")
+    for label, count, (raw, gz), (ui_ready, done) in (("開發版", len(files), dev_size, dev_time),
+                                                     ("建置版", len(dist_files), dist_size, dist_time)):
+        print(f"{label:<10} {count:>6} {raw / 1024:>8.1f}KB {gz / 1024:>8.1f}KB "
+              f"{ui_ready * 1e3:>8.1f}ms {done * 1e3:>8.1f}ms")
+
+    n_messages, naive, batched, frames = dom_writes()
+    print(f"\n🧪 一局 {n_messages} 則日誌 ({frames} 幀)")
+    print(f"  舊寫法：DOM 寫入 {naive.writes} 次，強制重排 {naive.reflows} 次")
+    print(f"  WebUI ：DOM 寫入 {batched.writes} 次，強制重排 {batched.reflows} 次")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PyScript 網頁版建置與量測")
+    parser.add_argument("command", choices=("build", "measure"))
+    parser.add_argument("--out", default=DEFAULT_OUT, help="建置輸出目錄")
+    parser.add_argument("--repeat", type=int, default=5, help="量測啟動時間的次數")
+    args = parser.parse_args(argv)
+    if args.command == "build":
+        build(args.out)
+    else:
+        measure(args.repeat)
+
+
+if __name__ == "__main__":
+    main()
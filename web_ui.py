@@ -0,0 +1,174 @@
+# web_ui.py
+"""
+PyScript 網頁版的 DOM 更新層：
+- 日誌與狀態的變動先記在 Python 端，同一個 animation frame 內只寫一次 DOM (flush)
+- VirtualLog：虛擬化的日誌檢視，不論累積多少行，只有看得到的那幾行有 DOM 節點
+不直接 import js：document 與排程函式由頁面傳入，因此也能在一般 Python 中以假 DOM 測試 (見 web_build.py)。
+
+頁面中的用法：
+    ui = WebUI(js.document)
+    flush = create_proxy(lambda timestamp: ui.flush())
+    ui.schedule = lambda: js.requestAnimationFrame(flush)
+    engine = GameEngine(logger_callback=ui.log)
+    for loc, button in enumerate(ui.build_map(engine, names)):
+        button.addEventListener("click", create_proxy(lambda event, loc=loc: move_to(loc)))
+"""
+
+ROW_HEIGHT = 18      # 日誌每行高度 (px)，需與 CSS 的 .log-row 一致
+LOG_LIMIT = 5000     # 日誌超過此行數時一次丟掉較舊的一半
+OVERSCAN = 2         # 可見範圍外多畫的行數 (捲動時不會閃白)
+
+
+class VirtualLog:
+    """
+    固定行高的虛擬捲動：容器內放一個撐出總高度的 spacer，
+    以及一組重複使用的行節點 (數量 = 可見行數 + OVERSCAN)。第 i 行固定由第 i % n 個節點顯示，
+    因此捲動 k 行只需改 k 個節點的位置與文字。
+    使用者停在最底部時，新訊息會自動捲到底；往上捲時不打擾。
+    """
+    def __init__(self, document, container, row_height=ROW_HEIGHT, limit=LOG_LIMIT):
+        self.document = document
+        self.container = container
+        self.row_height = row_height
+        self.limit = limit
+        self.lines = []
+        self.stick_to_bottom = True
+        self.spacer = document.createElement("div")
+        self.spacer.className = "log-spacer"
+        self.spacer.style.position = "relative"
+        container.appendChild(self.spacer)
+        visible = max(int(container.clientHeight) // row_height, 1)
+        self.rows = []
+        self.row_index = []  # 每個節點目前顯示的行號
+        for _ in range(visible + OVERSCAN):
+            row = document.createElement("div")
+            row.className = "log-row"
+            row.style.position = "absolute"
+            row.style.height = f"{row_height}px"
+            self.spacer.appendChild(row)
+            self.rows.append(row)
+            self.row_index.append(None)
+        self._height = None
+
+    def append(self, message):
+        """只記錄，不碰 DOM；多行訊息拆成多列，空行略過"""
+        for line in str(message).split("\n"):
+            if line:
+                self.lines.append(line)
+        if len(self.lines) > self.limit:
+            # 整批丟掉，所有行號都變了：下次 render 全部重畫 (平均每行的成本很低)
+            del self.lines[:len(self.lines) - self.limit // 2]
+            self.row_index = [None] * len(self.rows)
+
+    def on_scroll(self):
+        """容器的 scroll 事件：記下使用者是否停在最底部 (只讀 layout，不寫)"""
+        c = self.container
+        self.stick_to_bottom = c.scrollTop + c.clientHeight >= c.scrollHeight - self.row_height
+
+    def render(self):
+        """把目前的捲動位置對應到行節點；先讀完 layout 再一次寫入，避免來回觸發重排"""
+        c = self.container
+        total = len(self.lines)
+        height = total * self.row_height
+        view, current = int(c.clientHeight), int(c.scrollTop)
+        scroll_top = max(height - view, 0) if self.stick_to_bottom else current
+
+        if height != self._height:
+            self.spacer.style.height = f"{height}px"
+            self._height = height
+        if scroll_top != current:
+            c.scrollTop = scroll_top
+
+        n = len(self.rows)
+        first = max(min(scroll_top // self.row_height, total - n), 0)
+        for index in range(first, min(first + n, total)):
+            slot = index % n
+            if self.row_index[slot] != index:
+                row = self.rows[slot]
+                row.textContent = self.lines[index]
+                row.style.top = f"{index * self.row_height}px"
+                self.row_index[slot] = index
+
+
+class WebUI:
+    """
+    收集日誌與狀態的變動，排程到下一個 animation frame 一次寫入 DOM。
+    :param schedule: 無參數函式，安排下一幀呼叫 self.flush() (頁面中為 requestAnimationFrame)
+    """
+    def __init__(self, document, schedule=None):
+        self.document = document
+        self.schedule = schedule
+        self.status = document.getElementById("status-bar")
+        self.locations = []       # 地點格 (build_map 依本局地圖建立)
+        self.view = VirtualLog(document, document.getElementById("log"))
+        self._pending = False
+        self._state = None        # 下一幀要顯示的狀態
+        self._shown_status = None
+        self._shown_loc = None
+        self.frames = 0           # 實際寫入 DOM 的次數 (量測用)
+
+    def build_map(self, engine, names=None):
+        """
+        依本局地圖建立地點格 (#map) 與移動按鈕 (#move-buttons)，地點數由劇本的地圖決定。
+        返回按鈕清單，點擊事件由頁面掛上 (需要 create_proxy)。
+        """
+        size = engine.map.size
+        names = list(names or [])
+        names += [f"Loc {i}" for i in range(len(names), size)]
+        map_div = self.document.getElementById("map")
+        button_div = self.document.getElementById("move-buttons")
+        map_div.innerHTML = ""
+        button_div.innerHTML = ""
+        self.locations, buttons = [], []
+        for i in range(size):
+            div = self.document.createElement("div")
+            div.className = "loc"
+            div.textContent = f"{names[i]} ({i})"
+            if i == engine.map.station_id:
+                div.style.borderColor = "#007bff"
+            map_div.appendChild(div)
+            self.locations.append(div)
+            button = self.document.createElement("button")
+            button.textContent = f"前往 {i}"
+            button_div.appendChild(button)
+            buttons.append(button)
+        self._shown_loc = None
+        return buttons
+
+    def _request(self):
+        if not self._pending:
+            self._pending = True
+            if self.schedule is not None:
+                self.schedule()
+
+    def log(self, message):
+        """可直接當作 GameEngine 的 logger_callback"""
+        self.view.append(message)
+        self._request()
+
+    def scrolled(self):
+        self.view.on_scroll()
+        self._request()
+
+    def show_state(self, engine, player):
+        """記下要顯示的狀態 (同一幀內多次呼叫只有最後一次生效)"""
+        self._state = (f"Day: {engine.day} | AP: {engine.ap} | 你的位置: {player.location} | 角色: {player.role}",
+                       player.location)
+        self._request()
+
+    def flush(self):
+        if not self._pending:
+            return
+        self._pending = False
+        self.frames += 1
+        self.view.render()
+        if self._state is not None:
+            status, loc = self._state
+            if status != self._shown_status:
+                self.status.textContent = status
+                self._shown_status = status
+            if loc != self._shown_loc:
+                for i, div in enumerate(self.locations):
+                    if i in (loc, self._shown_loc):
+                        div.style.background = "#333" if i == loc else "transparent"
+                self._shown_loc = loc